@@ -1,7 +1,39 @@
 # backend/api/admin.py
+import copy
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Facility, Chemical, Inventory, Transaction
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .models import ChangeLogEntry, User, Facility, Chemical, Inventory, Transaction
+from .services import record_changes, record_transaction_changes
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц: для списка без фильтров на PostgreSQL
+    берет оценку числа строк из статистики (pg_class.reltuples) вместо
+    COUNT(*) по всей таблице. Маленькие таблицы и отфильтрованные списки
+    считаются точно.
+    """
+    exact_count_below = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            connection = connections[self.object_list.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                        [self.object_list.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= self.exact_count_below:
+                    return row[0]
+        return super().count
+
 
 # Расширяем стандартный админ-класс для User, чтобы показать наши кастомные поля
 @admin.register(User)
@@ -17,16 +49,27 @@ class UserAdmin(BaseUserAdmin):
         ('Дополнительные поля', {'fields': ('role', 'related_facility')}),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Роль и объект зашиты в JWT - при их смене отзываем выданные токены
+        if change and {'role', 'related_facility', 'is_active'} & set(form.changed_data):
+            # Импорт здесь: simplejwt и сериализаторы DRF не нужны при старте manage.py-команд
+            from .authentication import revoke_user_tokens
+            revoke_user_tokens(obj)
+
 @admin.register(Facility)
 class FacilityAdmin(admin.ModelAdmin):
     list_display = ('name', 'type', 'location', 'created_at')
     list_filter = ('type',)
     search_fields = ('name', 'location')
+    ordering = ('name',)
 
 @admin.register(Chemical)
 class ChemicalAdmin(admin.ModelAdmin):
     list_display = ('name', 'unit_of_measurement')
     search_fields = ('name',)
+    # Стабильный порядок для автодополнения в TransactionAdmin
+    ordering = ('name',)
 
 @admin.register(Inventory)
 class InventoryAdmin(admin.ModelAdmin):
@@ -35,15 +78,54 @@ class InventoryAdmin(admin.ModelAdmin):
     search_fields = ('chemical__name', 'facility__name')
     # autocomplete_fields делает поиск по ForeignKey очень удобным
     autocomplete_fields = ['facility', 'chemical']
+    # __str__ и колонки читают facility и chemical - грузим их одним JOIN
+    list_select_related = ('facility', 'chemical')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Удаление журналируется сигналом post_delete (см. signals), правка - здесь
+    def save_model(self, request, obj, form, change):
+        previous = Inventory.objects.filter(pk=obj.pk).values_list('facility_id', flat=True).first() if change else None
+        super().save_model(request, obj, form, change)
+        if previous is not None and previous != obj.facility_id:
+            # Строка ушла с объекта: для его клиентов синхронизации она удалена
+            record_changes(ChangeLogEntry.Model.INVENTORY, [obj.pk], deleted=True, facilities={obj.pk: (previous, None)})
+        record_changes(ChangeLogEntry.Model.INVENTORY, [obj.pk], facilities={obj.pk: (obj.facility_id, None)})
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('timestamp', 'get_transaction_type_display', 'chemical', 'quantity', 'from_facility', 'to_facility', 'performed_by')
-    list_filter = ('transaction_type', 'timestamp', 'from_facility', 'to_facility')
+    list_filter = ('transaction_type', 'from_facility', 'to_facility')
     search_fields = ('chemical__name', 'performed_by__username')
+    # Навигация по датам операций (по индексу на operation_date) вместо фильтра по всей таблице
+    date_hierarchy = 'operation_date'
+    ordering = ('-operation_date',)
+    list_select_related = ('chemical', 'from_facility', 'to_facility', 'performed_by')
+    autocomplete_fields = ['chemical', 'from_facility', 'to_facility', 'performed_by']
+    paginator = EstimatedCountPaginator
+    # Без второго COUNT(*) по всей таблице при активных фильтрах
+    show_full_result_count = False
     # Запрещаем редактировать время создания, оно должно ставиться автоматически
     readonly_fields = ('timestamp',)
 
+    # Правки в админке идут мимо вьюх операций, поэтому версии для
+    # синхронизации записываем здесь. При правке сначала удаляем старую
+    # версию: если строка ушла с объекта, его клиенты ее удалят.
+    def save_model(self, request, obj, form, change):
+        previous = Transaction.objects.filter(pk=obj.pk).first() if change else None
+        super().save_model(request, obj, form, change)
+        record_transaction_changes(created=[obj], deleted=[previous] if previous else ())
+
+    def delete_model(self, request, obj):
+        deleted = copy.copy(obj)
+        super().delete_model(request, obj)
+        record_transaction_changes(deleted=[deleted])
+
+    def delete_queryset(self, request, queryset):
+        deleted = list(queryset)
+        super().delete_queryset(request, queryset)
+        record_transaction_changes(deleted=deleted)
+
     # Улучшаем отображение поля transaction_type
     def get_transaction_type_display(self, obj):
         return obj.get_transaction_type_display()
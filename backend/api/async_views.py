@@ -0,0 +1,216 @@
+# backend/api/async_views.py
+# Асинхронные (ASGI) варианты read-only отчетов и списков.
+# Под ASGI-сервером медленный отчет не занимает воркер целиком:
+# пока база считает агрегаты, event loop обслуживает другие запросы.
+# Под WSGI эти же вьюхи тоже работают (Django выполнит их через async_to_sync).
+# Чтение идет на реплику БД, если она настроена (см. db_routers).
+# Списки - те же вьюсеты (фильтры, ?fields=, ?layout=columnar), но всегда
+# постранично: ?limit=&offset=, ответ {"count", "next", "previous", "results"}.
+import asyncio
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import (APIException, MethodNotAllowed,
+                                       NotAuthenticated, Throttled)
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .authentication import aauthenticate
+from .db_routers import ais_pinned, enable_replica_reads, reset_replica_reads
+from .events import filter_event_for, get_broker
+from .helpers import parse_id_list, parse_int_param, parse_report_period
+from .models import Chemical
+from .permissions import check_facility_access
+from .services import acompute_facility_balances, build_facility_report
+from .throttling import (EndpointClassThrottle, acquire_slot, heavy_limits,
+                         release_slot, retry_after)
+from .views import (ChemicalViewSet, FacilityViewSet, InventoryViewSet,
+                    TransactionViewSet)
+
+
+def _render(data, status_code=status.HTTP_200_OK, headers=None):
+    response = HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def _check_throttle(request, scope):
+    # Тот же лимит частоты, что у APIView с throttle_scope = scope
+    throttle = EndpointClassThrottle()
+    view = type('AsyncView', (), {'throttle_scope': scope})()
+    if not throttle.allow_request(request, view):
+        raise Throttled(wait=throttle.wait())
+
+
+def async_api_view(view=None, *, scope=None):
+    """
+    Декоратор для async read-only вьюх: JWT-аутентификация, только GET/HEAD
+    и ошибки DRF в том же формате, что у обычных APIView.
+    scope - класс эндпоинта, как throttle_scope/concurrency_scope у APIView:
+    лимит частоты EndpointClassThrottle (без класса - reads) и, если класс
+    есть в HEAVY_CONCURRENCY, слот тяжелого запроса на время выполнения.
+    """
+    if view is None:
+        return functools.partial(async_api_view, scope=scope)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        slot = None
+        try:
+            if request.method not in ('GET', 'HEAD'):
+                raise MethodNotAllowed(request.method)
+            user = await aauthenticate(request)
+            if user is None:
+                raise NotAuthenticated()
+            request.user = user
+            # Счетчики и слоты - файлы, поэтому проверки идут в синхронном потоке
+            await sync_to_async(_check_throttle)(request, scope)
+            if scope in heavy_limits():
+                slot = await sync_to_async(acquire_slot)(scope)
+                if slot is None:
+                    raise Throttled(wait=retry_after(), detail="Сервер занят тяжелыми запросами, повторите позже.")
+            # Как и ReplicaReadMixin: читаем с реплики, если пользователь не закреплен за основной БД
+            replica_token = None if await ais_pinned(user.id) else enable_replica_reads()
+            try:
+                data = await view(request, *args, **kwargs)
+            finally:
+                if replica_token is not None:
+                    reset_replica_reads(replica_token)
+        except APIException as exc:
+            headers = {}
+            if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                headers['WWW-Authenticate'] = 'Bearer realm="api"'
+            if getattr(exc, 'wait', None):
+                headers['Retry-After'] = '%d' % exc.wait
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return _render(detail, exc.status_code, headers)
+        finally:
+            if slot is not None:
+                release_slot(slot)
+        return _render(data)
+    return wrapper
+
+
+@async_api_view(scope='reports')
+async def facility_detail_report(request):
+    facility_id = parse_int_param(request.GET, 'facility_id')
+    start, end = parse_report_period(request.GET)
+    check_facility_access(request.user, facility_id)
+
+    balances = await acompute_facility_balances([facility_id], start, end)
+    chemicals = await Chemical.objects.ain_bulk([chemical_id for _, chemical_id in balances])
+    return build_facility_report(balances, chemicals)
+
+
+class AsyncListPagination(LimitOffsetPagination):
+    """Страницы async-списков: без ?limit= - первые default_limit строк."""
+    default_limit = 500
+    max_limit = 5000
+
+
+def _list_view(request, viewset_class):
+    # Вьюсет дает queryset с ограничением по объектам, фильтры и ?fields=.
+    # django-filter валидирует ModelChoice-фильтры запросами в БД,
+    # поэтому сборку queryset выполняем в синхронном потоке
+    drf_request = Request(request)
+    drf_request.user = request.user
+    view = viewset_class(request=drf_request, args=(), kwargs={}, format_kwarg=None, action='list')
+    return view, view.filter_queryset(view.get_queryset())
+
+
+async def _list_response(request, viewset_class):
+    view, queryset = await sync_to_async(_list_view)(request, viewset_class)
+    paginator = AsyncListPagination()
+    paginator.request = view.request
+    paginator.limit = paginator.get_limit(view.request)
+    paginator.offset = paginator.get_offset(view.request)
+    paginator.count = await queryset.acount()
+    page = queryset[paginator.offset:paginator.offset + paginator.limit]
+
+    if view.is_columnar():
+        fields = view.get_requested_fields() or list(view.columnar_columns)
+        payload = await sync_to_async(view.get_columnar_payload)(page, fields)
+        payload.update(count=paginator.count, next=paginator.get_next_link(), previous=paginator.get_previous_link())
+        return payload
+    rows = [row async for row in page]
+    return paginator.get_paginated_response(view.get_serializer(rows, many=True).data).data
+
+
+@async_api_view
+async def transaction_list(request):
+    return await _list_response(request, TransactionViewSet)
+
+
+@async_api_view
+async def inventory_list(request):
+    return await _list_response(request, InventoryViewSet)
+
+
+@async_api_view
+async def facility_list(request):
+    return await _list_response(request, FacilityViewSet)
+
+
+@async_api_view
+async def chemical_list(request):
+    return await _list_response(request, ChemicalViewSet)
+
+
+async def _event_stream(subscription, user, facility_ids):
+    heartbeat = getattr(settings, 'EVENT_STREAM_HEARTBEAT', 15)
+    broker = get_broker()
+    try:
+        yield b'retry: 3000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                # Комментарий-пинг держит соединение открытым через прокси
+                yield b': ping\n\n'
+                continue
+            event = filter_event_for(event, user, facility_ids)
+            if event is None:
+                continue
+            data = json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False)
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n".encode()
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def event_stream(request):
+    """
+    Живые обновления (Server-Sent Events): после каждой операции приходит
+    событие operation.created / edited / deleted с затронутыми объектами
+    и новыми остатками по парам (объект, реагент).
+    Токен - в заголовке Authorization или в ?token= (EventSource не умеет
+    заголовки). ?facility_ids=1,2 - только события этих объектов;
+    инженер всегда получает только события своего объекта.
+    Работает только под ASGI: WSGI-воркер пришлось бы занять соединением целиком.
+    """
+    try:
+        if request.method != 'GET':
+            raise MethodNotAllowed(request.method)
+        user = await aauthenticate(request, query_param='token')
+        if user is None:
+            raise NotAuthenticated()
+        facility_ids = parse_id_list(request.GET, 'facility_ids')
+    except APIException as exc:
+        detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return _render(detail, exc.status_code)
+    if not isinstance(request, ASGIRequest):
+        return _render({'detail': 'Поток событий доступен только под ASGI-сервером.'}, status.HTTP_501_NOT_IMPLEMENTED)
+
+    subscription = get_broker().subscribe()
+    response = StreamingHttpResponse(_event_stream(subscription, user, facility_ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Отключаем буферизацию в nginx, иначе события придут пачкой
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,239 @@
+# backend/api/authentication.py
+import copy
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+from django.utils.functional import LazyObject, empty
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import (TokenObtainPairSerializer,
+                                                  TokenRefreshSerializer)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User
+
+# Имена claim'ов, которые мы добавляем в токен
+ROLE_CLAIM = 'role'
+FACILITY_CLAIM = 'related_facility_id'
+VERSION_CLAIM = 'token_version'
+
+
+class _UserStateCache:
+    """
+    Короткоживущий кэш в памяти процесса: user_id -> (истекает, состояние).
+    Состояние - версия токенов и is_active (для проверки отзыва), плюс
+    полная модель User, если она кому-то понадобилась.
+    Каждый воркер держит свой кэш, поэтому отзыв токенов в других
+    воркерах вступает в силу не позже чем через TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'JWT_USER_CACHE_TTL', 30)
+
+    def _get(self, user_id):
+        entry = self._entries.get(str(user_id))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def _put(self, user_id, state):
+        with self._lock:
+            self._entries[str(user_id)] = (time.monotonic() + self.ttl, state)
+
+    def cached_state(self, user_id):
+        """Состояние из кэша без обращения к БД (None, если его нет)."""
+        return self._get(user_id)
+
+    def get_state(self, user_id):
+        state = self._get(user_id)
+        if state is None:
+            row = User.objects.filter(pk=user_id).values('token_version', 'is_active').first()
+            if row is None:
+                raise AuthenticationFailed("Пользователь не найден.", code='user_not_found')
+            state = {'token_version': row['token_version'], 'is_active': row['is_active'], 'user': None}
+            self._put(user_id, state)
+        return state
+
+    def get_user(self, user_id):
+        state = self.get_state(user_id)
+        if state['user'] is None:
+            user = User.objects.select_related('related_facility').filter(pk=user_id).first()
+            if user is None:
+                raise AuthenticationFailed("Пользователь не найден.", code='user_not_found')
+            state = {'token_version': user.token_version, 'is_active': user.is_active, 'user': user}
+            self._put(user_id, state)
+        return state['user']
+
+    def warm(self):
+        """Загружает состояние всех активных пользователей одним запросом (при старте воркеров)."""
+        rows = User.objects.filter(is_active=True).values_list('pk', 'token_version')
+        for user_id, token_version in rows.iterator():
+            self._put(user_id, {'token_version': token_version, 'is_active': True, 'user': None})
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_state_cache = _UserStateCache()
+
+
+class ClaimsUser(LazyObject):
+    """
+    Легкий пользователь, собранный из claim'ов access-токена.
+    id, role и related_facility_id читаются прямо из токена без запроса в БД.
+    Любое другое обращение (например, related_facility или присваивание
+    в ForeignKey) прозрачно подгружает полную модель User из кэша.
+    """
+
+    def __init__(self, token):
+        self.__dict__['_claims'] = {
+            # simplejwt хранит id строкой, приводим к типу первичного ключа
+            'id': User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM]),
+            'role': token[ROLE_CLAIM],
+            'related_facility_id': token.get(FACILITY_CLAIM),
+        }
+        super().__init__()
+
+    def _setup(self):
+        self._wrapped = user_state_cache.get_user(self._claims['id'])
+
+    @property
+    def id(self):
+        return self._claims['id']
+
+    pk = id
+
+    @property
+    def role(self):
+        return self._claims['role']
+
+    @property
+    def related_facility_id(self):
+        return self._claims['related_facility_id']
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    # LazyObject передает bool() обернутому объекту, и проверки вида
+    # `request.user and request.user.is_authenticated` (IsAuthenticated в DRF)
+    # загружали бы User. Пользователь из токена всегда истинен.
+    def __bool__(self):
+        return True
+
+    # Копия ленивого пользователя - это копия полной модели
+    def __copy__(self):
+        if self._wrapped is empty:
+            self._setup()
+        return copy.copy(self._wrapped)
+
+    def __deepcopy__(self, memo):
+        if self._wrapped is empty:
+            self._setup()
+        return copy.deepcopy(self._wrapped, memo)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без загрузки User на каждый запрос.
+    Токен проверяется на отзыв по token_version из кэша процесса;
+    старые токены без наших claim'ов обрабатываются как раньше.
+    """
+
+    def get_user(self, validated_token):
+        if ROLE_CLAIM not in validated_token or VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Токен не содержит идентификатор пользователя.")
+
+        state = user_state_cache.get_state(user_id)
+        if not state['is_active']:
+            raise AuthenticationFailed("Пользователь неактивен.", code='user_inactive')
+        if validated_token[VERSION_CLAIM] != state['token_version']:
+            raise AuthenticationFailed("Токен отозван, войдите заново.", code='token_revoked')
+        return ClaimsUser(validated_token)
+
+
+async def aauthenticate(request, query_param=None):
+    """
+    Асинхронная аутентификация для async-вьюх (без DRF Request).
+    Возвращает пользователя или None, если заголовка Authorization нет.
+    query_param - имя query-параметра с access-токеном на случай, когда
+    клиент не может передать заголовок (EventSource в браузере).
+    В БД ходит только при промахе кэша процесса.
+    """
+    auth = ClaimsJWTAuthentication()
+    header = auth.get_header(request)
+    if header is not None:
+        raw_token = auth.get_raw_token(header)
+    elif query_param:
+        raw_token = request.GET.get(query_param, '').encode() or None
+    else:
+        raw_token = None
+    if raw_token is None:
+        return None
+    token = auth.get_validated_token(raw_token)
+    if ROLE_CLAIM in token and VERSION_CLAIM in token:
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None and user_state_cache.cached_state(user_id) is not None:
+            return auth.get_user(token)
+    return await sync_to_async(auth.get_user)(token)
+
+
+def add_user_claims(token, user):
+    token[ROLE_CLAIM] = user.role
+    token[FACILITY_CLAIM] = user.related_facility_id
+    token[VERSION_CLAIM] = user.token_version
+    return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Выдает пару токенов с ролью, объектом и версией токенов пользователя."""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Не обновляет токены, выданные до смены роли или объекта пользователя."""
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        if VERSION_CLAIM in refresh:
+            user_id = refresh.get(api_settings.USER_ID_CLAIM)
+            current = User.objects.filter(pk=user_id).values_list('token_version', flat=True).first()
+            if current is None or refresh[VERSION_CLAIM] != current:
+                raise InvalidToken("Токен отозван, войдите заново.")
+        return super().validate(attrs)
+
+
+def revoke_user_tokens(user):
+    """
+    Отзывает все выданные пользователю токены (например, после смены роли):
+    увеличивает token_version и сбрасывает кэш процесса.
+    """
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.refresh_from_db(fields=['token_version'])
+    user_state_cache.invalidate(user.pk)
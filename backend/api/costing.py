@@ -0,0 +1,287 @@
+# backend/api/costing.py
+# Себестоимость реагентов по FIFO.
+# Поступление (add) создает партию по текущей цене реагента, перемещение
+# (transfer) списывает партии источника по FIFO и создает у получателя
+# партии с теми же ценами, списание (consume) гасит партии объекта по FIFO.
+# Партии ведутся по мере операций, поэтому расчет для закрытия скважины -
+# это чтение оставшихся партий и списаний, а не проигрывание журнала.
+#
+# FIFO зависит от порядка операций по объектам реагента, связанным
+# перемещениями (перемещения переносят цены между объектами), поэтому при
+# задним числом добавленной, измененной или удаленной операции пересобирается
+# только "хвост" журнала реагента начиная с даты операции и только по объектам,
+# связанным с ней перемещениями в этом хвосте. Пересборки блокируют пары
+# (объект, реагент), а не реагент целиком: операции с одним реагентом на
+# несвязанных объектах не ждут друг друга.
+import datetime
+from collections import defaultdict, deque
+from decimal import Decimal
+
+from django.db import connection
+from django.db import transaction as db_transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .db_routers import primary
+from .models import (ArchivedTransaction, Chemical, CostAllocation, CostLayer,
+                     Transaction)
+
+COST_FIELD = DecimalField(max_digits=20, decimal_places=4)
+_ORDERING = ('operation_date', 'timestamp', 'id')
+
+
+def update_cost_layers(created=(), deleted=()):
+    """
+    Поддерживает партии после операции: для каждого затронутого реагента
+    пересобирает хвост с самой ранней даты среди созданных и удаленных транзакций.
+    Для обычной операции "сегодняшним" числом хвост - это она сама.
+    """
+    since, facilities = {}, defaultdict(set)
+    for tx in list(created) + list(deleted):
+        current = since.get(tx.chemical_id)
+        if current is None or tx.operation_date < current:
+            since[tx.chemical_id] = tx.operation_date
+        facilities[tx.chemical_id].update(f for f in (tx.from_facility_id, tx.to_facility_id) if f)
+    with primary(), db_transaction.atomic():
+        for chemical_id in sorted(since):
+            rebuild_suffix(chemical_id, since[chemical_id], facilities[chemical_id])
+
+
+# Пространство ключей pg_advisory_xact_lock(int, int) отделено от ключей
+# с одним bigint (PERIOD_LOCK_KEY), поэтому пара (объект, реагент) - сам ключ
+def _lock_streams(chemical_id, facility_ids):
+    """Блокирует партии пар (объект, реагент) до конца транзакции БД; на SQLite записи и так идут по одной."""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for facility_id in sorted(facility_ids):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [facility_id, chemical_id])
+
+
+def _linked_facilities(chemical_id, since, facility_ids):
+    """Объекты, связанные с facility_ids перемещениями реагента начиная с since (включая их самих)."""
+    facilities = set(facility_ids)
+    transfers = Transaction.objects.filter(
+        chemical_id=chemical_id, operation_date__gte=since,
+        transaction_type=Transaction.TransactionType.TRANSFER,
+    )
+    while True:
+        pairs = transfers.filter(
+            Q(from_facility_id__in=facilities) | Q(to_facility_id__in=facilities)
+        ).values_list('from_facility_id', 'to_facility_id').distinct()
+        linked = facilities | {facility_id for pair in pairs for facility_id in pair if facility_id}
+        if linked == facilities:
+            return facilities
+        facilities = linked
+
+
+def rebuild_suffix(chemical_id, since, facility_ids):
+    """
+    Откатывает партии и списания реагента начиная с since на объектах facility_ids
+    и связанных с ними перемещениями и проигрывает их журнал заново.
+    """
+    # Блокируем найденные пары и пересчитываем связи уже под блокировкой:
+    # перемещение, записанное тем временем, могло добавить объект
+    locked = set()
+    facilities = _linked_facilities(chemical_id, since, facility_ids)
+    while facilities - locked:
+        _lock_streams(chemical_id, facilities - locked)
+        locked |= facilities
+        facilities = _linked_facilities(chemical_id, since, locked)
+
+    chemical = Chemical.objects.get(pk=chemical_id)
+    _undo_suffix(chemical_id, since, facilities)
+    layers = CostLayer.objects.filter(
+        chemical_id=chemical_id, facility_id__in=facilities, received_at__lt=since,
+    ).exclude(remaining=0)
+    kept = {
+        layer.source_transaction_id: layer
+        for layer in CostLayer.objects.filter(
+            chemical_id=chemical_id, facility_id__in=facilities, received_at__gte=since, kind=CostLayer.Kind.RECEIPT,
+        )
+    }
+    transactions = Transaction.objects.filter(
+        Q(from_facility_id__in=facilities) | Q(to_facility_id__in=facilities),
+        chemical_id=chemical_id, operation_date__gte=since,
+    ).order_by(*_ORDERING)
+    _replay(chemical, layers, transactions, kept)
+
+
+def rebuild_all(chemical_ids=None):
+    """Полная пересборка партий (первичное заполнение): архив закрытых периодов плюс журнал."""
+    chemicals = Chemical.objects.all()
+    if chemical_ids:
+        chemicals = chemicals.filter(pk__in=chemical_ids)
+    with primary():
+        for chemical in chemicals:
+            with db_transaction.atomic():
+                archived = ArchivedTransaction.objects.filter(chemical=chemical).order_by(*_ORDERING)
+                live = Transaction.objects.filter(chemical=chemical).order_by(*_ORDERING)
+                facility_ids = set()
+                for rows in (archived, live):
+                    for pair in rows.values_list('from_facility_id', 'to_facility_id').distinct():
+                        facility_ids.update(facility_id for facility_id in pair if facility_id)
+                _lock_streams(chemical.pk, facility_ids)
+                CostAllocation.objects.filter(chemical=chemical).delete()
+                CostLayer.objects.filter(chemical=chemical).delete()
+                _replay(chemical, [], list(archived) + list(live), {})
+
+
+def _undo_suffix(chemical_id, since, facility_ids):
+    allocations = CostAllocation.objects.filter(
+        chemical_id=chemical_id, facility_id__in=facility_ids, operation_date__gte=since,
+    )
+    restore = dict(
+        allocations.filter(layer__isnull=False).values_list('layer').annotate(total=Sum('quantity')).order_by()
+    )
+    if restore:
+        layers = list(CostLayer.objects.filter(pk__in=restore, received_at__lt=since))
+        for layer in layers:
+            layer.remaining += restore[layer.pk]
+        CostLayer.objects.bulk_update(layers, ['remaining'], batch_size=1000)
+    allocations.delete()
+
+    suffix_layers = CostLayer.objects.filter(chemical_id=chemical_id, facility_id__in=facility_ids, received_at__gte=since)
+    # Партии поступлений сохраняются вместе с их ценой, если операция жива;
+    # перемещенные партии и партии удаленных операций создаются заново
+    suffix_layers.exclude(kind=CostLayer.Kind.RECEIPT, source_transaction__isnull=False).delete()
+    suffix_layers.update(remaining=F('quantity'))
+
+
+def _replay(chemical, layers, transactions, kept):
+    # Очереди партий и недостач по объектам, в порядке поступления
+    queues, deficits = defaultdict(deque), defaultdict(deque)
+    for layer in sorted(layers, key=lambda item: (item.received_at, item.id)):
+        (deficits if layer.remaining < 0 else queues)[layer.facility_id].append(layer)
+
+    new_layers, touched, allocations = [], {}, []
+
+    def allocate(tx, facility_id, layer, quantity, unit_cost):
+        allocations.append(CostAllocation(
+            transaction=tx if isinstance(tx, Transaction) else None, layer=layer,
+            facility_id=facility_id, chemical_id=chemical.pk, transaction_type=tx.transaction_type,
+            operation_date=tx.operation_date, quantity=quantity, unit_cost=unit_cost,
+        ))
+        if layer.pk is not None:
+            touched[layer.pk] = layer
+
+    def take(tx, facility_id):
+        """Гасит партии объекта по FIFO и возвращает [(количество, цена)]."""
+        need, parts = tx.quantity, []
+        queue = queues[facility_id]
+        while need > 0 and queue:
+            layer = queue[0]
+            used = min(layer.remaining, need)
+            layer.remaining -= used
+            need -= used
+            parts.append((used, layer.unit_cost))
+            allocate(tx, facility_id, layer, used, layer.unit_cost)
+            if layer.remaining == 0:
+                queue.popleft()
+        if need > 0:
+            # Партий не хватило: недостача по текущей цене до следующего поступления
+            deficit = CostLayer(
+                facility_id=facility_id, chemical_id=chemical.pk, kind=CostLayer.Kind.DEFICIT,
+                source_transaction=tx if isinstance(tx, Transaction) else None,
+                received_at=tx.operation_date, unit_cost=chemical.price,
+                quantity=-need, remaining=-need,
+            )
+            new_layers.append(deficit)
+            deficits[facility_id].append(deficit)
+            parts.append((need, chemical.price))
+            allocate(tx, facility_id, deficit, need, chemical.price)
+        return parts
+
+    def receive(tx, facility_id, layer):
+        # Поступление сначала гасит недостачи объекта
+        pending = deficits[facility_id]
+        while pending and layer.remaining > 0:
+            deficit = pending[0]
+            settled = min(-deficit.remaining, layer.remaining)
+            deficit.remaining += settled
+            layer.remaining -= settled
+            allocate(tx, facility_id, deficit, -settled, deficit.unit_cost)
+            if layer.pk is not None:
+                touched[layer.pk] = layer
+            if deficit.remaining == 0:
+                pending.popleft()
+        if layer.remaining > 0:
+            queues[facility_id].append(layer)
+
+    def new_layer(tx, facility_id, kind, quantity, unit_cost):
+        layer = CostLayer(
+            facility_id=facility_id, chemical_id=chemical.pk, kind=kind,
+            source_transaction=tx if isinstance(tx, Transaction) else None,
+            received_at=tx.operation_date, unit_cost=unit_cost,
+            quantity=quantity, remaining=quantity,
+        )
+        new_layers.append(layer)
+        return layer
+
+    for tx in transactions:
+        if tx.transaction_type == Transaction.TransactionType.ADD:
+            layer = kept.get(tx.id) if isinstance(tx, Transaction) else None
+            if layer is None:
+                layer = new_layer(tx, tx.to_facility_id, CostLayer.Kind.RECEIPT, tx.quantity, chemical.price)
+            receive(tx, tx.to_facility_id, layer)
+        elif tx.transaction_type == Transaction.TransactionType.CONSUME:
+            take(tx, tx.from_facility_id)
+        elif tx.transaction_type == Transaction.TransactionType.TRANSFER:
+            for used, unit_cost in take(tx, tx.from_facility_id):
+                receive(tx, tx.to_facility_id, new_layer(tx, tx.to_facility_id, CostLayer.Kind.TRANSFER, used, unit_cost))
+
+    # Новые партии сохраняются раньше списаний, которые на них ссылаются
+    CostLayer.objects.bulk_create(new_layers, batch_size=1000)
+    CostLayer.objects.bulk_update(touched.values(), ['remaining'], batch_size=1000)
+    CostAllocation.objects.bulk_create(allocations, batch_size=1000)
+
+
+# --- Расчеты для закрытия скважин ---
+
+def day_after(end):
+    """
+    Начало дня, следующего за end, - исключающая граница периода, заданного
+    датами: операции последнего дня входят в период целиком (см. helpers.parse_report_period).
+    """
+    day = timezone.localtime(end).date() + datetime.timedelta(days=1)
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def consumed_quantities(facility_id, start, end):
+    """Фактический расход (списания) объекта за период [start, end): {chemical_id: количество}."""
+    rows = CostAllocation.objects.filter(
+        facility_id=facility_id, transaction_type=Transaction.TransactionType.CONSUME,
+        operation_date__gte=start, operation_date__lt=end,
+    ).values('chemical').annotate(total=Sum('quantity')).order_by()
+    return {row['chemical']: row['total'] for row in rows}
+
+
+def well_cost_summary(facility_id, start, end):
+    """
+    Стоимость по FIFO для закрытия скважины: списано за период [start, end) (количество
+    и себестоимость по партиям) и что осталось на объекте сейчас (остаток партий и его оценка).
+    Погашения недостач (отрицательные строки) в расход не входят - это не списания.
+    Два сгруппированных запроса, без проигрывания журнала.
+    """
+    consumed = CostAllocation.objects.filter(
+        facility_id=facility_id, transaction_type=Transaction.TransactionType.CONSUME,
+        operation_date__gte=start, operation_date__lt=end,
+    ).values('chemical').annotate(
+        total_quantity=Sum('quantity'),
+        cost=Sum(ExpressionWrapper(F('quantity') * F('unit_cost'), output_field=COST_FIELD)),
+    ).order_by()
+    # Недостачи входят с минусом, поэтому количество совпадает с Inventory
+    on_hand = CostLayer.objects.filter(~Q(remaining=0), facility_id=facility_id).values('chemical').annotate(
+        total_quantity=Sum('remaining'),
+        value=Sum(ExpressionWrapper(F('remaining') * F('unit_cost'), output_field=COST_FIELD)),
+    ).order_by()
+
+    items = defaultdict(lambda: {
+        'consumed_quantity': Decimal(0), 'consumed_cost': Decimal(0),
+        'on_hand_quantity': Decimal(0), 'on_hand_value': Decimal(0),
+    })
+    for row in consumed:
+        items[row['chemical']].update(consumed_quantity=row['total_quantity'], consumed_cost=row['cost'])
+    for row in on_hand:
+        items[row['chemical']].update(on_hand_quantity=row['total_quantity'], on_hand_value=row['value'])
+    return items
@@ -0,0 +1,86 @@
+# backend/api/db_routers.py
+# Маршрутизация чтения на реплику БД.
+# Чтение идет на реплику только внутри безопасных (GET/HEAD/OPTIONS)
+# запросов к отчетам и спискам, помеченным use_replica = True, и только
+# если пользователь недавно ничего не записывал (см. middleware).
+# Все остальное, включая пересчет остатков, работает с основной БД.
+import contextlib
+import contextvars
+
+from django.conf import settings
+from django.core.cache import caches
+
+REPLICA_ALIAS = 'replica'
+
+# Метки "недавно писал" должны быть видны всем воркерам хоста (и ASGI-воркерам),
+# иначе следующее чтение попадет в другой процесс и уйдет на отстающую реплику.
+# Кэш 'host_state' - файловый, общий для процессов одного хоста, без вытеснения.
+PIN_CACHE = 'host_state'
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def enable_replica_reads():
+    """Разрешает чтение с реплики до конца текущего запроса. Возвращает токен для сброса."""
+    return _use_replica.set(replica_configured())
+
+
+def reset_replica_reads(token):
+    _use_replica.reset(token)
+
+
+@contextlib.contextmanager
+def replica_reads():
+    """Внутри блока чтения идут на реплику (если она настроена)."""
+    token = enable_replica_reads()
+    try:
+        yield
+    finally:
+        reset_replica_reads(token)
+
+
+@contextlib.contextmanager
+def primary():
+    """Внутри блока все чтения идут в основную БД."""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """После записи читаем свои же данные с основной БД REPLICA_PIN_SECONDS секунд."""
+    caches[PIN_CACHE].set(_pin_key(user_id), True, timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(user_id):
+    return caches[PIN_CACHE].get(_pin_key(user_id)) is not None
+
+
+async def ais_pinned(user_id):
+    return await caches[PIN_CACHE].aget(_pin_key(user_id)) is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return REPLICA_ALIAS if _use_replica.get() else 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная БД
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема на реплику приходит через репликацию
+        return db == 'default'
@@ -0,0 +1,187 @@
+# backend/api/events.py
+# Брокер событий для живых обновлений (SSE, см. async_views.event_stream).
+# Вьюхи операций публикуют компактные события после коммита, подписчики
+# (открытые SSE-соединения) получают их через asyncio.Queue своего event loop.
+#
+# InProcessBroker работает в пределах одного процесса. При нескольких
+# воркерах нужен брокер, который разносит события между ними:
+# EVENT_BROKER = 'api.events.PostgresNotifyBroker' (LISTEN/NOTIFY PostgreSQL)
+# или свой класс с теми же методами publish/subscribe/unsubscribe.
+import asyncio
+import itertools
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Сколько событий может ждать медленный клиент, прежде чем лишние отбросятся
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """Очередь одного подписчика, привязанная к его event loop."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("SSE-подписчик не успевает, событие %s отброшено", event.get('id'))
+
+    def deliver(self, event):
+        # Публикация идет из потока синхронной вьюхи - передаем в loop подписчика
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """Раздает события подписчикам текущего процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        self._fan_out(event)
+
+    def _fan_out(self, event):
+        event = {**event, 'id': next(self._ids)}
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # Event loop подписчика уже закрыт
+                self.unsubscribe(subscription)
+
+
+class PostgresNotifyBroker(InProcessBroker):
+    """
+    Брокер для нескольких воркеров: событие уходит в pg_notify, а каждый
+    процесс слушает канал отдельным соединением в фоновом потоке и раздает
+    события своим подписчикам. NOTIFY ограничен 8000 байт, поэтому
+    слишком большие события отправляются без списка остатков.
+    """
+    channel = 'api_events'
+    max_payload = 7900
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, event):
+        payload = json.dumps(event, cls=DjangoJSONEncoder)
+        if len(payload.encode()) > self.max_payload:
+            payload = json.dumps({**event, 'inventory': [], 'truncated': True}, cls=DjangoJSONEncoder)
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def subscribe(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+        return super().subscribe()
+
+    def _listen(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        params = connections['default'].get_connection_params()
+        while True:
+            try:
+                conn = psycopg2.connect(**params)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._fan_out(json.loads(conn.notifies.pop(0).payload))
+            except Exception:
+                logger.exception("Слушатель событий потерял соединение, переподключение")
+                threading.Event().wait(5)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'EVENT_BROKER', 'api.events.InProcessBroker'))()
+    return _broker
+
+
+def publish_operation_event(kind, operation_uuid, transactions, inventory_changes):
+    """
+    Публикует событие об операции после коммита транзакции БД.
+    kind: 'created' | 'edited' | 'deleted';
+    inventory_changes: {(facility_id, chemical_id): (было, стало)} из пересчета.
+    """
+    facilities = set()
+    for tx in transactions:
+        facilities.update(f for f in (tx.from_facility_id, tx.to_facility_id) if f)
+    event = {
+        'type': f'operation.{kind}',
+        'operation_uuid': str(operation_uuid),
+        'facilities': sorted(facilities),
+        'inventory': [
+            {'facility_id': facility_id, 'chemical_id': chemical_id, 'quantity': str(after)}
+            for (facility_id, chemical_id), (_, after) in sorted(inventory_changes.items())
+        ],
+        'at': timezone.now().isoformat(),
+    }
+    db_transaction.on_commit(lambda: get_broker().publish(event))
+
+
+def filter_event_for(event, user, facility_ids=None):
+    """
+    Оставляет в событии только то, что видно пользователю: инженер видит
+    лишь свой объект, остальные - все или объекты из facility_ids.
+    Возвращает None, если событие пользователю не нужно.
+    """
+    visible = set(facility_ids) if facility_ids else None
+    if user.role == 'engineer':
+        own = {user.related_facility_id}
+        visible = own if visible is None else visible & own
+    if visible is None:
+        return event
+    if not visible & set(event['facilities']):
+        return None
+    return {
+        **event,
+        'facilities': [f for f in event['facilities'] if f in visible],
+        'inventory': [item for item in event['inventory'] if item['facility_id'] in visible],
+    }
@@ -1,6 +1,6 @@
 # backend/api/filters.py
 from django_filters import rest_framework as filters
-from .models import Transaction, Facility
+from .models import ArchivedTransaction, Transaction, Facility
 from django.db.models import Q
 
 class TransactionFilter(filters.FilterSet):
@@ -20,4 +20,9 @@ class TransactionFilter(filters.FilterSet):
 
     def filter_by_facility(self, queryset, name, value):
         # Ищем совпадение либо в from_facility, либо в to_facility
-        return queryset.filter(Q(from_facility=value) | Q(to_facility=value))
\ No newline at end of file
+        return queryset.filter(Q(from_facility=value) | Q(to_facility=value))
+
+
+class ArchivedTransactionFilter(TransactionFilter):
+    class Meta(TransactionFilter.Meta):
+        model = ArchivedTransaction
@@ -1,32 +1,116 @@
 import json
 import uuid
 from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
+from .costing import day_after
 from .models import Chemical, Facility, Transaction
+from .services import locked_closed_before
+
+
+def parse_operation_date(value):
+    """
+    Приводит дату операции (строка ISO или datetime) к aware datetime,
+    чтобы созданные транзакции сразу несли настоящую дату, а не строку.
+    """
+    try:
+        parsed = Transaction._meta.get_field('operation_date').to_python(value)
+    except DjangoValidationError:
+        raise ValidationError(f'Некорректная дата операции: "{value}".')
+    if parsed is None:
+        raise ValidationError("Дата операции (operation_date) обязательна.")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_int_param(params, name, required=True):
+    """Читает целочисленный query-параметр (например, facility_id)."""
+    value = params.get(name)
+    if value in (None, ''):
+        if required:
+            raise ValidationError(f"Необходимо указать {name}.")
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{name} должен быть целым числом.")
+
+
+def parse_id_list(params, name):
+    """Читает список id из query-параметра вида "1,2,3" (или повторяющегося ?name=1&name=2)."""
+    raw = params.getlist(name) if hasattr(params, 'getlist') else [params.get(name)]
+    ids = []
+    for chunk in raw:
+        for value in (chunk or '').split(','):
+            value = value.strip()
+            if not value:
+                continue
+            try:
+                ids.append(int(value))
+            except ValueError:
+                raise ValidationError(f'{name}: "{value}" не является целым числом.')
+    return ids
+
+
+def parse_report_period(params):
+    """
+    Читает start_date и end_date из query-параметров отчета и возвращает
+    полуинтервал [start, end) из aware datetime. День end_date входит
+    в период целиком: end - начало следующего дня (costing.day_after).
+    Все отчеты и расчеты за период фильтруют operation_date__lt=end.
+    """
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    if not start_date or not end_date:
+        raise ValidationError("Необходимо указать start_date и end_date.")
+    start, end = parse_operation_date(start_date), parse_operation_date(end_date)
+    if start > end:
+        raise ValidationError("start_date не может быть позже end_date.")
+    return start, day_after(end)
 
 
 def validate_and_create_operation(request, new_data):
     """
     Хелпер, который валидирует данные для новой операции и создает транзакции.
-    Возвращает список созданных транзакций.
+    Возвращает список созданных транзакций. Вызывать внутри atomic():
+    граница закрытого периода блокируется до конца транзакции.
+    """
+    transactions = build_operation_transactions(
+        request.user, new_data,
+        get_facility=lambda pk: Facility.objects.get(pk=pk),
+        closed_before=locked_closed_before(),
+    )
+    for tx in transactions:
+        tx.save(force_insert=True)
+    return transactions
+
+
+def build_operation_transactions(user, new_data, get_facility, closed_before):
+    """
+    Проверяет данные одной операции и возвращает ее транзакции без сохранения.
+    get_facility(pk) - откуда брать объекты (запрос в БД или заранее
+    загруженный словарь), closed_before - граница закрытого периода.
     """
     # 1. Валидация общих данных
     transaction_type = new_data.get('transaction_type')
     from_facility_id = new_data.get('from_facility')
     to_facility_id = new_data.get('to_facility')
     comment = new_data.get('comment', '')
-    document_file = new_data.get('document_file') # FormData передаст файл, JSON - нет
     operation_date = new_data.get('operation_date')
 
+    if transaction_type not in Transaction.TransactionType.values:
+        raise ValidationError(f'Неизвестный тип операции: "{transaction_type}".')
     if from_facility_id in ['null', '']: from_facility_id = None
     if to_facility_id in ['null', '']: to_facility_id = None
     if not operation_date: raise ValidationError("Дата операции (operation_date) обязательна.")
+    operation_date = parse_operation_date(operation_date)
+    if closed_before is not None and operation_date < closed_before:
+        raise ValidationError(f"Период до {closed_before:%Y-%m-%d %H:%M} закрыт, операции в нем менять нельзя.")
 
-    from_facility = Facility.objects.get(pk=from_facility_id) if from_facility_id else None
-    to_facility = Facility.objects.get(pk=to_facility_id) if to_facility_id else None
-
-    if from_facility_id in ['null', '']: from_facility_id = None
-    if to_facility_id in ['null', '']: to_facility_id = None
+    from_facility = get_facility(from_facility_id) if from_facility_id else None
+    to_facility = get_facility(to_facility_id) if to_facility_id else None
 
     if transaction_type == 'add' and not to_facility:
         raise ValidationError("Для 'Поступления' необходимо указать объект назначения (to_facility).")
@@ -34,24 +118,31 @@ def validate_and_create_operation(request, new_data):
         raise ValidationError("Для 'Списания' необходимо указать объект-источник (from_facility).")
     if transaction_type == 'transfer' and (not from_facility or not to_facility):
         raise ValidationError("Для 'Перемещения' необходимо указать оба объекта.")
-    if not operation_date:
-        raise ValidationError("Дата операции (operation_date) обязательна.")
-    if request.user.role == 'engineer':
+    if user.role == 'engineer':
         if transaction_type in ['add', 'transfer']:
             raise ValidationError("Инженер может выполнять только операции списания.")
-        if from_facility and from_facility.id != request.user.related_facility_id:
+        if from_facility and from_facility.id != user.related_facility_id:
             raise ValidationError("Инженер может списывать реагенты только со своего объекта.")
 
     # 2. Валидация массива реагентов
     items = new_data.get('items', [])
     if isinstance(items, str): # Если пришел JSON-строкой из FormData
-        items = json.loads(items)
+        try:
+            items = json.loads(items)
+        except ValueError:
+            raise ValidationError('Поле "items" должно быть JSON-массивом.')
     if not isinstance(items, list) or not items: 
         raise ValidationError('Поле "items" должно быть непустым массивом.')
     
     transactions_data = []
     for item in items:
-        chemical_id = item.get('chemicalId')
+        if not isinstance(item, dict):
+            raise ValidationError('Каждый элемент "items" должен быть объектом с chemicalId и quantity.')
+        try:
+            # FormData может прислать id строкой - приводим, чтобы пары (объект, реагент) совпадали
+            chemical_id = int(item.get('chemicalId'))
+        except (TypeError, ValueError):
+            raise ValidationError(f'Некорректный реагент: "{item.get("chemicalId")}".')
         quantity_str = str(item.get('quantity')) # Приводим к строке для Decimal
         try:
             quantity_decimal = Decimal(quantity_str)
@@ -60,21 +151,19 @@ def validate_and_create_operation(request, new_data):
             raise ValidationError(f'Количество "{quantity_str}" должно быть положительным числом.')
         transactions_data.append({'chemical_id': chemical_id, 'quantity': quantity_decimal})
 
-    # 3. Создание транзакций
-    created_transactions = []
+    # 3. Транзакции операции (сохраняет вызывающий код)
     operation_id = uuid.uuid4()
-    for data in transactions_data:
-        tx = Transaction.objects.create(
+    return [
+        Transaction(
             operation_uuid=operation_id,
             transaction_type=transaction_type,
             from_facility=from_facility,
             to_facility=to_facility,
             comment=comment,
-            document_file=new_data.get('document_file'), # Берем напрямую из new_data
+            document_file=new_data.get('document_file'), # FormData передаст файл, JSON - нет
             operation_date=operation_date,
-            performed_by=request.user,
+            performed_by_id=user.id, # id берется из токена без загрузки User
             **data
         )
-        created_transactions.append(tx)
-    
-    return created_transactions
\ No newline at end of file
+        for data in transactions_data
+    ]
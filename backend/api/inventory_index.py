@@ -0,0 +1,295 @@
+# backend/api/inventory_index.py
+# Остатки всех пар (объект, реагент) в памяти воркера (INVENTORY_INDEX_ENABLED).
+# Матрица плотная: массив int64 (количество в сотых, без потери точности)
+# размером объекты x реагенты плюс bytearray "есть строка Inventory",
+# id объекта и реагента переводятся в строку и колонку словарями.
+# На 1000 x 1000 пар это ~9 МБ; если матрица больше INVENTORY_INDEX_MAX_CELLS,
+# индекс не строится и запросы идут в БД.
+#
+# Индекс догоняет БД по журналу изменений (ChangeLogEntry - та же версия,
+# что у /api/sync/): перечитываются только строки Inventory, изменившиеся
+# после загруженной версии. Проверка не чаще раза в INVENTORY_INDEX_MAX_LAG
+# секунд, а после операции в этом воркере - сразу. Новые или удаленные
+# объекты и реагенты перестраивают индекс целиком.
+import logging
+import threading
+import time
+from array import array
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Count, Max, Min, Q, Sum
+
+from .db_routers import primary
+from .models import ChangeLogEntry, Chemical, Facility, Inventory
+
+logger = logging.getLogger(__name__)
+
+REBUILD_MODELS = (ChangeLogEntry.Model.FACILITY, ChangeLogEntry.Model.CHEMICAL)
+INDEX_MODELS = (ChangeLogEntry.Model.INVENTORY, *REBUILD_MODELS)
+# Больше изменений остатков за раз - дешевле перечитать все остатки
+CATCH_UP_LIMIT = 20000
+# Итоги по части объектов считаются по матрице, если ячеек не больше этого, иначе - в БД
+PARTIAL_TOTALS_MAX_CELLS = 200_000
+OVERSIZED_RECHECK_SECONDS = 300
+
+
+def enabled():
+    return getattr(settings, 'INVENTORY_INDEX_ENABLED', False)
+
+
+class _Matrix:
+    """
+    Снимок остатков: строки - объекты, колонки - реагенты.
+    Итоги по колонкам (сумма, сколько строк есть и сколько > 0) ведутся в put(),
+    поэтому итоги по всем объектам не требуют обхода матрицы.
+    """
+
+    def __init__(self, facility_ids, chemical_ids, scale):
+        self.rows = {pk: index for index, pk in enumerate(facility_ids)}
+        self.cols = {pk: index for index, pk in enumerate(chemical_ids)}
+        self.chemical_ids = list(chemical_ids)
+        self.width = len(chemical_ids)
+        cells = len(facility_ids) * self.width
+        self.values = array('q', bytes(8 * cells))
+        self.present = bytearray(cells)
+        self.col_totals = [0] * self.width
+        self.col_present = [0] * self.width
+        self.col_stocked = [0] * self.width
+        self.scale = scale
+        self.version = 0
+
+    def _cell(self, facility_id, chemical_id):
+        row, col = self.rows.get(facility_id), self.cols.get(chemical_id)
+        if row is None or col is None:
+            return None
+        return row * self.width + col
+
+    def put(self, facility_id, chemical_id, quantity):
+        cell = self._cell(facility_id, chemical_id)
+        if cell is None:
+            return False
+        col = cell % self.width
+        value = int(quantity.scaleb(self.scale))
+        if self.present[cell]:
+            old = self.values[cell]
+            self.col_totals[col] -= old
+            self.col_stocked[col] -= old > 0
+        else:
+            self.present[cell] = 1
+            self.col_present[col] += 1
+        self.values[cell] = value
+        self.col_totals[col] += value
+        self.col_stocked[col] += value > 0
+        return True
+
+    def _decimal(self, value):
+        return Decimal(value).scaleb(-self.scale)
+
+    def quantity(self, facility_id, chemical_id):
+        cell = self._cell(facility_id, chemical_id)
+        if cell is None or not self.present[cell]:
+            return None
+        return self._decimal(self.values[cell])
+
+    def facility_row(self, facility_id, in_stock=False):
+        """[(chemical_id, количество)] по строкам Inventory объекта; in_stock - только > 0."""
+        row = self.rows.get(facility_id)
+        if row is None:
+            return []
+        start = row * self.width
+        values, present = self.values, self.present
+        return [
+            (self.chemical_ids[col], self._decimal(values[start + col]))
+            for col in range(self.width)
+            if present[start + col] and (not in_stock or values[start + col] > 0)
+        ]
+
+    def chemical_totals(self, facility_ids=None):
+        """
+        {chemical_id: (сумма, на скольких объектах > 0)} по всем или перечисленным
+        объектам; None - перечислено слишком много объектов, считать в БД.
+        """
+        if facility_ids is None:
+            return {
+                self.chemical_ids[col]: (self._decimal(self.col_totals[col]), self.col_stocked[col])
+                for col in range(self.width) if self.col_present[col]
+            }
+        rows = [self.rows[pk] for pk in facility_ids if pk in self.rows]
+        if len(rows) * self.width > PARTIAL_TOTALS_MAX_CELLS:
+            return None
+        totals = [0] * self.width
+        stocked = [0] * self.width
+        present_any = [False] * self.width
+        values, present, width = self.values, self.present, self.width
+        for row in rows:
+            start = row * width
+            for col in range(width):
+                if present[start + col]:
+                    value = values[start + col]
+                    totals[col] += value
+                    present_any[col] = True
+                    if value > 0:
+                        stocked[col] += 1
+        return {
+            self.chemical_ids[col]: (self._decimal(totals[col]), stocked[col])
+            for col in range(width) if present_any[col]
+        }
+
+
+class InventoryIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._checked_at = 0.0
+        self._stale = True
+        # Когда матрица не помещается в лимит, размеры перепроверяются не чаще этого момента
+        self._oversized_until = 0.0
+
+    @property
+    def max_lag(self):
+        return getattr(settings, 'INVENTORY_INDEX_MAX_LAG', 1.0)
+
+    @staticmethod
+    def _settled_version(since=0):
+        """
+        Последняя версия журнала, до которой все записи уже закоммичены: дальше
+        неосевших записей не продвигаемся (как в sync, см. services.sync_horizon).
+        """
+        # Импорт здесь: services сам импортирует этот модуль
+        from .services import sync_horizon
+        horizon = sync_horizon()
+        latest = ChangeLogEntry.objects.filter(id__gt=since).aggregate(
+            value=Max('id'), unsettled=Min('id', filter=Q(changed_at__gt=horizon)),
+        )
+        if latest['unsettled'] is not None:
+            return latest['unsettled'] - 1
+        return latest['value'] or since
+
+    def _build(self):
+        facility_ids = list(Facility.objects.order_by('pk').values_list('pk', flat=True))
+        chemical_ids = list(Chemical.objects.order_by('pk').values_list('pk', flat=True))
+        cells = len(facility_ids) * len(chemical_ids)
+        limit = getattr(settings, 'INVENTORY_INDEX_MAX_CELLS', 5_000_000)
+        if cells > limit:
+            logger.warning("Индекс остатков не построен: %s ячеек больше лимита %s", cells, limit)
+            return None
+        # Версия берется до чтения остатков: изменения во время чтения придут повторно
+        version = self._settled_version()
+        matrix = _Matrix(facility_ids, chemical_ids, Inventory._meta.get_field('quantity').decimal_places)
+        rows = Inventory.objects.values_list('facility_id', 'chemical_id', 'quantity')
+        for facility_id, chemical_id, quantity in rows.iterator(chunk_size=5000):
+            matrix.put(facility_id, chemical_id, quantity)
+        matrix.version = version
+        return matrix
+
+    def _catch_up(self, matrix):
+        """Применяет к матрице изменения журнала; False - нужна полная перестройка."""
+        oldest = ChangeLogEntry.objects.aggregate(value=Min('id'))['value']
+        if oldest is not None and matrix.version < oldest - 1:
+            return False  # журнал уже очищен (prune_changelog)
+        # Как и в _build, версия берется до чтения строк
+        version = self._settled_version(matrix.version)
+        if version <= matrix.version:
+            return True
+        # Записи об операциях (в том числе удаления при правке и закрытии периода) индексу не нужны
+        entries = list(
+            ChangeLogEntry.objects.filter(id__gt=matrix.version, id__lte=version, model__in=INDEX_MODELS)
+            .values_list('model', 'object_id', 'deleted')[:CATCH_UP_LIMIT + 1]
+        )
+        # Удаление строки Inventory бывает только вместе с объектом или реагентом
+        if len(entries) > CATCH_UP_LIMIT or any(
+            model in REBUILD_MODELS or (deleted and model == ChangeLogEntry.Model.INVENTORY)
+            for model, _, deleted in entries
+        ):
+            return False
+        inventory_ids = {object_id for _, object_id, _ in entries}
+        if inventory_ids:
+            rows = Inventory.objects.filter(pk__in=inventory_ids).values_list('facility_id', 'chemical_id', 'quantity')
+            for facility_id, chemical_id, quantity in rows:
+                if not matrix.put(facility_id, chemical_id, quantity):
+                    return False
+        matrix.version = version
+        return True
+
+    def matrix(self):
+        """Актуальный снимок или None (индекс выключен или слишком велик)."""
+        if not enabled():
+            return None
+        now = time.monotonic()
+        matrix = self._matrix
+        if matrix is None and now < self._oversized_until:
+            return None
+        if matrix is not None and not self._stale and now - self._checked_at < self.max_lag:
+            return matrix
+        with self._lock:
+            matrix = self._matrix
+            if matrix is not None and not self._stale and now - self._checked_at < self.max_lag:
+                return matrix
+            self._stale = False
+            with primary():
+                if matrix is None or not self._catch_up(matrix):
+                    matrix = self._build()
+            self._matrix, self._checked_at = matrix, time.monotonic()
+            if matrix is None:
+                self._oversized_until = self._checked_at + OVERSIZED_RECHECK_SECONDS
+            return matrix
+
+    def mark_stale(self):
+        self._stale = True
+
+    def warm(self):
+        if enabled():
+            self.matrix()
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+
+
+inventory_index = InventoryIndex()
+
+
+def mark_stale_on_commit():
+    """После записи остатков в этом воркере индекс догоняет журнал на следующем чтении."""
+    db_transaction.on_commit(inventory_index.mark_stale)
+
+
+# --- Запросы: из индекса, если он включен, иначе из БД ---
+
+def stock_quantities(facility_id, chemical_ids, use_index=True):
+    """{chemical_id: остаток} объекта по перечисленным реагентам (нет строки - 0)."""
+    matrix = inventory_index.matrix() if use_index else None
+    if matrix is not None:
+        return {pk: matrix.quantity(facility_id, pk) or Decimal(0) for pk in chemical_ids}
+    rows = dict(Inventory.objects.filter(facility_id=facility_id, chemical_id__in=chemical_ids)
+                .values_list('chemical_id', 'quantity'))
+    return {pk: rows.get(pk, Decimal(0)) for pk in chemical_ids}
+
+
+def facility_stock(facility_id, in_stock=True, use_index=True):
+    """[(chemical_id, остаток)] объекта; in_stock - только положительные остатки."""
+    matrix = inventory_index.matrix() if use_index else None
+    if matrix is not None:
+        return matrix.facility_row(facility_id, in_stock)
+    rows = Inventory.objects.filter(facility_id=facility_id)
+    if in_stock:
+        rows = rows.filter(quantity__gt=0)
+    return list(rows.order_by('chemical_id').values_list('chemical_id', 'quantity'))
+
+
+def stock_totals(facility_ids=None, use_index=True):
+    """{chemical_id: (сумма остатков, на скольких объектах > 0)} по всем или перечисленным объектам."""
+    matrix = inventory_index.matrix() if use_index else None
+    totals = matrix.chemical_totals(facility_ids) if matrix is not None else None
+    if totals is not None:
+        return totals
+    rows = Inventory.objects.all()
+    if facility_ids is not None:
+        rows = rows.filter(facility_id__in=facility_ids)
+    rows = rows.values('chemical_id').annotate(
+        total=Sum('quantity'), stocked=Count('id', filter=Q(quantity__gt=0)),
+    ).order_by('chemical_id')
+    return {row['chemical_id']: (row['total'], row['stocked']) for row in rows}
@@ -0,0 +1,24 @@
+# backend/api/management/commands/prune_changelog.py
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет старые записи журнала изменений (дельта-синхронизация). "
+        "Клиенты, не синхронизировавшиеся дольше срока хранения, получат полный снимок."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=30, help="Сколько дней хранить записи (по умолчанию 30).")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['keep_days'])
+        latest = ChangeLogEntry.objects.order_by('-id').values_list('id', flat=True).first()
+        # Последняя запись остается всегда: по ней клиенты узнают текущую версию
+        deleted, _ = ChangeLogEntry.objects.filter(changed_at__lt=cutoff).exclude(id=latest).delete()
+        self.stdout.write(self.style.SUCCESS(f"Готово: удалено {deleted} записей журнала изменений."))
@@ -0,0 +1,21 @@
+# backend/api/management/commands/rebuild_cost_layers.py
+from django.core.management.base import BaseCommand
+
+from api.costing import rebuild_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Перестраивает FIFO-партии и списания партий из журнала (включая архив). "
+        "Нужно после первичного развертывания и после правок транзакций через админку."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chemical', type=int, action='append', dest='chemical_ids',
+            help="ID реагента (можно указать несколько раз). По умолчанию - все реагенты.",
+        )
+
+    def handle(self, *args, **options):
+        rebuild_all(options['chemical_ids'])
+        self.stdout.write(self.style.SUCCESS("Готово: партии пересобраны."))
@@ -0,0 +1,21 @@
+# backend/api/management/commands/rebuild_rollups.py
+from django.core.management.base import BaseCommand
+
+from api.services import rebuild_monthly_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Перестраивает месячные агрегаты (MonthlyRollup) из журнала транзакций. "
+        "Нужно после первичного развертывания и после правок транзакций через админку."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--facility', type=int, action='append', dest='facility_ids',
+            help="ID объекта (можно указать несколько раз). По умолчанию - все объекты.",
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild_monthly_rollups(options['facility_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Готово: создано {created} строк агрегатов."))
@@ -0,0 +1,84 @@
+# backend/api/management/commands/reconcile_inventory.py
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from api.models import Chemical, Facility
+
+
+def _init_worker():
+    # Каждый процесс открывает собственное подключение к БД
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.db import connections
+    connections.close_all()
+
+
+def _reconcile_chunk(facility_ids, repair):
+    from api.services import reconcile_facilities
+    return facility_ids, reconcile_facilities(facility_ids, repair=repair)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет Inventory.quantity с журналом транзакций для всех пар (объект, реагент). "
+        "Объекты делятся на пачки и обрабатываются пулом процессов. "
+        "С --repair расхождения исправляются. Безопасно запускать при работающем API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help="Исправить найденные расхождения.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Число процессов.")
+        parser.add_argument('--chunk-size', type=int, default=20, help="Объектов в одной пачке.")
+        parser.add_argument(
+            '--facility', type=int, action='append', dest='facility_ids',
+            help="ID объекта (можно указать несколько раз). По умолчанию - все объекты.",
+        )
+        parser.add_argument('--show', type=int, default=50, help="Сколько расхождений вывести.")
+
+    def handle(self, *args, **options):
+        facility_ids = options['facility_ids'] or list(Facility.objects.order_by('pk').values_list('pk', flat=True))
+        size = max(1, options['chunk_size'])
+        chunks = [facility_ids[i:i + size] for i in range(0, len(facility_ids), size)]
+        repair = options['repair']
+
+        drift = []
+        if options['workers'] <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                drift += _reconcile_chunk(chunk, repair)[1]
+        else:
+            # Соединение родителя не должно наследоваться дочерними процессами
+            from django.db import connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                futures = [pool.submit(_reconcile_chunk, chunk, repair) for chunk in chunks]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    drift += future.result()[1]
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"  пачка {done}/{len(chunks)} готова")
+
+        self._report(drift, len(facility_ids), options['show'], repair)
+
+    def _report(self, drift, facility_count, show, repair):
+        if not drift:
+            self.stdout.write(self.style.SUCCESS(f"Проверено объектов: {facility_count}. Расхождений нет."))
+            return
+
+        shown = sorted(drift)[:show]
+        facilities = Facility.objects.in_bulk({row[0] for row in shown})
+        chemicals = Chemical.objects.in_bulk({row[1] for row in shown})
+        for facility_id, chemical_id, stored, expected in shown:
+            self.stdout.write(
+                f"{facilities.get(facility_id, facility_id)} / {chemicals.get(chemical_id, chemical_id)}: "
+                f"в Inventory {'нет строки' if stored is None else stored}, по журналу {expected}"
+            )
+        if len(drift) > show:
+            self.stdout.write(f"... и еще {len(drift) - show}")
+
+        message = f"Проверено объектов: {facility_count}. Расхождений: {len(drift)}."
+        if repair:
+            self.stdout.write(self.style.SUCCESS(message + " Исправлено."))
+        else:
+            self.stdout.write(self.style.WARNING(message + " Запустите с --repair, чтобы исправить."))
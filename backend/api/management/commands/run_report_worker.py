@@ -0,0 +1,39 @@
+# backend/api/management/commands/run_report_worker.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.report_jobs import claim_next_job, prune_jobs, run_job
+
+# Как часто (секунд) удалять старые выгрузки
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        "Воркер фоновых выгрузок отчетов: забирает задания из таблицы ReportJob "
+        "и сохраняет файлы. Можно запустить несколько воркеров."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2, help="Пауза между опросами пустой очереди, секунд (по умолчанию 2).")
+        parser.add_argument('--once', action='store_true', help="Выполнить все задания из очереди и выйти.")
+
+    def handle(self, *args, **options):
+        keep_days = getattr(settings, 'REPORT_JOB_RETENTION_DAYS', 7)
+        pruned_at = 0
+        while True:
+            close_old_connections()
+            if time.monotonic() - pruned_at > PRUNE_INTERVAL:
+                prune_jobs(keep_days)
+                pruned_at = time.monotonic()
+            job = claim_next_job()
+            if job is not None:
+                job = run_job(job)
+                self.stdout.write(f"Выгрузка #{job.pk}: {job.get_status_display()}")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
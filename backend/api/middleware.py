@@ -0,0 +1,66 @@
+# backend/api/middleware.py
+import cProfile
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_routers import pin_to_primary
+from .profiling import (QueryRecorder, admin_user, is_flagged, profiler_lock,
+                        save_profile)
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaPinningMiddleware:
+    """
+    После успешного изменяющего запроса закрепляет пользователя за основной
+    БД на короткое время, чтобы он сразу видел свои изменения (read-your-writes).
+    request.user к этому моменту уже выставлен DRF-аутентификацией.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.id)
+        return response
+
+
+class RequestProfilerMiddleware:
+    """Запускает запрос под профилировщиком, если его пометил администратор."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILER_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_flagged(request):
+            return self.get_response(request)
+        user = admin_user(request)
+        if user is None or not profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler, recorder = cProfile.Profile(), QueryRecorder()
+            started = time.perf_counter()
+            with recorder.capture():
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+            duration = time.perf_counter() - started
+        finally:
+            profiler_lock.release()
+        try:
+            response['X-Profile-Id'] = str(save_profile(request, response, user, profiler, recorder, duration).pk)
+        except Exception:
+            logger.exception("Не удалось сохранить профиль запроса %s", request.path)
+        return response
@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-19 09:00
+
+from django.db import migrations
+
+
+# Триграммные GIN-индексы по UPPER(name): PostgreSQL использует их и для
+# префиксного (ILIKE 'abc%'), и для подстрочного (ILIKE '%abc%') поиска.
+# На SQLite (локальная разработка) индекс не создается.
+INDEXES = (
+    ('api_chemical', 'api_chemical_name_trgm_idx'),
+    ('api_facility', 'api_facility_name_trgm_idx'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, index in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index} ON {table} '
+            f'USING gin (UPPER(name::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _table, index in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_remove_transaction_is_cancelled_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
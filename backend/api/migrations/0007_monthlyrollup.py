@@ -0,0 +1,65 @@
+# Generated by Django 4.2 on 2026-10-19 16:06
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_rollups(apps, schema_editor):
+    # Первичное заполнение агрегатов по уже накопленному журналу
+    Transaction = apps.get_model('api', 'Transaction')
+    MonthlyRollup = apps.get_model('api', 'MonthlyRollup')
+
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    for side, column in (('to_facility', 0), ('from_facility', 1)):
+        rows = Transaction.objects.filter(**{f'{side}__isnull': False}).annotate(
+            month=TruncMonth('operation_date')
+        ).values(side, 'chemical', 'month', 'transaction_type').annotate(total=Sum('quantity')).order_by()
+        for row in rows:
+            month = row['month']
+            month = month.date() if hasattr(month, 'date') else month
+            totals[(row[side], row['chemical'], month, row['transaction_type'])][column] += row['total']
+
+    MonthlyRollup.objects.bulk_create([
+        MonthlyRollup(facility_id=f, chemical_id=c, month=m, transaction_type=t, income=i, outcome=o)
+        for (f, c, m, t), (i, o) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц (первое число)')),
+                ('transaction_type', models.CharField(choices=[('add', 'Поступление'), ('consume', 'Списание'), ('transfer', 'Перемещение')], max_length=10, verbose_name='Тип транзакции')),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Приход')),
+                ('outcome', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Расход')),
+                ('chemical', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='api.chemical', verbose_name='Реагент')),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='api.facility', verbose_name='Объект')),
+            ],
+            options={
+                'verbose_name': 'Месячный итог',
+                'verbose_name_plural': 'Месячные итоги',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='monthlyrollup',
+            index=models.Index(fields=['facility', 'month'], name='rollup_facility_month_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='monthlyrollup',
+            unique_together={('facility', 'chemical', 'month', 'transaction_type')},
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_monthlyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия токенов'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2 on 2026-10-19 16:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_user_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('closed_before', models.DateTimeField(verbose_name='Закрыто все до')),
+                ('closed_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата закрытия')),
+                ('archived_count', models.PositiveIntegerField(default=0, verbose_name='Перенесено в архив')),
+                ('closed_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Закрыл')),
+            ],
+            options={
+                'verbose_name': 'Закрытый период',
+                'verbose_name_plural': 'Закрытые периоды',
+                'ordering': ['-closed_before'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('transaction_type', models.CharField(choices=[('add', 'Поступление'), ('consume', 'Списание'), ('transfer', 'Перемещение')], max_length=10, verbose_name='Тип транзакции')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Количество')),
+                ('timestamp', models.DateTimeField(verbose_name='Время создания записи')),
+                ('operation_date', models.DateTimeField(db_index=True, verbose_name='Дата и время операции')),
+                ('document_name', models.CharField(blank=True, max_length=255, verbose_name='Название документа')),
+                ('document_file', models.FileField(blank=True, null=True, upload_to='documents/%Y/%m/%d/', verbose_name='Файл документа')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий')),
+                ('operation_uuid', models.UUIDField(db_index=True, verbose_name='ID операции')),
+                ('archived_in', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='api.closedperiod', verbose_name='Закрытый период')),
+                ('chemical', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_transactions', to='api.chemical', verbose_name='Реагент')),
+                ('from_facility', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_transactions_from', to='api.facility', verbose_name='Из объекта')),
+                ('performed_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_transactions', to=settings.AUTH_USER_MODEL, verbose_name='Выполнил')),
+                ('to_facility', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_transactions_to', to='api.facility', verbose_name='В объект')),
+            ],
+            options={
+                'verbose_name': 'Архивная транзакция',
+                'verbose_name_plural': 'Архивные транзакции',
+                'ordering': ['-operation_uuid', '-timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CarryForwardBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Количество')),
+                ('as_of', models.DateTimeField(verbose_name='На дату')),
+                ('chemical', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='carry_forward', to='api.chemical', verbose_name='Реагент')),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='carry_forward', to='api.facility', verbose_name='Объект')),
+            ],
+            options={
+                'verbose_name': 'Входящий остаток',
+                'verbose_name_plural': 'Входящие остатки',
+                'unique_together': {('facility', 'chemical')},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-19 16:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_period_closing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Остаток при срабатывании')),
+                ('min_quantity', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Порог')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Сработало')),
+                ('resolved_at', models.DateTimeField(blank=True, null=True, verbose_name='Восстановлено')),
+                ('acknowledged_at', models.DateTimeField(blank=True, null=True, verbose_name='Просмотрено')),
+                ('acknowledged_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Просмотрел')),
+                ('chemical', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='api.chemical', verbose_name='Реагент')),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='api.facility', verbose_name='Объект')),
+            ],
+            options={
+                'verbose_name': 'Оповещение об остатке',
+                'verbose_name_plural': 'Оповещения об остатках',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockThreshold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_quantity', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Минимальный остаток')),
+                ('chemical', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_thresholds', to='api.chemical', verbose_name='Реагент')),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_thresholds', to='api.facility', verbose_name='Объект')),
+            ],
+            options={
+                'verbose_name': 'Порог остатка',
+                'verbose_name_plural': 'Пороги остатков',
+                'unique_together': {('facility', 'chemical')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockalert',
+            index=models.Index(fields=['acknowledged_at', '-created_at'], name='stockalert_ack_created_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-19 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_stock_thresholds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('transaction', 'Транзакция'), ('inventory', 'Остаток'), ('facility', 'Объект'), ('chemical', 'Реагент')], max_length=20, verbose_name='Таблица')),
+                ('object_id', models.BigIntegerField(verbose_name='ID записи')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удалена')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+            },
+        ),
+    ]
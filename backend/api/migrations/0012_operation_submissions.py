@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-19 16:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperationSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64, verbose_name='Ключ идемпотентности')),
+                ('operation_uuid', models.UUIDField(verbose_name='ID операции')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Принята')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='operation_submissions', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Отправленная операция',
+                'verbose_name_plural': 'Отправленные операции',
+                'unique_together': {('user', 'idempotency_key')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_operation_submissions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='operation_date',
+            field=models.DateTimeField(db_index=True, verbose_name='Дата и время операции'),
+        ),
+    ]
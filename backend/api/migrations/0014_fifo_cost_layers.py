@@ -0,0 +1,159 @@
+# Generated by Django 4.2 on 2026-10-19 16:37
+
+from collections import defaultdict, deque
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+ORDERING = ('operation_date', 'timestamp', 'id')
+FIELDS = ('id', 'transaction_type', 'quantity', 'from_facility_id', 'to_facility_id', 'operation_date')
+
+
+def populate_cost_layers(apps, schema_editor):
+    # Первичное заполнение партий проигрыванием журнала (архив плюс живые
+    # транзакции), по тем же правилам, что costing._replay. Цены реагентов
+    # только что добавлены со значением 0, поэтому цены партий нулевые:
+    # после ввода цен - manage.py rebuild_cost_layers.
+    Chemical = apps.get_model('api', 'Chemical')
+    Transaction = apps.get_model('api', 'Transaction')
+    ArchivedTransaction = apps.get_model('api', 'ArchivedTransaction')
+    CostLayer = apps.get_model('api', 'CostLayer')
+    CostAllocation = apps.get_model('api', 'CostAllocation')
+
+    for chemical in Chemical.objects.all():
+        archived = ArchivedTransaction.objects.filter(chemical=chemical).order_by(*ORDERING).values(*FIELDS)
+        live = Transaction.objects.filter(chemical=chemical).order_by(*ORDERING).values(*FIELDS)
+        queues, deficits = defaultdict(deque), defaultdict(deque)
+        layers, allocations = [], []
+
+        def allocate(tx, facility_id, layer, quantity, live_tx):
+            allocations.append(CostAllocation(
+                transaction_id=tx['id'] if live_tx else None, layer=layer, facility_id=facility_id,
+                chemical=chemical, transaction_type=tx['transaction_type'],
+                operation_date=tx['operation_date'], quantity=quantity, unit_cost=layer.unit_cost,
+            ))
+
+        def new_layer(tx, facility_id, kind, quantity, unit_cost, live_tx):
+            layer = CostLayer(
+                facility_id=facility_id, chemical=chemical, kind=kind,
+                source_transaction_id=tx['id'] if live_tx else None, received_at=tx['operation_date'],
+                unit_cost=unit_cost, quantity=quantity, remaining=quantity,
+            )
+            layers.append(layer)
+            return layer
+
+        def take(tx, facility_id, live_tx):
+            need, parts = tx['quantity'], []
+            queue = queues[facility_id]
+            while need > 0 and queue:
+                layer = queue[0]
+                used = min(layer.remaining, need)
+                layer.remaining -= used
+                need -= used
+                parts.append((used, layer.unit_cost))
+                allocate(tx, facility_id, layer, used, live_tx)
+                if layer.remaining == 0:
+                    queue.popleft()
+            if need > 0:
+                deficit = new_layer(tx, facility_id, 'deficit', -need, chemical.price, live_tx)
+                deficits[facility_id].append(deficit)
+                parts.append((need, chemical.price))
+                allocate(tx, facility_id, deficit, need, live_tx)
+            return parts
+
+        def receive(tx, facility_id, layer, live_tx):
+            pending = deficits[facility_id]
+            while pending and layer.remaining > 0:
+                deficit = pending[0]
+                settled = min(-deficit.remaining, layer.remaining)
+                deficit.remaining += settled
+                layer.remaining -= settled
+                allocate(tx, facility_id, deficit, -settled, live_tx)
+                if deficit.remaining == 0:
+                    pending.popleft()
+            if layer.remaining > 0:
+                queues[facility_id].append(layer)
+
+        for live_tx, rows in ((False, archived), (True, live)):
+            for tx in rows.iterator():
+                if tx['transaction_type'] == 'add':
+                    layer = new_layer(tx, tx['to_facility_id'], 'receipt', tx['quantity'], chemical.price, live_tx)
+                    receive(tx, tx['to_facility_id'], layer, live_tx)
+                elif tx['transaction_type'] == 'consume':
+                    take(tx, tx['from_facility_id'], live_tx)
+                elif tx['transaction_type'] == 'transfer':
+                    for used, unit_cost in take(tx, tx['from_facility_id'], live_tx):
+                        layer = new_layer(tx, tx['to_facility_id'], 'transfer', used, unit_cost, live_tx)
+                        receive(tx, tx['to_facility_id'], layer, live_tx)
+
+        # Партии сохраняются раньше списаний, которые на них ссылаются
+        CostLayer.objects.bulk_create(layers, batch_size=1000)
+        CostAllocation.objects.bulk_create(allocations, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_transaction_operation_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chemical',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Цена за единицу'),
+        ),
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Поступление'), ('transfer', 'Перемещение'), ('deficit', 'Недостача')], max_length=10, verbose_name='Источник партии')),
+                ('received_at', models.DateTimeField(verbose_name='Дата поступления')),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Цена за единицу')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Количество в партии')),
+                ('remaining', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Остаток партии')),
+                ('chemical', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='api.chemical', verbose_name='Реагент')),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='api.facility', verbose_name='Объект')),
+                ('source_transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cost_layers', to='api.transaction', verbose_name='Транзакция-источник')),
+            ],
+            options={
+                'verbose_name': 'Партия (FIFO)',
+                'verbose_name_plural': 'Партии (FIFO)',
+            },
+        ),
+        migrations.CreateModel(
+            name='CostAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('add', 'Поступление'), ('consume', 'Списание'), ('transfer', 'Перемещение')], max_length=10, verbose_name='Тип транзакции')),
+                ('operation_date', models.DateTimeField(verbose_name='Дата операции')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Количество')),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Цена за единицу')),
+                ('chemical', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_allocations', to='api.chemical', verbose_name='Реагент')),
+                ('facility', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_allocations', to='api.facility', verbose_name='Объект')),
+                ('layer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='allocations', to='api.costlayer', verbose_name='Партия')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cost_allocations', to='api.transaction', verbose_name='Транзакция')),
+            ],
+            options={
+                'verbose_name': 'Списание партии (FIFO)',
+                'verbose_name_plural': 'Списания партий (FIFO)',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='costlayer',
+            index=models.Index(fields=['chemical', 'received_at'], name='costlayer_chemical_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='costlayer',
+            index=models.Index(fields=['facility', 'chemical'], name='costlayer_facility_chem_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='costallocation',
+            index=models.Index(fields=['chemical', 'operation_date'], name='costalloc_chemical_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='costallocation',
+            index=models.Index(fields=['facility', 'operation_date'], name='costalloc_facility_date_idx'),
+        ),
+        migrations.RunPython(populate_cost_layers, migrations.RunPython.noop),
+    ]
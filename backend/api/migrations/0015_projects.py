@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-19 16:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_fifo_cost_layers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Project',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Название проекта')),
+                ('start_date', models.DateField(verbose_name='Дата начала')),
+                ('end_date', models.DateField(blank=True, null=True, verbose_name='Дата окончания')),
+                ('status', models.CharField(choices=[('planning', 'Планируется'), ('in_progress', 'В работе'), ('completed', 'Завершен'), ('on_hold', 'Приостановлен')], default='planning', max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('facilities', models.ManyToManyField(blank=True, related_name='projects', to='api.facility', verbose_name='Объекты')),
+            ],
+            options={
+                'verbose_name': 'Проект',
+                'verbose_name_plural': 'Проекты',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectBudgetLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('planned_quantity', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Плановое количество')),
+                ('chemical', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='budget_lines', to='api.chemical', verbose_name='Реагент')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_lines', to='api.project', verbose_name='Проект')),
+            ],
+            options={
+                'verbose_name': 'Строка плана проекта',
+                'verbose_name_plural': 'План проекта',
+                'unique_together': {('project', 'chemical')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2 on 2026-10-19 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_projects'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=2000, verbose_name='Путь')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('duration_ms', models.FloatField(verbose_name='Длительность, мс')),
+                ('query_count', models.PositiveIntegerField(verbose_name='SQL-запросов')),
+                ('query_time_ms', models.FloatField(verbose_name='Время SQL, мс')),
+                ('size', models.PositiveIntegerField(verbose_name='Размер, байт')),
+                ('data', models.JSONField(verbose_name='Профиль')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+            },
+        ),
+    ]
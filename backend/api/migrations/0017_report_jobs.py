@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-19 16:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_request_profiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerRevision',
+            fields=[
+                ('facility', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_revision', serialize=False, to='api.facility', verbose_name='Объект')),
+                ('revision', models.PositiveBigIntegerField(default=0, verbose_name='Версия журнала')),
+            ],
+            options={
+                'verbose_name': 'Версия журнала объекта',
+                'verbose_name_plural': 'Версии журнала объектов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('facility_detail', 'Отчет по объекту'), ('facility_batch', 'Отчет по объектам')], max_length=20, verbose_name='Отчет')),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'XLSX'), ('pdf', 'PDF')], max_length=10, verbose_name='Формат')),
+                ('params', models.JSONField(verbose_name='Параметры')),
+                ('fingerprint', models.CharField(db_index=True, max_length=64, verbose_name='Отпечаток')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начато')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('ledger_revisions', models.JSONField(default=dict, verbose_name='Версии журналов')),
+                ('file', models.FileField(blank=True, null=True, upload_to='reports/%Y/%m/%d/', verbose_name='Файл')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Создал')),
+            ],
+            options={
+                'verbose_name': 'Выгрузка отчета',
+                'verbose_name_plural': 'Выгрузки отчетов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reportjob',
+            index=models.Index(fields=['status', 'created_at'], name='reportjob_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('fingerprint',), name='reportjob_active_fingerprint_uniq'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-19 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_report_jobs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['from_facility', '-timestamp'], name='archivedtx_from_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['to_facility', '-timestamp'], name='archivedtx_to_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['from_facility', '-timestamp'], name='transaction_from_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['to_facility', '-timestamp'], name='transaction_to_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-19 17:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_role_scope_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelogentry',
+            name='facility',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.facility', verbose_name='Объект'),
+        ),
+        migrations.AddField(
+            model_name='changelogentry',
+            name='other_facility',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.facility', verbose_name='Второй объект'),
+        ),
+    ]
@@ -0,0 +1,198 @@
+# backend/api/mixins.py
+from django.core.files.storage import default_storage
+from django.db import models
+from rest_framework.exceptions import Throttled, ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from .db_routers import enable_replica_reads, is_pinned, reset_replica_reads
+from .models import Chemical, Facility
+from .permissions import facility_scope_q
+from .throttling import acquire_slot, heavy_limits, release_slot, retry_after
+
+# Справочники для колоночного формата: имя таблицы -> (модель, поля)
+LOOKUP_TABLES = {
+    'chemicals': (Chemical, ('name', 'unit_of_measurement', 'description', 'price')),
+    'facilities': (Facility, ('name', 'type', 'location', 'created_at')),
+}
+
+
+class SparseFieldsMixin:
+    """
+    Миксин для вьюсетов: выборочные поля и колоночный формат ответа.
+
+    ?fields=id,quantity,chemical - в ответе только эти поля, а из БД
+    читаются только нужные для них колонки (.only + select_related).
+
+    ?layout=columnar - список отдается массивами по колонкам:
+    {"count": N, "columns": {"id": [...], ...}, "lookups": {"chemicals": {...}}}.
+    Ссылки на реагенты и объекты в колонках заменяются их id, а сами
+    записи один раз кладутся в lookups. Строки читаются через values(),
+    минуя сериализатор.
+    """
+    # {поле сериализатора: [колонки модели, нужные для него]}
+    sparse_fields = {}
+    # {поле сериализатора: (путь для values(), таблица в lookups или None)}
+    columnar_columns = {}
+
+    def get_requested_fields(self):
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+        raw = self.request.query_params.get('fields')
+        if not raw:
+            return None
+        fields = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in self.sparse_fields]
+        if unknown:
+            raise ValidationError(f"Неизвестные поля: {', '.join(unknown)}.")
+        return fields
+
+    def is_columnar(self):
+        return self.request is not None and self.request.query_params.get('layout') == 'columnar'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields is None or self.is_columnar():
+            return queryset
+        columns = {column for name in fields for column in self.sparse_fields[name]}
+        relations = {column.split('__')[0] for column in columns if '__' in column}
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only('pk', *columns, *relations)
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_columnar():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = self.get_requested_fields() or list(self.columnar_columns)
+        return Response(self.get_columnar_payload(queryset, fields))
+
+    def get_columnar_payload(self, queryset, fields):
+        paths = [self.columnar_columns[name][0] for name in fields]
+        rows = list(queryset.values_list(*paths))
+        model = queryset.model
+
+        columns, lookup_ids = {}, {}
+        for index, name in enumerate(fields):
+            path, lookup = self.columnar_columns[name]
+            convert = self._converter(model, path)
+            values = [convert(row[index]) for row in rows]
+            columns[name] = values
+            if lookup:
+                lookup_ids.setdefault(lookup, set()).update(v for v in values if v is not None)
+
+        lookups = {}
+        for table, ids in lookup_ids.items():
+            lookup_model, lookup_fields = LOOKUP_TABLES[table]
+            lookups[table] = {
+                row.pop('id'): row
+                for row in lookup_model.objects.filter(pk__in=ids).values('id', *lookup_fields)
+            }
+        return {'count': len(rows), 'columns': columns, 'lookups': lookups}
+
+    def _converter(self, model, path):
+        # Значения приводятся к тому же виду, что выдает сериализатор
+        if '__' in path:
+            return lambda value: value
+        field = model._meta.get_field(path)
+        if isinstance(field, models.DecimalField):
+            return lambda value: None if value is None else str(value)
+        if isinstance(field, models.FileField):
+            def file_url(value):
+                if not value:
+                    return None
+                return self.request.build_absolute_uri(default_storage.url(value))
+            return file_url
+        return lambda value: value
+
+
+class ReplicaReadMixin:
+    """
+    Безопасные запросы к вьюхе (отчеты, списки) читают с реплики БД,
+    если пользователь не закреплен за основной БД после недавней записи.
+    Флаг чтения с реплики ставится в initial() (после аутентификации)
+    и сбрасывается в dispatch() в любом случае, в том числе при ошибке.
+    """
+    replica_reads = False
+    _replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned(request.user.id):
+            self._replica_token = enable_replica_reads()
+            self.replica_reads = True
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            token, self._replica_token = self._replica_token, None
+            if token is not None:
+                reset_replica_reads(token)
+
+
+class ConcurrencyLimitMixin:
+    """
+    Не больше HEAVY_CONCURRENCY[класс] одновременных запросов к тяжелым
+    вьюхам класса на хост. Лишний запрос сразу получает 429 с Retry-After.
+    Класс - get_concurrency_scope() (по умолчанию concurrency_scope).
+    Слот занимается в initial() (после аутентификации) и освобождается
+    в dispatch() в любом случае, в том числе при необработанной ошибке;
+    у потоковых ответов - когда поток дочитан.
+    """
+    concurrency_scope = None
+    _concurrency_slot = None
+
+    def get_concurrency_scope(self):
+        return self.concurrency_scope
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        scope = self.get_concurrency_scope()
+        if scope in heavy_limits():
+            self._concurrency_slot = acquire_slot(scope)
+            if self._concurrency_slot is None:
+                raise Throttled(wait=retry_after(), detail="Сервер занят тяжелыми запросами, повторите позже.")
+
+    def dispatch(self, request, *args, **kwargs):
+        response = None
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            return response
+        finally:
+            slot, self._concurrency_slot = self._concurrency_slot, None
+            if slot is not None:
+                if response is not None and response.streaming:
+                    response.streaming_content = self._release_after(response.streaming_content, slot)
+                else:
+                    release_slot(slot)
+
+    @staticmethod
+    def _release_after(content, slot):
+        try:
+            yield from content
+        finally:
+            release_slot(slot)
+
+
+class FacilityScopeMixin:
+    """
+    Ограничивает queryset объектами, видимыми пользователю (инженер - только
+    свой объект, см. permissions.visible_facility_ids): строка видна, если
+    на видимый объект указывает хотя бы одно из полей facility_scope_fields.
+    """
+    facility_scope_fields = ()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        condition = facility_scope_q(self.request.user, self.facility_scope_fields)
+        return queryset if condition is None else queryset.filter(condition)
+
@@ -34,6 +34,9 @@ class User(AbstractUser):
         verbose_name="Закрепленный объект",
         help_text="Обязательно для инженеров"
     )
+    # Версия выданных JWT: роль и объект зашиты в токен, поэтому при их смене
+    # версия увеличивается, и старые токены перестают приниматься.
+    token_version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Версия токенов")
 
 # --- Модель Объекта (склад, скважина) ---
 class Facility(models.Model):
@@ -42,6 +45,7 @@ class Facility(models.Model):
         WELL = 'well', 'Скважина'
         OTHER = 'other', 'Прочее'
 
+    # Для автодополнения по name есть триграммный индекс (см. миграцию 0006)
     name = models.CharField(max_length=255, verbose_name="Название объекта")
     type = models.CharField(max_length=20, choices=FacilityType.choices, verbose_name="Тип объекта")
     location = models.CharField(max_length=255, blank=True, verbose_name="Местоположение")
@@ -58,9 +62,12 @@ class Facility(models.Model):
 
 # --- Модель Реагента (справочник) ---
 class Chemical(models.Model):
+    # Для автодополнения по name есть триграммный индекс (см. миграцию 0006)
     name = models.CharField(max_length=255, unique=True, verbose_name="Название реагента")
     unit_of_measurement = models.CharField(max_length=50, verbose_name="Единица измерения (кг, л, шт)")
     description = models.TextField(blank=True, verbose_name="Описание")
+    # Цена за единицу: по ней оцениваются новые партии поступления (см. costing)
+    price = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Цена за единицу")
 
     class Meta:
         verbose_name = "Реагент"
@@ -104,7 +111,8 @@ class Transaction(models.Model):
 
     performed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Выполнил")
     timestamp = models.DateTimeField(default=timezone.now, verbose_name="Время создания записи")
-    operation_date = models.DateTimeField(verbose_name="Дата и время операции")
+    # Индекс нужен отчетам по периодам и навигации по датам в админке
+    operation_date = models.DateTimeField(db_index=True, verbose_name="Дата и время операции")
     
     document_name = models.CharField(max_length=255, blank=True, verbose_name="Название документа")
     # upload_to: файлы будут загружаться в папку media/documents/ГОД/МЕСЯЦ/ДЕНЬ/
@@ -118,6 +126,373 @@ class Transaction(models.Model):
         verbose_name = "Транзакция"
         verbose_name_plural = "Транзакции"
         ordering = ['-operation_uuid', '-timestamp']
+        # Журнал инженера - операции его объекта с любой стороны, новые сверху
+        indexes = [
+            models.Index(fields=['from_facility', '-timestamp'], name='transaction_from_ts_idx'),
+            models.Index(fields=['to_facility', '-timestamp'], name='transaction_to_ts_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.get_transaction_type_display()} - {self.chemical.name} ({self.quantity})"
\ No newline at end of file
+        return f"{self.get_transaction_type_display()} - {self.chemical.name} ({self.quantity})"
+
+# --- Месячные агрегаты движения реагентов (для отчетов) ---
+# Одна строка = приход/расход одного реагента на одном объекте за месяц
+# по одному типу транзакции. Поддерживается инкрементально во вьюхах
+# операций (services.apply_rollup_changes) и перестраивается командой
+# `python manage.py rebuild_rollups`.
+class MonthlyRollup(models.Model):
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='monthly_rollups', verbose_name="Объект")
+    chemical = models.ForeignKey(Chemical, on_delete=models.CASCADE, related_name='monthly_rollups', verbose_name="Реагент")
+    month = models.DateField(verbose_name="Месяц (первое число)")
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TransactionType.choices, verbose_name="Тип транзакции")
+    income = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Приход")
+    outcome = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Расход")
+
+    class Meta:
+        verbose_name = "Месячный итог"
+        verbose_name_plural = "Месячные итоги"
+        unique_together = ('facility', 'chemical', 'month', 'transaction_type')
+        indexes = [
+            models.Index(fields=['facility', 'month'], name='rollup_facility_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.facility_id}/{self.chemical_id} {self.month:%Y-%m} {self.transaction_type}: +{self.income} -{self.outcome}"
+
+
+# --- Закрытие периодов и архив журнала ---
+# Закрытие периода переносит все транзакции с operation_date < closed_before
+# в ArchivedTransaction, а их итог по каждой паре (объект, реагент)
+# накапливается в CarryForwardBalance. Горячие запросы (пересчет остатков,
+# журнал) работают только с открытым периодом.
+class ClosedPeriod(models.Model):
+    closed_before = models.DateTimeField(verbose_name="Закрыто все до")
+    closed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Закрыл")
+    closed_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата закрытия")
+    archived_count = models.PositiveIntegerField(default=0, verbose_name="Перенесено в архив")
+
+    class Meta:
+        verbose_name = "Закрытый период"
+        verbose_name_plural = "Закрытые периоды"
+        ordering = ['-closed_before']
+
+    def __str__(self):
+        return f"До {self.closed_before:%Y-%m-%d %H:%M}"
+
+
+class CarryForwardBalance(models.Model):
+    # Остаток, перенесенный из закрытых периодов (итог всех архивных транзакций)
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='carry_forward', verbose_name="Объект")
+    chemical = models.ForeignKey(Chemical, on_delete=models.CASCADE, related_name='carry_forward', verbose_name="Реагент")
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Количество")
+    as_of = models.DateTimeField(verbose_name="На дату")
+
+    class Meta:
+        verbose_name = "Входящий остаток"
+        verbose_name_plural = "Входящие остатки"
+        unique_together = ('facility', 'chemical')
+
+    def __str__(self):
+        return f"{self.facility_id}/{self.chemical_id}: {self.quantity} на {self.as_of:%Y-%m-%d}"
+
+
+class ArchivedTransaction(models.Model):
+    # Копия Transaction для закрытых периодов; id сохраняется исходный
+    id = models.BigIntegerField(primary_key=True)
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TransactionType.choices, verbose_name="Тип транзакции")
+    chemical = models.ForeignKey(Chemical, on_delete=models.PROTECT, related_name='archived_transactions', verbose_name="Реагент")
+    quantity = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Количество")
+    from_facility = models.ForeignKey(Facility, related_name='archived_transactions_from', on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Из объекта")
+    to_facility = models.ForeignKey(Facility, related_name='archived_transactions_to', on_delete=models.SET_NULL, null=True, blank=True, verbose_name="В объект")
+    performed_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='archived_transactions', on_delete=models.SET_NULL, null=True, verbose_name="Выполнил")
+    timestamp = models.DateTimeField(verbose_name="Время создания записи")
+    operation_date = models.DateTimeField(db_index=True, verbose_name="Дата и время операции")
+    document_name = models.CharField(max_length=255, blank=True, verbose_name="Название документа")
+    document_file = models.FileField(upload_to='documents/%Y/%m/%d/', blank=True, null=True, verbose_name="Файл документа")
+    comment = models.TextField(blank=True, verbose_name="Комментарий")
+    operation_uuid = models.UUIDField(db_index=True, verbose_name="ID операции")
+    archived_in = models.ForeignKey(ClosedPeriod, on_delete=models.PROTECT, related_name='transactions', verbose_name="Закрытый период")
+
+    class Meta:
+        verbose_name = "Архивная транзакция"
+        verbose_name_plural = "Архивные транзакции"
+        ordering = ['-operation_uuid', '-timestamp']
+        indexes = [
+            models.Index(fields=['from_facility', '-timestamp'], name='archivedtx_from_ts_idx'),
+            models.Index(fields=['to_facility', '-timestamp'], name='archivedtx_to_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"[архив] {self.get_transaction_type_display()} - {self.chemical.name} ({self.quantity})"
+
+
+# --- Пороги минимального остатка и оповещения ---
+# Пороги проверяются только для пар, которые только что пересчитал
+# services.recalculate_inventory_for_items; в StockAlert пишется
+# только пересечение порога (было >= минимума, стало меньше).
+class StockThreshold(models.Model):
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='stock_thresholds', verbose_name="Объект")
+    chemical = models.ForeignKey(Chemical, on_delete=models.CASCADE, related_name='stock_thresholds', verbose_name="Реагент")
+    min_quantity = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Минимальный остаток")
+
+    class Meta:
+        verbose_name = "Порог остатка"
+        verbose_name_plural = "Пороги остатков"
+        unique_together = ('facility', 'chemical')
+
+    def __str__(self):
+        return f"{self.facility.name} - {self.chemical.name}: не менее {self.min_quantity}"
+
+
+class StockAlert(models.Model):
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='stock_alerts', verbose_name="Объект")
+    chemical = models.ForeignKey(Chemical, on_delete=models.CASCADE, related_name='stock_alerts', verbose_name="Реагент")
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Остаток при срабатывании")
+    min_quantity = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Порог")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Сработало")
+    # Остаток снова поднялся до порога
+    resolved_at = models.DateTimeField(null=True, blank=True, verbose_name="Восстановлено")
+    acknowledged_at = models.DateTimeField(null=True, blank=True, verbose_name="Просмотрено")
+    acknowledged_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Просмотрел")
+
+    class Meta:
+        verbose_name = "Оповещение об остатке"
+        verbose_name_plural = "Оповещения об остатках"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['acknowledged_at', '-created_at'], name='stockalert_ack_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.facility_id}/{self.chemical_id}: {self.quantity} < {self.min_quantity}"
+
+
+# --- Журнал изменений для дельта-синхронизации (/api/sync/) ---
+# Каждая запись = одно изменение строки; id записи и есть версия
+# изменения (монотонно растет). Удаления записываются с deleted=True.
+# Старые записи удаляются командой `python manage.py prune_changelog`.
+class ChangeLogEntry(models.Model):
+    class Model(models.TextChoices):
+        TRANSACTION = 'transaction', 'Транзакция'
+        INVENTORY = 'inventory', 'Остаток'
+        FACILITY = 'facility', 'Объект'
+        CHEMICAL = 'chemical', 'Реагент'
+
+    model = models.CharField(max_length=20, choices=Model.choices, verbose_name="Таблица")
+    object_id = models.BigIntegerField(verbose_name="ID записи")
+    deleted = models.BooleanField(default=False, verbose_name="Удалена")
+    changed_at = models.DateTimeField(auto_now_add=True, verbose_name="Время изменения")
+    # Объекты строки (для транзакции - откуда и куда): по ним записи журнала,
+    # в том числе об удалении, фильтруются для инженеров. Без внешнего ключа
+    # в БД - журнал переживает удаление объекта.
+    facility = models.ForeignKey(Facility, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, blank=True, related_name='+', verbose_name="Объект")
+    other_facility = models.ForeignKey(Facility, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, blank=True, related_name='+', verbose_name="Второй объект")
+
+    class Meta:
+        verbose_name = "Изменение"
+        verbose_name_plural = "Журнал изменений"
+
+    def __str__(self):
+        return f"v{self.id} {self.model}#{self.object_id}{' (удалена)' if self.deleted else ''}"
+
+
+# --- Ключи идемпотентности пакетной отправки операций ---
+# Клиент генерирует ключ для каждой операции; повторная отправка того же
+# ключа (например, после обрыва связи) не создает операцию второй раз.
+class OperationSubmission(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='operation_submissions', verbose_name="Пользователь")
+    idempotency_key = models.CharField(max_length=64, verbose_name="Ключ идемпотентности")
+    operation_uuid = models.UUIDField(verbose_name="ID операции")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Принята")
+
+    class Meta:
+        verbose_name = "Отправленная операция"
+        verbose_name_plural = "Отправленные операции"
+        unique_together = ('user', 'idempotency_key')
+
+    def __str__(self):
+        return f"{self.user_id}:{self.idempotency_key} -> {self.operation_uuid}"
+
+
+# --- Себестоимость по FIFO (см. api/costing.py) ---
+# CostLayer - партия реагента на объекте с ценой за единицу: создается
+# поступлением (add) и перемещением (transfer, партии переезжают со своей ценой).
+# CostAllocation - какая часть каких партий ушла на списание или перемещение.
+# Ссылки на транзакции обнуляются (а не удаляются каскадом), чтобы удаление
+# и архивирование операций не ломали учет остатков партий.
+class CostLayer(models.Model):
+    class Kind(models.TextChoices):
+        RECEIPT = 'receipt', 'Поступление'
+        TRANSFER = 'transfer', 'Перемещение'
+        # Списано больше, чем было партий: отрицательный остаток, который
+        # гасится следующими поступлениями на объект
+        DEFICIT = 'deficit', 'Недостача'
+
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='cost_layers', verbose_name="Объект")
+    chemical = models.ForeignKey(Chemical, on_delete=models.CASCADE, related_name='cost_layers', verbose_name="Реагент")
+    kind = models.CharField(max_length=10, choices=Kind.choices, verbose_name="Источник партии")
+    source_transaction = models.ForeignKey(Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='cost_layers', verbose_name="Транзакция-источник")
+    received_at = models.DateTimeField(verbose_name="Дата поступления")
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="Цена за единицу")
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Количество в партии")
+    remaining = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Остаток партии")
+
+    class Meta:
+        verbose_name = "Партия (FIFO)"
+        verbose_name_plural = "Партии (FIFO)"
+        indexes = [
+            models.Index(fields=['chemical', 'received_at'], name='costlayer_chemical_date_idx'),
+            models.Index(fields=['facility', 'chemical'], name='costlayer_facility_chem_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.facility_id}/{self.chemical_id} {self.remaining}/{self.quantity} по {self.unit_cost}"
+
+
+class CostAllocation(models.Model):
+    transaction = models.ForeignKey(Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='cost_allocations', verbose_name="Транзакция")
+    # Для недостачи - партия-недостача; отрицательное количество - погашение
+    # недостачи поступлением (при откате возвращается в партию с обратным знаком)
+    layer = models.ForeignKey(CostLayer, on_delete=models.SET_NULL, null=True, blank=True, related_name='allocations', verbose_name="Партия")
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='cost_allocations', verbose_name="Объект")
+    chemical = models.ForeignKey(Chemical, on_delete=models.CASCADE, related_name='cost_allocations', verbose_name="Реагент")
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TransactionType.choices, verbose_name="Тип транзакции")
+    operation_date = models.DateTimeField(verbose_name="Дата операции")
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Количество")
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=4, verbose_name="Цена за единицу")
+
+    class Meta:
+        verbose_name = "Списание партии (FIFO)"
+        verbose_name_plural = "Списания партий (FIFO)"
+        indexes = [
+            models.Index(fields=['chemical', 'operation_date'], name='costalloc_chemical_date_idx'),
+            models.Index(fields=['facility', 'operation_date'], name='costalloc_facility_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.facility_id}/{self.chemical_id} {self.quantity} по {self.unit_cost}"
+
+
+# --- Проекты: группы объектов (скважин) с планом расхода ---
+class Project(models.Model):
+    class Status(models.TextChoices):
+        PLANNING = 'planning', 'Планируется'
+        IN_PROGRESS = 'in_progress', 'В работе'
+        COMPLETED = 'completed', 'Завершен'
+        ON_HOLD = 'on_hold', 'Приостановлен'
+
+    name = models.CharField(max_length=255, verbose_name="Название проекта")
+    facilities = models.ManyToManyField(Facility, related_name='projects', blank=True, verbose_name="Объекты")
+    start_date = models.DateField(verbose_name="Дата начала")
+    end_date = models.DateField(null=True, blank=True, verbose_name="Дата окончания")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PLANNING, verbose_name="Статус")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Проект"
+        verbose_name_plural = "Проекты"
+
+    def __str__(self):
+        return self.name
+
+
+class ProjectBudgetLine(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='budget_lines', verbose_name="Проект")
+    chemical = models.ForeignKey(Chemical, on_delete=models.PROTECT, related_name='budget_lines', verbose_name="Реагент")
+    planned_quantity = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Плановое количество")
+
+    class Meta:
+        verbose_name = "Строка плана проекта"
+        verbose_name_plural = "План проекта"
+        unique_together = ('project', 'chemical')
+
+    def __str__(self):
+        return f"{self.project_id}: {self.chemical_id} x {self.planned_quantity}"
+
+
+# --- Профили запросов (см. api/profiling.py) ---
+class RequestProfile(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Пользователь")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата")
+    method = models.CharField(max_length=10, verbose_name="Метод")
+    path = models.CharField(max_length=2000, verbose_name="Путь")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Код ответа")
+    duration_ms = models.FloatField(verbose_name="Длительность, мс")
+    query_count = models.PositiveIntegerField(verbose_name="SQL-запросов")
+    query_time_ms = models.FloatField(verbose_name="Время SQL, мс")
+    # Размер data в байтах: по сумме размеров старые профили вытесняются
+    size = models.PositiveIntegerField(verbose_name="Размер, байт")
+    data = models.JSONField(verbose_name="Профиль")
+
+    class Meta:
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+
+    def __str__(self):
+        return f"{self.method} {self.path} {self.duration_ms:.0f} мс"
+
+
+# --- Фоновые выгрузки отчетов (см. api/report_jobs.py) ---
+class LedgerRevision(models.Model):
+    """Номер версии журнала объекта: растет при каждой операции с объектом."""
+    facility = models.OneToOneField(Facility, on_delete=models.CASCADE, primary_key=True, related_name='ledger_revision', verbose_name="Объект")
+    revision = models.PositiveBigIntegerField(default=0, verbose_name="Версия журнала")
+
+    class Meta:
+        verbose_name = "Версия журнала объекта"
+        verbose_name_plural = "Версии журнала объектов"
+
+    def __str__(self):
+        return f"{self.facility_id}: {self.revision}"
+
+
+class ReportJob(models.Model):
+    class Kind(models.TextChoices):
+        FACILITY_DETAIL = 'facility_detail', 'Отчет по объекту'
+        FACILITY_BATCH = 'facility_batch', 'Отчет по объектам'
+
+    class Format(models.TextChoices):
+        CSV = 'csv', 'CSV'
+        XLSX = 'xlsx', 'XLSX'
+        PDF = 'pdf', 'PDF'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Готово'
+        FAILED = 'failed', 'Ошибка'
+
+    ACTIVE_STATUSES = (Status.PENDING, Status.RUNNING)
+
+    kind = models.CharField(max_length=20, choices=Kind.choices, verbose_name="Отчет")
+    format = models.CharField(max_length=10, choices=Format.choices, verbose_name="Формат")
+    params = models.JSONField(verbose_name="Параметры")
+    # Хэш вида, формата и параметров: одинаковые задания не считаются дважды
+    fingerprint = models.CharField(max_length=64, db_index=True, verbose_name="Отпечаток")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name="Статус")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Создал")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начато")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершено")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    # Версии журналов объектов на момент расчета: файл актуален, пока они не изменились
+    ledger_revisions = models.JSONField(default=dict, verbose_name="Версии журналов")
+    file = models.FileField(upload_to='reports/%Y/%m/%d/', blank=True, null=True, verbose_name="Файл")
+
+    class Meta:
+        verbose_name = "Выгрузка отчета"
+        verbose_name_plural = "Выгрузки отчетов"
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_idx'),
+        ]
+        constraints = [
+            # Одно незавершенное задание на отпечаток - параллельные дубли отсекает БД
+            models.UniqueConstraint(
+                fields=['fingerprint'], condition=models.Q(status__in=['pending', 'running']),
+                name='reportjob_active_fingerprint_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}.{self.format} #{self.pk} ({self.status})"
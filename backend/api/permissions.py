@@ -1,4 +1,6 @@
 # backend/api/permissions.py
+from django.db.models import Q
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 class IsAdminUser(BasePermission):
@@ -40,4 +42,46 @@ class IsAdminOrLogisticianForWrite(BasePermission):
         if request.method in SAFE_METHODS:
             return request.user and request.user.is_authenticated
         # Для всех остальных методов (POST, PUT, DELETE) проверяем роль
-        return request.user and request.user.is_authenticated and (request.user.role in ['admin', 'logistician'])
\ No newline at end of file
+        return request.user and request.user.is_authenticated and (request.user.role in ['admin', 'logistician'])
+
+
+# --- Видимость данных по объектам ---
+# Инженер видит журнал, остатки и отчеты только своего объекта (related_facility),
+# админ и логист - все. Ограничение накладывается в запросе к БД.
+
+def visible_facility_ids(user):
+    """None - видны все объекты; иначе множество доступных id (пустое, если объект не назначен)."""
+    if user.role != 'engineer':
+        return None
+    return {user.related_facility_id} - {None}
+
+
+def restrict_facility_ids(user, facility_ids):
+    """Оставляет из запрошенных объектов (None - все) только видимые пользователю."""
+    visible = visible_facility_ids(user)
+    if visible is None:
+        return facility_ids
+    if facility_ids is None:
+        return sorted(visible)
+    return [pk for pk in facility_ids if pk in visible]
+
+
+def check_facility_access(user, facility_id):
+    visible = visible_facility_ids(user)
+    if visible is not None and facility_id not in visible:
+        raise PermissionDenied("Нет доступа к данным этого объекта.")
+
+
+def facility_scope_q(user, fields):
+    """
+    Условие на строки, видимые пользователю: хотя бы одно из полей fields
+    (например, from_facility и to_facility) указывает на видимый объект. None - без ограничений.
+    """
+    visible = visible_facility_ids(user)
+    if visible is None:
+        return None
+    condition = Q(pk__in=[])
+    for field in fields:
+        condition |= Q(**{f'{field}_id__in': visible})
+    return condition
+
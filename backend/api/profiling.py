@@ -0,0 +1,208 @@
+# backend/api/profiling.py
+# Профилирование отдельных запросов по требованию администратора.
+# Запрос с заголовком X-Profile: 1 (или ?_profile=1) от пользователя
+# с ролью admin выполняется под cProfile с записью всех SQL-запросов.
+# Результат (дерево вызовов, топ функций, запросы с длительностью
+# и EXPLAIN) сохраняется в RequestProfile, его id приходит в заголовке
+# X-Profile-Id, а сам профиль доступен через /api/profiles/<id>/.
+#
+# Без флага middleware (api.middleware.RequestProfilerMiddleware) только
+# проверяет заголовок и строку запроса.
+# Профилируется синхронная часть запроса: у async-вьюх (ASGI) код
+# в event loop в дерево вызовов не попадает.
+import contextlib
+import json
+import logging
+import pstats
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from .models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+
+# Сколько функций в топе и насколько глубоко раскрывать дерево вызовов
+TOP_FUNCTIONS = 40
+CALL_TREE_DEPTH = 30
+# Ветки дерева короче этой доли от общего времени не показываются
+CALL_TREE_MIN_SHARE = 0.005
+# Сколько запросов хранить в профиле и для скольких уникальных SELECT делать EXPLAIN
+MAX_QUERIES = 1000
+MAX_EXPLAINS = 50
+
+# Профилировщик в процессе один: параллельный флагованный запрос выполняется без профиля
+profiler_lock = threading.Lock()
+
+
+def _storage_limit():
+    return getattr(settings, 'PROFILER_STORAGE_BYTES', 50 * 1024 * 1024)
+
+
+def is_flagged(request):
+    return request.META.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_PARAM) == '1'
+
+
+def admin_user(request):
+    """Аутентифицирует JWT раньше DRF: профиль нужен только для админов."""
+    from .authentication import ClaimsJWTAuthentication
+
+    try:
+        result = ClaimsJWTAuthentication().authenticate(request)
+    except Exception:
+        return None
+    if result is None or getattr(result[0], 'role', None) != 'admin':
+        return None
+    return result[0]
+
+
+class QueryRecorder:
+    """execute_wrapper для всех подключений: SQL, параметры, база и длительность."""
+
+    def __init__(self):
+        self.queries = []
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total += 1
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    'alias': context['connection'].alias,
+                    'sql': sql,
+                    'params': params if not many else None,
+                    'many': many,
+                    'duration_ms': (time.perf_counter() - started) * 1000,
+                })
+
+    @contextlib.contextmanager
+    def capture(self):
+        with contextlib.ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield
+
+
+def _explain(queries):
+    """EXPLAIN (без ANALYZE - запрос не выполняется повторно) для уникальных SELECT."""
+    plans = {}
+    for query in queries:
+        sql = query['sql']
+        if query['many'] or not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        key = (query['alias'], sql)
+        if key not in plans:
+            if len(plans) >= MAX_EXPLAINS:
+                continue
+            connection = connections[query['alias']]
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', query['params'])
+                    plans[key] = '\n'.join(' '.join(str(value) for value in row) for row in cursor.fetchall())
+            except Exception as exc:
+                plans[key] = f'EXPLAIN не выполнен: {exc}'
+        query['explain'] = plans[key]
+
+
+def _function_name(func):
+    filename, line, name = func
+    return f'{name} ({filename}:{line})' if line else name
+
+
+def _top_functions(stats):
+    rows = [
+        {
+            'function': _function_name(func),
+            'calls': nc,
+            'primitive_calls': cc,
+            'own_ms': tt * 1000,
+            'cumulative_ms': ct * 1000,
+        }
+        for func, (cc, nc, tt, ct, _) in stats.stats.items()
+    ]
+    return {
+        'by_cumulative': sorted(rows, key=lambda row: row['cumulative_ms'], reverse=True)[:TOP_FUNCTIONS],
+        'by_own_time': sorted(rows, key=lambda row: row['own_ms'], reverse=True)[:TOP_FUNCTIONS],
+    }
+
+
+def _call_tree(stats, total):
+    """Дерево вызовов из графа вызывающих pstats; время ветки - время вызовов по этому ребру."""
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, nc, _, ct) in callers.items():
+            callees.setdefault(caller, []).append((func, nc, ct))
+    threshold = total * CALL_TREE_MIN_SHARE
+    roots = [func for func, value in stats.stats.items() if not value[4] and value[3] >= threshold]
+    if not roots and stats.stats:
+        # Обертки обработчиков Django рекурсивны, и у верхнего вызова тоже есть вызывающие
+        roots = [max(stats.stats, key=lambda func: stats.stats[func][3])]
+
+    def build(func, calls, cumulative, path, depth):
+        node = {'function': _function_name(func), 'calls': calls, 'cumulative_ms': cumulative * 1000}
+        if depth < CALL_TREE_DEPTH:
+            children = [
+                build(child, nc, ct, path | {child}, depth + 1)
+                for child, nc, ct in sorted(callees.get(func, ()), key=lambda item: item[2], reverse=True)
+                if ct >= threshold and child not in path
+            ]
+            if children:
+                node['children'] = children
+        return node
+
+    return [
+        build(func, stats.stats[func][1], stats.stats[func][3], {func}, 0)
+        for func in sorted(roots, key=lambda func: stats.stats[func][3], reverse=True)
+    ]
+
+
+class _ProfileEncoder(DjangoJSONEncoder):
+    # Параметры запросов бывают любых типов - неизвестные сохраняем как repr
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return repr(o)
+
+
+def save_profile(request, response, user, profiler, recorder, duration):
+    stats = pstats.Stats(profiler)
+    _explain(recorder.queries)
+    data = {
+        'call_tree': _call_tree(stats, duration),
+        'top_functions': _top_functions(stats),
+        'queries': recorder.queries,
+        'queries_truncated': recorder.total > len(recorder.queries),
+    }
+    payload = json.dumps(data, cls=_ProfileEncoder)
+    profile = RequestProfile.objects.create(
+        user_id=user.id, method=request.method, path=request.get_full_path()[:2000],
+        status_code=response.status_code, duration_ms=duration * 1000,
+        query_count=recorder.total,
+        query_time_ms=sum(query['duration_ms'] for query in recorder.queries),
+        size=len(payload.encode()), data=json.loads(payload),
+    )
+    evict_profiles()
+    return profile
+
+
+def evict_profiles(limit=None):
+    """Удаляет самые старые профили, пока их общий размер больше лимита."""
+    limit = _storage_limit() if limit is None else limit
+    used, stale = 0, []
+    for pk, size in RequestProfile.objects.order_by('-id').values_list('id', 'size').iterator():
+        used += size
+        if used > limit:
+            stale.append(pk)
+    if stale:
+        RequestProfile.objects.filter(pk__in=stale).delete()
+    return len(stale)
@@ -0,0 +1,63 @@
+# backend/api/reference.py
+# Кэш справочников (реагенты, объекты) в памяти процесса для подписей
+# в отчетах: названия и единицы не читаются из БД на каждый отчет.
+# Таблицы небольшие, поэтому загружаются целиком. Изменение через
+# save/delete сбрасывает кэш своего воркера (api/signals.py), в других
+# воркерах новые названия появятся не позже чем через REFERENCE_CACHE_TTL.
+# Цену реагента для расчетов брать отсюда нельзя - только из БД.
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Chemical, Facility
+
+
+class _ReferenceCache:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'REFERENCE_CACHE_TTL', 300)
+
+    def _load(self, model):
+        rows = model.objects.in_bulk()
+        with self._lock:
+            self._tables[model] = (time.monotonic() + self.ttl, rows)
+        return rows
+
+    def _get(self, model, ids=None):
+        entry = self._tables.get(model)
+        if entry is None or entry[0] < time.monotonic():
+            return self._load(model)
+        rows = entry[1]
+        # Строки, созданные после загрузки (например, в другом воркере)
+        if ids is not None and not rows.keys() >= set(ids):
+            return self._load(model)
+        return rows
+
+    def chemicals(self, ids=None):
+        """{id: Chemical}; ids - какие реагенты точно нужны (перечитать, если их нет)."""
+        return self._get(Chemical, ids)
+
+    def facilities(self, ids=None):
+        """{id: Facility}, как chemicals()."""
+        return self._get(Facility, ids)
+
+    def invalidate(self, model):
+        with self._lock:
+            self._tables.pop(model, None)
+
+    def warm(self):
+        for model in (Chemical, Facility):
+            self._load(model)
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+reference_cache = _ReferenceCache()
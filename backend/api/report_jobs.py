@@ -0,0 +1,215 @@
+# backend/api/report_jobs.py
+# Фоновые выгрузки отчетов (CSV/XLSX/PDF), которые не успевают за таймаут gunicorn.
+# POST /api/report-jobs/ ставит задание в очередь (таблица ReportJob),
+# отдельный процесс `manage.py run_report_worker` забирает задания из БД
+# и сохраняет файл, клиент опрашивает /api/report-jobs/<id>/ и скачивает
+# /api/report-jobs/<id>/download/. Внешний брокер не нужен.
+#
+# Одинаковые задания (вид, формат, объекты, период) не считаются дважды:
+# пока задание в очереди или считается, новые запросы получают его же,
+# а готовый файл отдается повторно, пока не изменился журнал ни одного
+# из объектов отчета (см. LedgerRevision).
+import csv
+import datetime
+import hashlib
+import io
+import json
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Facility, ReportJob
+from .services import build_facility_batch_report, ledger_revisions
+
+logger = logging.getLogger(__name__)
+
+REPORT_COLUMNS = ('Объект', 'Реагент', 'Ед.', 'Начальный остаток', 'Приход', 'Расход', 'Конечный остаток')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def job_fingerprint(kind, fmt, params):
+    raw = json.dumps([kind, fmt, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _is_fresh(job):
+    return bool(job.file) and job.ledger_revisions == ledger_revisions(job.params['facility_ids'])
+
+
+def _latest_job(fingerprint):
+    return ReportJob.objects.filter(fingerprint=fingerprint).exclude(status=ReportJob.Status.FAILED).order_by('-id').first()
+
+
+def submit_job(user, kind, fmt, params):
+    """
+    Возвращает (задание, создано ли новое). Незавершенное задание с тем же
+    отпечатком или готовое с актуальным файлом переиспользуется.
+    """
+    fingerprint = job_fingerprint(kind, fmt, params)
+    for attempt in range(2):
+        latest = _latest_job(fingerprint)
+        if latest is not None and (latest.status != ReportJob.Status.DONE or _is_fresh(latest)):
+            return latest, False
+        try:
+            with db_transaction.atomic():
+                return ReportJob.objects.create(
+                    kind=kind, format=fmt, params=params, fingerprint=fingerprint, created_by_id=user.id,
+                ), True
+        except IntegrityError:
+            # Такое же задание только что поставил параллельный запрос; оно могло
+            # уже и завершиться - тогда берется оно же, если упало - пробуем еще раз
+            latest = _latest_job(fingerprint)
+            if latest is not None:
+                return latest, False
+            if attempt:
+                raise
+
+
+def _requeue_stuck():
+    """Задания, упавшие вместе с воркером, возвращаются в очередь (или считаются ошибкой)."""
+    stuck_before = timezone.now() - datetime.timedelta(seconds=_setting('REPORT_JOB_TIMEOUT', 30 * 60))
+    stuck = ReportJob.objects.filter(status=ReportJob.Status.RUNNING, started_at__lt=stuck_before)
+    stuck.filter(attempts__gte=_setting('REPORT_JOB_MAX_ATTEMPTS', 3)).update(
+        status=ReportJob.Status.FAILED, finished_at=timezone.now(), error="Превышено время выполнения.",
+    )
+    stuck.update(status=ReportJob.Status.PENDING)
+
+
+def claim_next_job():
+    """Забирает самое старое задание из очереди; условный UPDATE не дает взять его двум воркерам."""
+    _requeue_stuck()
+    candidates = ReportJob.objects.filter(status=ReportJob.Status.PENDING).order_by('created_at', 'id')
+    for pk in candidates.values_list('pk', flat=True)[:10]:
+        claimed = ReportJob.objects.filter(pk=pk, status=ReportJob.Status.PENDING).update(
+            status=ReportJob.Status.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return ReportJob.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    params = job.params
+    # Версии берутся до расчета: изменения во время расчета сделают файл устаревшим
+    revisions = ledger_revisions(params['facility_ids'])
+    try:
+        start = datetime.datetime.fromisoformat(params['start'])
+        end = datetime.datetime.fromisoformat(params['end'])
+        facilities = list(Facility.objects.filter(pk__in=params['facility_ids']).order_by('name').values('id', 'name', 'type'))
+        reports = build_facility_batch_report(facilities, start, end)
+        content = RENDERERS[job.format](reports, start, end)
+    except Exception as exc:
+        logger.exception("Выгрузка отчета #%s не удалась", job.pk)
+        job.status, job.error = ReportJob.Status.FAILED, str(exc)
+    else:
+        job.file.save(f'{job.kind}-{job.pk}.{job.format}', ContentFile(content), save=False)
+        job.status, job.error, job.ledger_revisions = ReportJob.Status.DONE, '', revisions
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'ledger_revisions', 'file', 'finished_at'])
+    return job
+
+
+def prune_jobs(keep_days):
+    """Удаляет старые завершенные задания вместе с файлами."""
+    cutoff = timezone.now() - datetime.timedelta(days=keep_days)
+    old = ReportJob.objects.filter(
+        status__in=(ReportJob.Status.DONE, ReportJob.Status.FAILED), created_at__lt=cutoff,
+    )
+    for job in old.exclude(file='').only('file'):
+        job.file.delete(save=False)
+    deleted, _ = old.delete()
+    return deleted
+
+
+# --- Форматы файлов ---
+
+def _rows(reports):
+    for report in reports:
+        for item in report['details']:
+            yield (
+                report['facility_name'], item['chemical_name'], item['unit'], item['opening_balance'],
+                item['income'], item['outcome'], item['closing_balance'],
+            )
+
+
+def _title(start, end):
+    # end - начало дня после периода (helpers.parse_report_period)
+    last_day = end - datetime.timedelta(days=1)
+    return f"Отчет по объектам за {start:%d.%m.%Y} - {last_day:%d.%m.%Y}"
+
+
+def render_csv(reports, start, end):
+    buffer = io.StringIO()
+    # Точка с запятой и BOM - чтобы русский Excel открыл файл без мастера импорта
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(REPORT_COLUMNS)
+    writer.writerows(_rows(reports))
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+def render_xlsx(reports, start, end):
+    try:
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+    except ImportError:
+        raise RuntimeError("Для выгрузки в XLSX нужен пакет openpyxl.")
+    # write_only: строки пишутся потоком, большой отчет не держится в памяти целиком
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Отчет')
+    sheet.append([_title(start, end)])
+    bold = Font(bold=True)
+    header = [WriteOnlyCell(sheet, value=name) for name in REPORT_COLUMNS]
+    for cell in header:
+        cell.font = bold
+    sheet.append(header)
+    for row in _rows(reports):
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def render_pdf(reports, start, end):
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+        from reportlab.lib.styles import getSampleStyleSheet
+    except ImportError:
+        raise RuntimeError("Для выгрузки в PDF нужен пакет reportlab.")
+    # Встроенные шрифты PDF не содержат кириллицы
+    font_path = _setting('REPORT_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+    if 'ReportFont' not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont('ReportFont', font_path))
+
+    title_style = getSampleStyleSheet()['Title']
+    title_style.fontName = 'ReportFont'
+    table = Table([REPORT_COLUMNS, *[[str(value) for value in row] for row in _rows(reports)]], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'ReportFont'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),
+    ]))
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=landscape(A4)).build([Paragraph(_title(start, end), title_style), table])
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    ReportJob.Format.CSV: render_csv,
+    ReportJob.Format.XLSX: render_xlsx,
+    ReportJob.Format.PDF: render_pdf,
+}
@@ -1,16 +1,34 @@
 # backend/api/serializers.py
+from django.urls import reverse
 from rest_framework import serializers
-from .models import User, Facility, Chemical, Inventory, Transaction
+from django.db import transaction as db_transaction
+from .models import (User, Facility, Chemical, Inventory, Transaction, ArchivedTransaction,
+                     ClosedPeriod, Project, ProjectBudgetLine, ReportJob, RequestProfile,
+                     StockAlert, StockThreshold)
 
-class FacilitySerializer(serializers.ModelSerializer):
+
+class SparseFieldsMixin:
+    """
+    Позволяет передать в сериализатор fields=[...] и оставить
+    в ответе только эти поля (используется для ?fields=).
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class FacilitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Facility
         fields = ('id', 'name', 'type', 'location', 'created_at')
 
-class ChemicalSerializer(serializers.ModelSerializer):
+class ChemicalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Chemical
-        fields = ('id', 'name', 'unit_of_measurement', 'description')
+        fields = ('id', 'name', 'unit_of_measurement', 'description', 'price')
 
 class UserSerializer(serializers.ModelSerializer):
     related_facility_name = serializers.CharField(source='related_facility.name', read_only=True, allow_null=True)
@@ -43,7 +61,7 @@ class UserSerializer(serializers.ModelSerializer):
     
     
 # Сериализатор для отображения остатков с вложенной информацией
-class InventorySerializer(serializers.ModelSerializer):
+class InventorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Показываем не просто id, а полную информацию об объекте и реагенте
     facility = FacilitySerializer(read_only=True)
     chemical = ChemicalSerializer(read_only=True)
@@ -53,7 +71,7 @@ class InventorySerializer(serializers.ModelSerializer):
         fields = ('id', 'facility', 'chemical', 'quantity')
 
 # Сериализатор для отображения транзакций
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # Показываем имена, а не ID
     chemical = ChemicalSerializer(read_only=True) 
     from_facility = serializers.StringRelatedField(read_only=True)
@@ -75,6 +93,94 @@ class TransactionSerializer(serializers.ModelSerializer):
         )
 
 
+class ArchivedTransactionSerializer(TransactionSerializer):
+    class Meta(TransactionSerializer.Meta):
+        model = ArchivedTransaction
+
+
+class ClosedPeriodSerializer(serializers.ModelSerializer):
+    closed_by = serializers.StringRelatedField(read_only=True)
+
+    class Meta:
+        model = ClosedPeriod
+        fields = ('id', 'closed_before', 'closed_by', 'closed_at', 'archived_count')
+
+
+class StockThresholdSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockThreshold
+        fields = ('id', 'facility', 'chemical', 'min_quantity')
+
+    def validate_min_quantity(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Порог не может быть отрицательным.")
+        return value
+
+
+class StockAlertSerializer(serializers.ModelSerializer):
+    facility_name = serializers.CharField(source='facility.name', read_only=True)
+    chemical_name = serializers.CharField(source='chemical.name', read_only=True)
+    acknowledged_by = serializers.StringRelatedField(read_only=True)
+
+    class Meta:
+        model = StockAlert
+        fields = (
+            'id', 'facility', 'facility_name', 'chemical', 'chemical_name', 'quantity',
+            'min_quantity', 'created_at', 'resolved_at', 'acknowledged_at', 'acknowledged_by',
+        )
+
+
+class ProjectBudgetLineSerializer(serializers.ModelSerializer):
+    chemical_name = serializers.CharField(source='chemical.name', read_only=True)
+
+    class Meta:
+        model = ProjectBudgetLine
+        fields = ('chemical', 'chemical_name', 'planned_quantity')
+
+    def validate_planned_quantity(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Плановое количество не может быть отрицательным.")
+        return value
+
+
+class ProjectSerializer(serializers.ModelSerializer):
+    """Проект с объектами и планом; budget_lines при записи заменяются целиком."""
+    budget_lines = ProjectBudgetLineSerializer(many=True, required=False)
+
+    class Meta:
+        model = Project
+        fields = ('id', 'name', 'facilities', 'start_date', 'end_date', 'status', 'budget_lines', 'created_at')
+
+    def validate(self, attrs):
+        start = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start and end and start > end:
+            raise serializers.ValidationError("start_date не может быть позже end_date.")
+        chemicals = [line['chemical'].pk for line in attrs.get('budget_lines', [])]
+        if len(chemicals) != len(set(chemicals)):
+            raise serializers.ValidationError("Реагент указан в плане несколько раз.")
+        return attrs
+
+    @db_transaction.atomic
+    def create(self, validated_data):
+        lines = validated_data.pop('budget_lines', [])
+        project = super().create(validated_data)
+        self._save_lines(project, lines)
+        return project
+
+    @db_transaction.atomic
+    def update(self, instance, validated_data):
+        lines = validated_data.pop('budget_lines', None)
+        project = super().update(instance, validated_data)
+        if lines is not None:
+            project.budget_lines.all().delete()
+            self._save_lines(project, lines)
+        return project
+
+    def _save_lines(self, project, lines):
+        ProjectBudgetLine.objects.bulk_create([ProjectBudgetLine(project=project, **line) for line in lines])
+
+
 class TransactionCreateSerializer(serializers.ModelSerializer):
     chemical = serializers.PrimaryKeyRelatedField(queryset=Chemical.objects.all())
     from_facility = serializers.PrimaryKeyRelatedField(queryset=Facility.objects.all(), required=False, allow_null=True)
@@ -108,4 +214,40 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
             if ttype in ['add', 'transfer']:
                 raise serializers.ValidationError("Инженер может выполнять только операции списания (consume).")
 
-        return data
\ No newline at end of file
+        return data
+
+
+class RequestProfileSerializer(serializers.ModelSerializer):
+    """Профиль запроса; в списке - без тела профиля (data)."""
+    user = serializers.StringRelatedField(read_only=True)
+
+    class Meta:
+        model = RequestProfile
+        fields = (
+            'id', 'created_at', 'user', 'method', 'path', 'status_code',
+            'duration_ms', 'query_count', 'query_time_ms', 'size', 'data',
+        )
+
+
+class RequestProfileListSerializer(RequestProfileSerializer):
+    class Meta(RequestProfileSerializer.Meta):
+        fields = tuple(name for name in RequestProfileSerializer.Meta.fields if name != 'data')
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Задание на выгрузку; download_url появляется, когда файл готов."""
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = (
+            'id', 'kind', 'format', 'params', 'status', 'created_at', 'started_at',
+            'finished_at', 'error', 'download_url',
+        )
+
+    def get_download_url(self, job):
+        if job.status != ReportJob.Status.DONE or not job.file:
+            return None
+        request = self.context.get('request')
+        url = reverse('report-job-download', args=[job.pk])
+        return request.build_absolute_uri(url) if request else url
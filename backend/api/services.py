@@ -1,25 +1,68 @@
 # backend/api/services.py
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection
 from django.db import transaction as db_transaction
-from django.db.models import Q
-from .models import Inventory, Transaction
+from django.db.models import Count, DateField, ExpressionWrapper, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .costing import COST_FIELD
+from .db_routers import primary
+from .inventory_index import mark_stale_on_commit
+from .reference import reference_cache
+from .models import (ArchivedTransaction, CarryForwardBalance, ChangeLogEntry,
+                     Chemical, ClosedPeriod, CostAllocation, Facility, Inventory, LedgerRevision, MonthlyRollup,
+                     StockAlert, StockThreshold, Transaction)
 
 @db_transaction.atomic
 def recalculate_inventory_for_items(items):
     """
     Принимает список объектов транзакций (старых или новых) и запускает
     пересчет для всех уникальных пар (объект, реагент), которые были затронуты.
+    Всегда работает с основной БД, даже если вызвана из запроса, читающего реплику.
+    Возвращает {(facility_id, chemical_id): (остаток до, остаток после)}.
     """
+    with primary():
+        return _recalculate_pairs(items)
+
+
+def _recalculate_pairs(items):
     pairs_to_recalculate = set()
     for tx in items:
-        # Собираем уникальные пары (Facility, Chemical)
-        if tx.from_facility:
-            pairs_to_recalculate.add((tx.from_facility, tx.chemical))
-        if tx.to_facility:
-            pairs_to_recalculate.add((tx.to_facility, tx.chemical))
+        # Собираем уникальные пары (объект, реагент) по id, не подгружая связанные модели
+        if tx.from_facility_id:
+            pairs_to_recalculate.add((tx.from_facility_id, tx.chemical_id))
+        if tx.to_facility_id:
+            pairs_to_recalculate.add((tx.to_facility_id, tx.chemical_id))
+
+    previous = _current_quantities(pairs_to_recalculate)
+    facilities = Facility.objects.in_bulk({f for f, _ in pairs_to_recalculate})
+    chemicals = Chemical.objects.in_bulk({c for _, c in pairs_to_recalculate})
 
     # Для каждой уникальной пары запускаем полный пересчет истории
-    for facility, chemical in pairs_to_recalculate:
-        recalculate_single_inventory(facility, chemical)
+    changes, changed = {}, {}
+    for key in pairs_to_recalculate:
+        item = recalculate_single_inventory(facilities[key[0]], chemicals[key[1]])
+        if key not in previous or previous[key] != item.quantity:
+            changed[item.id] = (item.facility_id, None)
+        changes[key] = (previous.get(key, Decimal(0)), item.quantity)
+    evaluate_stock_thresholds(changes)
+    record_changes(ChangeLogEntry.Model.INVENTORY, list(changed), facilities=changed)
+    return changes
+
+
+def _current_quantities(keys):
+    """Остатки до пересчета для перечисленных пар (facility_id, chemical_id) одним запросом."""
+    if not keys:
+        return {}
+    rows = Inventory.objects.filter(
+        facility_id__in={f for f, _ in keys}, chemical_id__in={c for _, c in keys}
+    ).values_list('facility_id', 'chemical_id', 'quantity')
+    return {(f, c): quantity for f, c, quantity in rows if (f, c) in keys}
 
 def recalculate_single_inventory(facility, chemical):
     """
@@ -33,12 +76,14 @@ def recalculate_single_inventory(facility, chemical):
         Q(chemical=chemical)
     ).order_by('operation_date', 'timestamp')
 
-    # 2. Считаем баланс с нуля
-    running_balance = 0
+    # 2. Считаем баланс от остатка, перенесенного из закрытых периодов
+    running_balance = CarryForwardBalance.objects.filter(
+        facility=facility, chemical=chemical
+    ).values_list('quantity', flat=True).first() or 0
     for tx in related_transactions:
-        if tx.to_facility == facility:  # Поступление на наш объект
+        if tx.to_facility_id == facility.id:  # Поступление на наш объект
             running_balance += tx.quantity
-        elif tx.from_facility == facility:  # Списание с нашего объекта
+        elif tx.from_facility_id == facility.id:  # Списание с нашего объекта
             running_balance -= tx.quantity
             
     # 3. Обновляем (или создаем) запись в таблице остатков
@@ -46,4 +91,989 @@ def recalculate_single_inventory(facility, chemical):
         facility=facility,
         chemical=chemical,
         defaults={'quantity': running_balance}
-    )
\ No newline at end of file
+    )
+    return inventory_item
+
+
+
+
+# --- Журнал изменений (дельта-синхронизация) ---
+
+def record_changes(model, ids, deleted=False, facilities=None):
+    """
+    Записывает в ChangeLogEntry новые версии для строк model с перечисленными id.
+    facilities - {id: (объект, второй объект или None)} для остатков и транзакций:
+    по ним синхронизация не отдает инженеру изменения и удаления чужих строк.
+    """
+    facilities = facilities or {}
+    entries = []
+    for object_id in ids:
+        facility_id, other_facility_id = facilities.get(object_id, (None, None))
+        entries.append(ChangeLogEntry(
+            model=model, object_id=object_id, deleted=deleted,
+            facility_id=facility_id, other_facility_id=other_facility_id,
+        ))
+    ChangeLogEntry.objects.bulk_create(entries, batch_size=1000)
+    if ids and model == ChangeLogEntry.Model.INVENTORY:
+        mark_stale_on_commit()
+
+
+def _transaction_facilities(transactions):
+    return {tx.id: (tx.from_facility_id, tx.to_facility_id) for tx in transactions}
+
+
+def record_transaction_changes(created=(), deleted=()):
+    """То же для транзакций операции: рядом с apply_rollup_changes во вьюхах операций."""
+    record_changes(ChangeLogEntry.Model.TRANSACTION, [tx.id for tx in deleted], deleted=True,
+                   facilities=_transaction_facilities(deleted))
+    record_changes(ChangeLogEntry.Model.TRANSACTION, [tx.id for tx in created],
+                   facilities=_transaction_facilities(created))
+    bump_ledger_revisions({
+        facility_id
+        for tx in list(created) + list(deleted)
+        for facility_id in (tx.from_facility_id, tx.to_facility_id) if facility_id
+    })
+
+
+def bump_ledger_revisions(facility_ids):
+    """Увеличивает версии журналов объектов (по ним устаревают готовые выгрузки)."""
+    if not facility_ids:
+        return
+    updated = LedgerRevision.objects.filter(facility_id__in=facility_ids).update(revision=F('revision') + 1)
+    if updated < len(facility_ids):
+        LedgerRevision.objects.bulk_create(
+            [LedgerRevision(facility_id=facility_id, revision=1) for facility_id in facility_ids],
+            ignore_conflicts=True,
+        )
+
+
+def ledger_revisions(facility_ids):
+    """{facility_id: версия журнала} (0 - операций еще не было); ключи - строки, как в JSON."""
+    revisions = dict(LedgerRevision.objects.filter(facility_id__in=facility_ids).values_list('facility_id', 'revision'))
+    return {str(facility_id): revisions.get(facility_id, 0) for facility_id in facility_ids}
+
+
+# --- Пороги минимального остатка ---
+
+def evaluate_stock_thresholds(changes):
+    """
+    Проверяет пороги только для пересчитанных пар.
+    changes: {(facility_id, chemical_id): (остаток до, остаток после)}.
+    Переход ниже порога создает StockAlert, возврат к порогу закрывает
+    открытые оповещения по паре. Стоимость зависит от числа пар, а не от размера Inventory.
+    """
+    if not changes:
+        return []
+    thresholds = StockThreshold.objects.filter(
+        facility_id__in={f for f, _ in changes}, chemical_id__in={c for _, c in changes}
+    ).values_list('facility_id', 'chemical_id', 'min_quantity')
+
+    alerts, restored = [], []
+    for facility_id, chemical_id, min_quantity in thresholds:
+        change = changes.get((facility_id, chemical_id))
+        if change is None:
+            continue
+        before, after = change
+        if before >= min_quantity > after:
+            alerts.append(StockAlert(
+                facility_id=facility_id, chemical_id=chemical_id,
+                quantity=after, min_quantity=min_quantity,
+            ))
+        elif before < min_quantity <= after:
+            restored.append(Q(facility_id=facility_id, chemical_id=chemical_id))
+
+    if restored:
+        condition = restored.pop()
+        for item in restored:
+            condition |= item
+        StockAlert.objects.filter(condition, resolved_at__isnull=True).update(resolved_at=timezone.now())
+    return StockAlert.objects.bulk_create(alerts)
+
+
+def check_threshold(threshold):
+    """
+    Проверка одного порога после его создания или изменения: текущий остаток
+    сравнивается с порогом так, будто до этого он был выше.
+    """
+    quantity = Inventory.objects.filter(
+        facility_id=threshold.facility_id, chemical_id=threshold.chemical_id
+    ).values_list('quantity', flat=True).first() or Decimal(0)
+    has_open = StockAlert.objects.filter(
+        facility_id=threshold.facility_id, chemical_id=threshold.chemical_id, resolved_at__isnull=True
+    ).exists()
+    before = threshold.min_quantity - 1 if has_open else threshold.min_quantity
+    return evaluate_stock_thresholds({(threshold.facility_id, threshold.chemical_id): (before, quantity)})
+
+
+# --- Месячные агрегаты (MonthlyRollup) ---
+
+def month_start(value):
+    """
+    Первое число месяца (в текущем часовом поясе) для даты операции.
+    Совпадает с тем, как месяц считает TruncMonth в базе.
+    """
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.replace(day=1)
+
+
+def _next_month(month):
+    return (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def _rollup_deltas(items, sign, deltas):
+    for tx in items:
+        month = month_start(tx.operation_date)
+        if tx.to_facility_id:
+            key = (tx.to_facility_id, tx.chemical_id, month, tx.transaction_type)
+            deltas[key][0] += sign * tx.quantity
+        if tx.from_facility_id:
+            key = (tx.from_facility_id, tx.chemical_id, month, tx.transaction_type)
+            deltas[key][1] += sign * tx.quantity
+
+
+def apply_rollup_changes(created=(), deleted=()):
+    """
+    Инкрементально обновляет MonthlyRollup по созданным и удаленным
+    транзакциям. Вызывается внутри той же транзакции БД, что и сама операция,
+    поэтому агрегаты всегда согласованы с журналом.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    _rollup_deltas(created, 1, deltas)
+    _rollup_deltas(deleted, -1, deltas)
+
+    for (facility_id, chemical_id, month, tx_type), (income, outcome) in deltas.items():
+        if not income and not outcome:
+            continue
+        lookup = dict(facility_id=facility_id, chemical_id=chemical_id, month=month, transaction_type=tx_type)
+        MonthlyRollup.objects.get_or_create(**lookup)
+        MonthlyRollup.objects.filter(**lookup).update(
+            income=F('income') + income,
+            outcome=F('outcome') + outcome,
+        )
+
+
+@db_transaction.atomic
+def rebuild_monthly_rollups(facility_ids=None):
+    """
+    Полностью перестраивает MonthlyRollup из журнала транзакций, включая
+    архив закрытых периодов (для всех объектов или только для перечисленных).
+    Возвращает количество созданных строк.
+    """
+    rollups = MonthlyRollup.objects.all()
+    if facility_ids:
+        rollups = rollups.filter(facility_id__in=facility_ids)
+    rollups.delete()
+
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    for model, side, column in (
+        (model, side, column)
+        for model in (Transaction, ArchivedTransaction)
+        for side, column in (('to_facility', 0), ('from_facility', 1))
+    ):
+        rows = model.objects.filter(**{f'{side}__isnull': False})
+        if facility_ids:
+            rows = rows.filter(**{f'{side}_id__in': facility_ids})
+        rows = rows.annotate(month=TruncMonth('operation_date')).values(
+            side, 'chemical', 'month', 'transaction_type'
+        ).annotate(total=Sum('quantity')).order_by()
+        for row in rows:
+            key = (row[side], row['chemical'], month_start(row['month']), row['transaction_type'])
+            totals[key][column] += row['total']
+
+    MonthlyRollup.objects.bulk_create([
+        MonthlyRollup(
+            facility_id=facility_id, chemical_id=chemical_id, month=month,
+            transaction_type=tx_type, income=income, outcome=outcome,
+        )
+        for (facility_id, chemical_id, month, tx_type), (income, outcome) in totals.items()
+    ], batch_size=1000)
+    return len(totals)
+
+
+def _ledger_totals(facility_ids, start, end, closed_before=None):
+    """
+    Запросы прихода (to_facility) и расхода (from_facility) из журнала
+    за [start, end), сгруппированные по парам (объект, реагент).
+    Архив закрытых периодов читается, только если диапазон его задевает.
+    """
+    models_to_scan = [Transaction]
+    if closed_before is not None and start < closed_before:
+        models_to_scan.append(ArchivedTransaction)
+    return [
+        (
+            model.objects.filter(
+                **{f'{side}_id__in': facility_ids},
+                operation_date__gte=start, operation_date__lt=end,
+            ).values('chemical', facility=F(side)).annotate(total=Sum('quantity')).order_by(),
+            column,
+        )
+        for model in models_to_scan
+        for side, column in (('to_facility', 'income'), ('from_facility', 'outcome'))
+    ]
+
+
+def _rollup_totals(facility_ids, month_from=None, month_to=None):
+    """Запрос прихода/расхода из MonthlyRollup за месяцы [month_from, month_to)."""
+    queryset = MonthlyRollup.objects.filter(facility_id__in=facility_ids)
+    if month_from is not None:
+        queryset = queryset.filter(month__gte=month_from)
+    if month_to is not None:
+        queryset = queryset.filter(month__lt=month_to)
+    return [(
+        queryset.values('facility', 'chemical').annotate(
+            income=Sum('income'), outcome=Sum('outcome')
+        ).order_by(),
+        None,
+    )]
+
+
+def _aware_month(month):
+    return timezone.make_aware(datetime.datetime.combine(month, datetime.time.min))
+
+
+def facility_balance_plan(facility_ids, start, end, closed_before=None):
+    """
+    Набор сгруппированных запросов для compute_facility_balances.
+    Полные месяцы берутся из MonthlyRollup, неполные месяцы на краях
+    периода досчитываются по журналу, поэтому результат точный.
+    Возвращает список (раздел, queryset, колонка); колонка None означает,
+    что строки уже содержат и income, и outcome. end - исключающая граница.
+    """
+    start_month = month_start(start)
+    first_full = start_month if start == _aware_month(start_month) else _next_month(start_month)
+    last_full = month_start(end)  # первый месяц, НЕ входящий целиком
+
+    # Начальный остаток: полные месяцы до start + хвост месяца start
+    plan = [('opening', qs, column) for qs, column in
+            _rollup_totals(facility_ids, month_to=start_month)
+            + _ledger_totals(facility_ids, _aware_month(start_month), start, closed_before)]
+
+    # Движение за период
+    if first_full < last_full:
+        period = (_ledger_totals(facility_ids, start, _aware_month(first_full), closed_before)
+                  + _rollup_totals(facility_ids, first_full, last_full)
+                  + _ledger_totals(facility_ids, _aware_month(last_full), end, closed_before))
+    else:
+        period = _ledger_totals(facility_ids, start, end, closed_before)
+    plan += [('period', qs, column) for qs, column in period]
+    return plan
+
+
+def collect_balance_rows(result, section, rows, column):
+    for row in rows:
+        values = result[(row['facility'], row['chemical'])]
+        if column is None:
+            values[section + '_income'] += row['income'] or 0
+            values[section + '_outcome'] += row['outcome'] or 0
+        else:
+            values[f'{section}_{column}'] += row['total'] or 0
+
+
+def finalize_balances(result):
+    return {
+        key: {
+            'opening': values['opening_income'] - values['opening_outcome'],
+            'income': values['period_income'],
+            'outcome': values['period_outcome'],
+        }
+        for key, values in result.items()
+    }
+
+
+def new_balance_result():
+    return defaultdict(lambda: defaultdict(Decimal))
+
+
+def compute_facility_balances(facility_ids, start, end):
+    """
+    Считает для каждой пары (объект, реагент) начальный остаток на start,
+    приход и расход за период [start, end) (см. helpers.parse_report_period).
+    Возвращает {(facility_id, chemical_id): {'opening', 'income', 'outcome'}}.
+    """
+    result = new_balance_result()
+    plan = facility_balance_plan(facility_ids, start, end, current_closed_before())
+    for section, queryset, column in plan:
+        collect_balance_rows(result, section, queryset, column)
+    return finalize_balances(result)
+
+
+async def acompute_facility_balances(facility_ids, start, end):
+    """То же, что compute_facility_balances, но через асинхронный ORM."""
+    result = new_balance_result()
+    closed_before = (await ClosedPeriod.objects.aaggregate(value=Max('closed_before')))['value']
+    for section, queryset, column in facility_balance_plan(facility_ids, start, end, closed_before):
+        collect_balance_rows(result, section, [row async for row in queryset], column)
+    return finalize_balances(result)
+
+
+def split_balances_by_facility(balances):
+    """Разбивает результат compute_facility_balances на словари по объектам."""
+    by_facility = defaultdict(dict)
+    for key, values in balances.items():
+        by_facility[key[0]][key] = values
+    return by_facility
+
+
+def build_facility_report(balances, chemicals):
+    """
+    Собирает ответ отчета по объекту из результата compute_facility_balances
+    одного объекта и словаря {chemical_id: Chemical}.
+    """
+    report_by_chemical = []
+    for (_, chemical_id), values in sorted(balances.items(), key=lambda item: chemicals[item[0][1]].name):
+        opening_balance = values['opening']
+        period_income = values['income']
+        period_outcome = values['outcome']
+        closing_balance = opening_balance + period_income - period_outcome
+
+        # Добавляем в отчет, только если были движения или есть остаток
+        if opening_balance != 0 or period_income != 0 or period_outcome != 0:
+            chemical = chemicals[chemical_id]
+            report_by_chemical.append({
+                'chemical_id': chemical.id,
+                'chemical_name': chemical.name,
+                'unit': chemical.unit_of_measurement,
+                'opening_balance': opening_balance,
+                'income': period_income,
+                'outcome': period_outcome,
+                'closing_balance': closing_balance,
+            })
+
+    return {
+        'summary': {
+            'opening_balance': sum(item['opening_balance'] for item in report_by_chemical),
+            'income': sum(item['income'] for item in report_by_chemical),
+            'outcome': sum(item['outcome'] for item in report_by_chemical),
+            'closing_balance': sum(item['closing_balance'] for item in report_by_chemical),
+        },
+        'details': report_by_chemical
+    }
+
+
+def build_facility_batch_report(facilities, start, end):
+    """
+    Отчеты по многим объектам: facilities - список словарей id, name, type.
+    Один набор сгруппированных запросов на все объекты сразу.
+    """
+    balances = compute_facility_balances([f['id'] for f in facilities], start, end)
+    chemicals = reference_cache.chemicals({chemical_id for _, chemical_id in balances})
+    by_facility = split_balances_by_facility(balances)
+    return [
+        {
+            'facility_id': facility['id'],
+            'facility_name': facility['name'],
+            'facility_type': facility['type'],
+            **build_facility_report(by_facility.get(facility['id'], {}), chemicals),
+        }
+        for facility in facilities
+    ]
+
+
+# --- Прогноз запаса (на сколько дней хватит реагента) ---
+
+RUNWAY_DEFAULT_WINDOW = 30
+RUNWAY_RECENT_WINDOW = 7
+
+
+def _consumption_totals(facility_ids, since, recent_since, until, closed_before=None):
+    """
+    Списания по всем парам (объект, реагент) за [since, until) одним
+    сгруппированным запросом: итог за все окно и за последние дни.
+    """
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    models_to_scan = [Transaction]
+    if closed_before is not None and since < closed_before:
+        models_to_scan.append(ArchivedTransaction)
+    for model in models_to_scan:
+        queryset = model.objects.filter(
+            transaction_type=Transaction.TransactionType.CONSUME,
+            operation_date__gte=since, operation_date__lt=until,
+        )
+        if facility_ids is not None:
+            queryset = queryset.filter(from_facility_id__in=facility_ids)
+        rows = queryset.values('chemical', facility=F('from_facility')).annotate(
+            total=Sum('quantity'),
+            recent=Sum('quantity', filter=Q(operation_date__gte=recent_since)),
+        ).order_by()
+        for row in rows:
+            pair = totals[(row['facility'], row['chemical'])]
+            pair[0] += row['total']
+            pair[1] += row['recent'] or 0
+    return totals
+
+
+def compute_runway(facility_ids=None, window=RUNWAY_DEFAULT_WINDOW, as_of=None):
+    """
+    Средний расход в сутки (скользящее среднее за window дней и за последние
+    RUNWAY_RECENT_WINDOW дней) и на сколько дней хватит текущего остатка.
+    Два запроса на любое число пар: списания по журналу и остатки из Inventory.
+    Прогноз строится по большему из двух средних, чтобы не проспать рост расхода.
+    Пустое окно (window=0) или отсутствие расхода дают нулевой расход и days_left=None.
+    """
+    as_of = as_of or timezone.now()
+    window = max(window, 0)
+    recent_window = min(RUNWAY_RECENT_WINDOW, window)
+    consumption = _consumption_totals(
+        facility_ids,
+        since=as_of - datetime.timedelta(days=window),
+        recent_since=as_of - datetime.timedelta(days=recent_window),
+        until=as_of,
+        closed_before=current_closed_before(),
+    )
+
+    stock = Inventory.objects.all()
+    if facility_ids is not None:
+        stock = stock.filter(facility_id__in=facility_ids)
+    rows = stock.values(
+        'facility_id', 'chemical_id', 'quantity', facility_name=F('facility__name'),
+        chemical_name=F('chemical__name'), unit=F('chemical__unit_of_measurement'),
+    )
+
+    results = []
+    for row in rows:
+        total, recent = consumption.get((row['facility_id'], row['chemical_id']), (0, 0))
+        if not total and not row['quantity']:
+            continue
+        daily_rate = Decimal(total) / window if window else Decimal(0)
+        recent_rate = Decimal(recent) / recent_window if recent_window else Decimal(0)
+        rate = max(daily_rate, recent_rate)
+        days_left = max(row['quantity'], 0) / rate if rate > 0 else None
+        results.append({
+            **row,
+            'daily_rate': round(daily_rate, 3),
+            'recent_daily_rate': round(recent_rate, 3),
+            'days_left': None if days_left is None else round(days_left, 1),
+        })
+    # Сначала то, что закончится раньше; без расхода - в конце
+    results.sort(key=lambda item: (item['days_left'] is None, item['days_left'] or 0, item['facility_name'], item['chemical_name']))
+    return results
+
+
+# --- Матрица перемещений ---
+
+def compute_transfer_flows(start, end, facility_ids=None, chemical_ids=None):
+    """
+    Сколько каждого реагента перемещено между парами объектов за [start, end):
+    один сгруппированный запрос по (реагент, откуда, куда) на журнал (и на архив,
+    если период задевает закрытые месяцы). Матрица разреженная - в ответ попадают
+    только пары, между которыми были перемещения, колонками, как ?layout=columnar:
+    {"count": N, "columns": {"chemical": [...], "from_facility": [...],
+    "to_facility": [...], "quantity": [...], "transfers": [...]},
+    "lookups": {"chemicals": {...}, "facilities": {...}}}.
+    facility_ids - только перемещения, у которых хотя бы один конец из списка.
+    """
+    closed_before = current_closed_before()
+    models_to_scan = [Transaction]
+    if closed_before is not None and start < closed_before:
+        models_to_scan.append(ArchivedTransaction)
+
+    flows = defaultdict(lambda: [Decimal(0), 0])
+    for model in models_to_scan:
+        queryset = model.objects.filter(
+            transaction_type=Transaction.TransactionType.TRANSFER,
+            operation_date__gte=start, operation_date__lt=end,
+        )
+        if facility_ids is not None:
+            queryset = queryset.filter(Q(from_facility_id__in=facility_ids) | Q(to_facility_id__in=facility_ids))
+        if chemical_ids is not None:
+            queryset = queryset.filter(chemical_id__in=chemical_ids)
+        rows = queryset.values_list('chemical', 'from_facility', 'to_facility').annotate(
+            total=Sum('quantity'), transfers=Count('id'),
+        ).order_by()
+        for chemical_id, from_id, to_id, total, transfers in rows:
+            flow = flows[(chemical_id, from_id, to_id)]
+            flow[0] += total
+            flow[1] += transfers
+
+    keys = sorted(flows)
+    columns = {
+        'chemical': [key[0] for key in keys],
+        'from_facility': [key[1] for key in keys],
+        'to_facility': [key[2] for key in keys],
+        'quantity': [str(flows[key][0]) for key in keys],
+        'transfers': [flows[key][1] for key in keys],
+    }
+    chemical_set = set(columns['chemical'])
+    facility_set = {pk for key in keys for pk in key[1:] if pk is not None}
+    chemicals = reference_cache.chemicals(chemical_set)
+    facilities = reference_cache.facilities(facility_set)
+    lookups = {
+        'chemicals': {
+            pk: {'name': chemicals[pk].name, 'unit': chemicals[pk].unit_of_measurement} for pk in sorted(chemical_set)
+        },
+        'facilities': {
+            pk: {'name': facilities[pk].name, 'type': facilities[pk].type} for pk in sorted(facility_set)
+        },
+    }
+    return {'count': len(keys), 'columns': columns, 'lookups': lookups}
+
+
+# --- Аналитика по проектам ---
+
+# Периоды до стольких дней показываются в тренде по дням, длиннее - по месяцам
+PROJECT_TREND_DAILY_MAX_DAYS = 92
+
+
+def _consumption_cost():
+    return Sum(ExpressionWrapper(F('quantity') * F('unit_cost'), output_field=COST_FIELD))
+
+
+def _project_bounds(project):
+    start = timezone.make_aware(datetime.datetime.combine(project.start_date, datetime.time.min))
+    end = None
+    if project.end_date is not None:
+        end = timezone.make_aware(datetime.datetime.combine(project.end_date + datetime.timedelta(days=1), datetime.time.min))
+    return start, end
+
+
+def compute_project_analytics(projects, start, end):
+    """
+    Расход по проектам за период [start, end): по реагентам (план/факт),
+    по скважинам, итоги и тренд. Проекты - с предзагруженными facilities
+    и budget_lines__chemical.
+
+    Считается по CostAllocation (списания по FIFO-партиям, включая архив),
+    поэтому количество и себестоимость берутся одной агрегацией: один
+    запрос по парам (объект, реагент) и один для тренда на все проекты
+    сразу, плюс по запросу на проект для факта за весь срок проекта.
+    Число запросов не зависит от числа скважин.
+    """
+    project_facilities = {project.pk: sorted(project.facilities.all(), key=lambda f: f.name) for project in projects}
+    facility_ids = {facility.pk for facilities in project_facilities.values() for facility in facilities}
+    consumed = CostAllocation.objects.filter(
+        transaction_type=Transaction.TransactionType.CONSUME, facility_id__in=facility_ids,
+    )
+    period = consumed.filter(operation_date__gte=start, operation_date__lt=end)
+
+    by_facility = defaultdict(list)
+    for row in period.values('facility', 'chemical').annotate(
+        total_quantity=Sum('quantity'), cost=_consumption_cost(),
+    ).order_by():
+        by_facility[row['facility']].append((row['chemical'], row['total_quantity'], row['cost']))
+
+    granularity = 'day' if (end - start).days <= PROJECT_TREND_DAILY_MAX_DAYS else 'month'
+    bucket = TruncDate('operation_date') if granularity == 'day' else TruncMonth('operation_date', output_field=DateField())
+    trend_rows = defaultdict(list)
+    for row in period.values('facility', bucket=bucket).annotate(cost=_consumption_cost()).order_by():
+        trend_rows[row['facility']].append((row['bucket'], row['cost']))
+
+    # Факт за весь срок проекта: у каждого проекта свои даты
+    all_time = {}
+    for project in projects:
+        queryset = consumed.filter(facility_id__in=[f.pk for f in project_facilities[project.pk]])
+        project_start, project_end = _project_bounds(project)
+        queryset = queryset.filter(operation_date__gte=project_start)
+        if project_end is not None:
+            queryset = queryset.filter(operation_date__lt=project_end)
+        all_time[project.pk] = {
+            row['chemical']: (row['total_quantity'], row['cost'])
+            for row in queryset.values('chemical').annotate(
+                total_quantity=Sum('quantity'), cost=_consumption_cost(),
+            ).order_by()
+        }
+
+    chemical_ids = {chemical_id for rows in by_facility.values() for chemical_id, _, _ in rows}
+    chemical_ids.update(chemical_id for totals in all_time.values() for chemical_id in totals)
+    chemicals = Chemical.objects.in_bulk(chemical_ids)
+    for project in projects:
+        chemicals.update({line.chemical_id: line.chemical for line in project.budget_lines.all()})
+
+    reports = [
+        _build_project_report(project, project_facilities[project.pk], by_facility, trend_rows, all_time[project.pk], chemicals)
+        for project in projects
+    ]
+    return {
+        'granularity': granularity,
+        'report_by_project': reports,
+        'grand_summary': {
+            'total_fact_cost': sum(report['summary']['total_fact_cost'] for report in reports),
+            'total_fact_cost_all_time': sum(report['summary']['total_fact_cost_all_time'] for report in reports),
+            'total_planned_cost': sum(report['summary']['total_planned_cost'] for report in reports),
+        },
+    }
+
+
+def _build_project_report(project, facilities, by_facility, trend_rows, all_time, chemicals):
+    zero = (Decimal(0), Decimal(0))
+    planned = {line.chemical_id: line.planned_quantity for line in project.budget_lines.all()}
+
+    period = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    by_well = []
+    trend = defaultdict(Decimal)
+    for facility in facilities:
+        items = []
+        for chemical_id, quantity, cost in by_facility.get(facility.pk, ()):
+            period[chemical_id][0] += quantity
+            period[chemical_id][1] += cost
+            items.append({'chemical_id': chemical_id, 'chemical_name': chemicals[chemical_id].name, 'quantity': quantity, 'cost': cost})
+        for day, cost in trend_rows.get(facility.pk, ()):
+            trend[day] += cost
+        items.sort(key=lambda item: item['chemical_name'])
+        by_well.append({
+            'facility_id': facility.pk,
+            'facility_name': facility.name,
+            'total_cost': sum(item['cost'] for item in items),
+            'items': items,
+        })
+
+    plan_fact_table = []
+    for chemical_id in sorted(set(planned) | set(period) | set(all_time), key=lambda pk: chemicals[pk].name):
+        chemical = chemicals[chemical_id]
+        planned_quantity = planned.get(chemical_id, Decimal(0))
+        period_quantity, period_cost = period.get(chemical_id, zero)
+        total_quantity, total_cost = all_time.get(chemical_id, zero)
+        plan_fact_table.append({
+            'chemical_id': chemical_id,
+            'chemical_name': chemical.name,
+            'unit': chemical.unit_of_measurement,
+            'planned_quantity': planned_quantity,
+            'planned_cost': planned_quantity * chemical.price,
+            'fact_period_quantity': period_quantity,
+            'fact_period_cost': period_cost,
+            'fact_total_quantity': total_quantity,
+            'fact_total_cost': total_cost,
+            'deviation': total_quantity - planned_quantity,
+        })
+
+    return {
+        'project_id': project.pk,
+        'project_name': project.name,
+        'status': project.status,
+        'start_date': project.start_date,
+        'end_date': project.end_date,
+        'summary': {
+            'wells_count': len(facilities),
+            'total_fact_cost': sum(item['fact_period_cost'] for item in plan_fact_table),
+            'total_fact_cost_all_time': sum(item['fact_total_cost'] for item in plan_fact_table),
+            'total_planned_cost': sum(item['planned_cost'] for item in plan_fact_table),
+        },
+        'plan_fact_table': plan_fact_table,
+        'by_well': by_well,
+        'trend': [{'period': day, 'cost': cost} for day, cost in sorted(trend.items())],
+    }
+
+
+# --- Сверка остатков с журналом ---
+
+def _net_movement(queryset, balances=None):
+    """Приход минус расход по парам (объект, реагент) для набора транзакций."""
+    balances = defaultdict(Decimal) if balances is None else balances
+    for side, sign in (('to_facility', 1), ('from_facility', -1)):
+        rows = queryset.filter(**{f'{side}__isnull': False}).values(
+            'chemical', facility=F(side)
+        ).annotate(total=Sum('quantity')).order_by()
+        for row in rows:
+            balances[(row['facility'], row['chemical'])] += sign * row['total']
+    return balances
+
+
+def _ledger_balances(facility_ids, pairs=None):
+    """
+    Остатки по журналу для объектов: перенесенный остаток закрытых
+    периодов плюс движение по открытому периоду.
+    """
+    chemical_ids = None if pairs is None else {chemical_id for _, chemical_id in pairs}
+    carry = CarryForwardBalance.objects.filter(facility_id__in=facility_ids)
+    if chemical_ids is not None:
+        carry = carry.filter(chemical_id__in=chemical_ids)
+    balances = defaultdict(Decimal)
+    for row in carry.values('facility', 'chemical', 'quantity'):
+        balances[(row['facility'], row['chemical'])] += row['quantity']
+
+    queryset = Transaction.objects.filter(Q(to_facility_id__in=facility_ids) | Q(from_facility_id__in=facility_ids))
+    if chemical_ids is not None:
+        queryset = queryset.filter(chemical_id__in=chemical_ids)
+    _net_movement(queryset, balances)
+    # Вторая сторона перемещения может быть чужим объектом - оставляем только свои
+    return defaultdict(Decimal, {key: value for key, value in balances.items() if key[0] in facility_ids})
+
+
+def _stored_balances(facility_ids):
+    return {
+        (row['facility'], row['chemical']): row['quantity']
+        for row in Inventory.objects.filter(facility_id__in=facility_ids).values('facility', 'chemical', 'quantity')
+    }
+
+
+def _find_drift(expected, stored):
+    drift = []
+    for key in expected.keys() | stored.keys():
+        ledger_qty = expected.get(key, Decimal(0))
+        stored_qty = stored.get(key)
+        if stored_qty is None and ledger_qty == 0:
+            continue
+        if stored_qty != ledger_qty:
+            drift.append((key[0], key[1], stored_qty, ledger_qty))
+    return drift
+
+
+def reconcile_facilities(facility_ids, repair=False):
+    """
+    Сверяет Inventory с журналом транзакций для группы объектов.
+    Возвращает список расхождений (facility_id, chemical_id, в Inventory, по журналу);
+    None в Inventory означает, что строки остатка нет.
+
+    Чтение идет одним снимком (REPEATABLE READ на PostgreSQL), поэтому
+    операции, идущие параллельно через API, не дают ложных расхождений.
+    При repair=True расхождения исправляются: строки Inventory блокируются,
+    баланс пересчитывается по журналу и записывается пачкой - так же, как
+    это делает recalculate_single_inventory, поэтому гонок с API нет.
+    """
+    with db_transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        drift = _find_drift(_ledger_balances(facility_ids), _stored_balances(facility_ids))
+
+    if repair and drift:
+        _repair_pairs({(facility_id, chemical_id) for facility_id, chemical_id, _, _ in drift})
+    return drift
+
+
+@db_transaction.atomic
+def _repair_pairs(pairs):
+    facility_ids = {facility_id for facility_id, _ in pairs}
+    chemical_ids = {chemical_id for _, chemical_id in pairs}
+
+    # Создаем недостающие строки и блокируем все затронутые
+    Inventory.objects.bulk_create(
+        [Inventory(facility_id=f, chemical_id=c, quantity=0) for f, c in pairs],
+        ignore_conflicts=True,
+    )
+    locked = [
+        item for item in Inventory.objects.select_for_update().filter(
+            facility_id__in=facility_ids, chemical_id__in=chemical_ids
+        )
+        if (item.facility_id, item.chemical_id) in pairs
+    ]
+    expected = _ledger_balances(facility_ids, pairs)
+    for item in locked:
+        item.quantity = expected.get((item.facility_id, item.chemical_id), Decimal(0))
+    Inventory.objects.bulk_update(locked, ['quantity'], batch_size=1000)
+    record_changes(ChangeLogEntry.Model.INVENTORY, [item.id for item in locked],
+                   facilities={item.id: (item.facility_id, None) for item in locked})
+
+
+# --- Закрытие периодов ---
+
+# Ключ advisory-блокировки PostgreSQL, которой закрытие периода и запись
+# операций согласуют границу закрытого периода
+PERIOD_LOCK_KEY = 7_341_001
+
+
+def current_closed_before():
+    """Граница закрытого периода: операции раньше нее менять нельзя (None - ничего не закрыто)."""
+    return ClosedPeriod.objects.aggregate(value=Max('closed_before'))['value']
+
+
+def lock_closed_period(exclusive=False):
+    """
+    Блокирует границу закрытого периода до конца транзакции БД (вызывать внутри atomic).
+    close_period берет блокировку исключительно, запись и изменение операций -
+    разделяемо: закрытие ждет операций, которые уже проверили дату, а новые
+    операции ждут закрытия и проверяют дату уже по новой границе.
+    На SQLite записи и так выполняются по одной.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    function = 'pg_advisory_xact_lock' if exclusive else 'pg_advisory_xact_lock_shared'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {function}(%s)', [PERIOD_LOCK_KEY])
+
+
+def locked_closed_before():
+    """Граница закрытого периода под разделяемой блокировкой (для записи операций)."""
+    lock_closed_period()
+    return current_closed_before()
+
+
+ARCHIVE_BATCH_SIZE = 2000
+ARCHIVED_FIELDS = (
+    'id', 'transaction_type', 'chemical_id', 'quantity', 'from_facility_id', 'to_facility_id',
+    'performed_by_id', 'timestamp', 'operation_date', 'document_name', 'document_file',
+    'comment', 'operation_uuid',
+)
+
+
+@db_transaction.atomic
+def close_period(closed_before, user):
+    """
+    Закрывает все до closed_before: итог закрываемых транзакций добавляется
+    в CarryForwardBalance, сами транзакции переносятся в ArchivedTransaction.
+    Inventory не меняется: перенесенный остаток + открытый период дают тот же итог.
+    MonthlyRollup тоже остается как есть, поэтому отчеты за закрытые месяцы работают.
+    """
+    if closed_before > timezone.now():
+        raise ValidationError("Нельзя закрыть период, который еще не наступил.")
+    lock_closed_period(exclusive=True)
+    current = current_closed_before()
+    if current is not None and closed_before <= current:
+        raise ValidationError(f"Период до {current:%Y-%m-%d %H:%M} уже закрыт.")
+
+    period = ClosedPeriod.objects.create(closed_before=closed_before, closed_by=user)
+    to_archive = Transaction.objects.filter(operation_date__lt=closed_before)
+
+    # 1. Переносим итог закрываемых транзакций во входящие остатки
+    movement = _net_movement(to_archive)
+    existing = {
+        (item.facility_id, item.chemical_id): item
+        for item in CarryForwardBalance.objects.select_for_update().filter(
+            facility_id__in={f for f, _ in movement}, chemical_id__in={c for _, c in movement}
+        )
+    }
+    to_create = []
+    for (facility_id, chemical_id), quantity in movement.items():
+        item = existing.get((facility_id, chemical_id))
+        if item is None:
+            to_create.append(CarryForwardBalance(
+                facility_id=facility_id, chemical_id=chemical_id, quantity=quantity, as_of=closed_before,
+            ))
+        else:
+            item.quantity += quantity
+    for item in existing.values():
+        item.as_of = closed_before
+    CarryForwardBalance.objects.bulk_create(to_create, batch_size=1000)
+    CarryForwardBalance.objects.bulk_update(existing.values(), ['quantity', 'as_of'], batch_size=1000)
+
+    # 2. Копируем строки в архив пачками и удаляем из горячей таблицы;
+    # в памяти - только текущая пачка
+    archived = 0
+    while True:
+        batch = list(to_archive.order_by('id').values(*ARCHIVED_FIELDS)[:ARCHIVE_BATCH_SIZE])
+        if not batch:
+            break
+        ArchivedTransaction.objects.bulk_create(
+            [ArchivedTransaction(archived_in=period, **row) for row in batch]
+        )
+        archived += Transaction.objects.filter(id__in=[row['id'] for row in batch]).delete()[0]
+        # Для клиентов синхронизации архивные строки уходят из журнала
+        record_changes(
+            ChangeLogEntry.Model.TRANSACTION, [row['id'] for row in batch], deleted=True,
+            facilities={row['id']: (row['from_facility_id'], row['to_facility_id']) for row in batch},
+        )
+
+    period.archived_count = archived
+    period.save(update_fields=['archived_count'])
+    return period
+
+
+# --- Дельта-синхронизация ---
+
+SYNC_PAGE_SIZE = 5000
+# Запись журнала может закоммититься позже записи с большим id, поэтому
+# версия ответа не продвигается дальше "неосевших" записей (сами изменения
+# отдаются, при следующем запросе они придут повторно). Неосевшие - моложе
+# начала самой старой открытой пишущей транзакции (долгий close_period держит
+# курсор, пока не закоммитится) и в любом случае моложе SYNC_SETTLE_SECONDS -
+# запас на расхождение часов серверов приложения и БД.
+SYNC_SETTLE_SECONDS = 2
+
+SYNC_TABLES = {
+    'facilities': (ChangeLogEntry.Model.FACILITY, Facility, ('id', 'name', 'type', 'location', 'created_at')),
+    'chemicals': (ChangeLogEntry.Model.CHEMICAL, Chemical, ('id', 'name', 'unit_of_measurement', 'description', 'price')),
+    'inventory': (ChangeLogEntry.Model.INVENTORY, Inventory, ('id', 'facility_id', 'chemical_id', 'quantity')),
+    'transactions': (ChangeLogEntry.Model.TRANSACTION, Transaction, ARCHIVED_FIELDS),
+}
+
+
+def _oldest_open_write_start():
+    """Начало самой старой открытой транзакции, которая уже что-то записала (только PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+        )
+        return cursor.fetchone()[0]
+
+
+def sync_horizon():
+    """Записи журнала новее этого момента еще могут соседствовать с незакоммиченными записями с меньшим id."""
+    horizon = timezone.now()
+    oldest = _oldest_open_write_start()
+    if oldest is not None:
+        horizon = min(horizon, oldest)
+    return horizon - datetime.timedelta(seconds=SYNC_SETTLE_SECONDS)
+
+
+def current_change_version():
+    return ChangeLogEntry.objects.aggregate(value=Max('id'))['value'] or 0
+
+
+def _sync_rows(table, scopes):
+    model_class = SYNC_TABLES[table][1]
+    rows = model_class.objects.all()
+    condition = scopes.get(table)
+    return rows if condition is None else rows.filter(condition)
+
+
+def _snapshot(tables, scopes):
+    version = current_change_version()
+    return {
+        'version': version,
+        'has_more': False,
+        'reset': True,
+        'changes': {table: list(_sync_rows(table, scopes).order_by('pk').values(*SYNC_TABLES[table][2])) for table in tables},
+        'deleted': {table: [] for table in tables},
+    }
+
+
+def collect_changes(since, tables, limit=SYNC_PAGE_SIZE, scopes=None, entry_scope=None):
+    """
+    Изменения перечисленных таблиц после версии since.
+    since=0 (или версия старше очищенного журнала) - полный снимок с reset=True:
+    клиент заменяет локальную копию целиком. Иначе - только измененные строки
+    и id удаленных, не больше limit записей журнала за раз (has_more=True - есть еще).
+    scopes - {таблица: Q}: строки вне условия не отдаются (и не считаются удаленными).
+    entry_scope - Q по объектам записи журнала (facility, other_facility) для
+    таблиц из scopes: чужие изменения и удаления пропускаются. Записи без
+    объектов (сделанные до их появления в журнале) не фильтруются.
+    """
+    scopes = scopes or {}
+    if since == 0:
+        return _snapshot(tables, scopes)
+    oldest = ChangeLogEntry.objects.aggregate(value=Min('id'))['value']
+    if oldest is not None and since < oldest - 1:
+        return _snapshot(tables, scopes)
+
+    latest = current_change_version()
+    models_by_name = {SYNC_TABLES[table][0]: table for table in tables}
+    entries = ChangeLogEntry.objects.filter(id__gt=since, model__in=models_by_name)
+    scoped_models = [SYNC_TABLES[table][0] for table in tables if table in scopes]
+    if entry_scope is not None and scoped_models:
+        entries = entries.filter(
+            ~Q(model__in=scoped_models) | Q(facility__isnull=True, other_facility__isnull=True) | entry_scope
+        )
+    entries = list(entries.order_by('id').values_list('id', 'model', 'object_id', 'deleted', 'changed_at')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    version = entries[-1][0] if has_more else max(since, latest)
+
+    horizon = sync_horizon()
+    unsettled = [entry_id for entry_id, *_, changed_at in entries if changed_at > horizon]
+    if unsettled:
+        version = min(version, unsettled[0] - 1)
+
+    # Для каждой строки важна только последняя запись
+    state = {}
+    for _, model, object_id, deleted, _ in entries:
+        state[(model, object_id)] = deleted
+
+    changes, removed = {table: [] for table in tables}, {table: [] for table in tables}
+    for model, table in models_by_name.items():
+        live = [object_id for (m, object_id), deleted in state.items() if m == model and not deleted]
+        removed[table] = [object_id for (m, object_id), deleted in state.items() if m == model and deleted]
+        _, model_class, fields = SYNC_TABLES[table]
+        rows = list(_sync_rows(table, scopes).filter(pk__in=live).order_by('pk').values(*fields)) if live else []
+        found = {row['id'] for row in rows}
+        changes[table] = rows
+        missing = [object_id for object_id in live if object_id not in found]
+        if missing and table in scopes:
+            # Строки чужих объектов существуют, просто не видны клиенту
+            found = set(model_class.objects.filter(pk__in=missing).values_list('pk', flat=True))
+            missing = [object_id for object_id in missing if object_id not in found]
+        # Строка могла быть удалена позже, чем попала в эту страницу журнала
+        removed[table] += missing
+    return {'version': version, 'has_more': has_more, 'reset': False, 'changes': changes, 'deleted': removed}
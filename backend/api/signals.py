@@ -0,0 +1,39 @@
+# backend/api/signals.py
+# Версии изменений для справочников. Объекты и реагенты меняются через
+# ModelViewSet и админку (save/delete), поэтому их удобно ловить сигналами.
+# Транзакции и остатки пишутся пачками (bulk_create, update) в обход
+# сигналов - их версии записываются явно в services, а правки в админке -
+# в save_model/delete_model (см. admin).
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ChangeLogEntry, Chemical, Facility, Inventory
+from .reference import reference_cache
+from .services import record_changes
+
+TRACKED_MODELS = {
+    Facility: ChangeLogEntry.Model.FACILITY,
+    Chemical: ChangeLogEntry.Model.CHEMICAL,
+}
+
+
+@receiver(post_save, sender=Facility)
+@receiver(post_save, sender=Chemical)
+def record_reference_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_changes(TRACKED_MODELS[sender], [instance.pk])
+    reference_cache.invalidate(sender)
+
+
+@receiver(post_delete, sender=Facility)
+@receiver(post_delete, sender=Chemical)
+def record_reference_delete(sender, instance, **kwargs):
+    record_changes(TRACKED_MODELS[sender], [instance.pk], deleted=True)
+    reference_cache.invalidate(sender)
+
+
+@receiver(post_delete, sender=Inventory)
+def record_inventory_delete(sender, instance, **kwargs):
+    # Нулевые остатки удаляются каскадом вместе с объектом
+    record_changes(ChangeLogEntry.Model.INVENTORY, [instance.pk], deleted=True,
+                   facilities={instance.pk: (instance.facility_id, None)})
@@ -0,0 +1,78 @@
+import datetime
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ..authentication import ClaimsTokenObtainPairSerializer
+from ..models import Chemical, Facility, Transaction, User
+
+
+def at(value):
+    return timezone.make_aware(datetime.datetime.fromisoformat(value))
+
+
+class LedgerTestCase(TestCase):
+    """Общие данные: склад, две скважины, два реагента, администратор и инженер скважины 1."""
+
+    def setUp(self):
+        # Лимиты частоты, счетчики отказов и закрепления за основной БД живут в файловых кэшах
+        caches['throttle'].clear()
+        caches['host_state'].clear()
+        self.warehouse = Facility.objects.create(name='Склад', type='warehouse')
+        self.well = Facility.objects.create(name='Скважина 1', type='well')
+        self.other_well = Facility.objects.create(name='Скважина 2', type='well')
+        self.barite = Chemical.objects.create(name='Барит', unit_of_measurement='кг', price=Decimal('5'))
+        self.soda = Chemical.objects.create(name='Сода', unit_of_measurement='кг', price=Decimal('2'))
+        self.admin = User.objects.create_user('admin', password='x', role='admin')
+        self.engineer = User.objects.create_user('engineer', password='x', role='engineer', related_facility=self.well)
+        self.api = self.client_for(self.admin)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def bearer_for(self, user):
+        # Настоящий access-токен: async-вьюхи аутентифицируют запрос сами, без DRF
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def operation(self, transaction_type, chemical, quantity, date, from_facility=None, to_facility=None):
+        response = self.api.post('/api/operations/create/bulk/', {
+            'transaction_type': transaction_type,
+            'from_facility': from_facility and from_facility.id,
+            'to_facility': to_facility and to_facility.id,
+            'operation_date': date,
+            'items': [{'chemicalId': chemical.id, 'quantity': str(quantity)}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()[0]['operation_uuid']
+
+    def edit(self, operation_uuid, transaction_type, chemical, quantity, date, from_facility=None, to_facility=None):
+        response = self.api.post('/api/operations/edit/', {
+            'original_uuid': operation_uuid,
+            'new_operation_data': {
+                'transaction_type': transaction_type,
+                'from_facility': from_facility and from_facility.id,
+                'to_facility': to_facility and to_facility.id,
+                'operation_date': date,
+                'items': [{'chemicalId': chemical.id, 'quantity': str(quantity)}],
+            },
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return Transaction.objects.filter(operation_date=at(date)).values_list('operation_uuid', flat=True).first()
+
+    def delete(self, operation_uuid):
+        response = self.api.post('/api/operations/delete/', {'operation_uuid': operation_uuid}, format='json')
+        self.assertEqual(response.status_code, 204, response.content)
+
+    def seed_ledger(self):
+        self.operation('add', self.barite, 100, '2026-01-05T09:00', to_facility=self.warehouse)
+        self.operation('add', self.soda, 40, '2026-01-20T09:00', to_facility=self.warehouse)
+        transfer = self.operation('transfer', self.barite, 30, '2026-02-03T09:00', self.warehouse, self.well)
+        self.operation('consume', self.barite, 12, '2026-02-28T18:00', from_facility=self.well)
+        self.operation('transfer', self.soda, 5, '2026-03-01T00:00', self.warehouse, self.other_well)
+        return transfer
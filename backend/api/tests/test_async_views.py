@@ -0,0 +1,77 @@
+from unittest import mock
+
+from ..throttling import EndpointClassThrottle
+from .base import LedgerTestCase
+
+REPORT_URL = '/api/async/reports/facility-detail/?facility_id={}&start_date=2026-01-01&end_date=2026-03-31'
+
+
+class AsyncViewLimitTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seed_ledger()
+        self.headers = self.bearer_for(self.admin)
+
+    def test_report_is_throttled_by_class(self):
+        rates = dict(EndpointClassThrottle.THROTTLE_RATES, reports='1/min')
+        with mock.patch.object(EndpointClassThrottle, 'THROTTLE_RATES', rates):
+            self.assertEqual(self.client.get(REPORT_URL.format(self.warehouse.id), **self.headers).status_code, 200)
+            response = self.client.get(REPORT_URL.format(self.warehouse.id), **self.headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Обычные чтения считаются отдельно
+        self.assertEqual(self.client.get('/api/async/chemicals/', **self.headers).status_code, 200)
+
+    def test_report_takes_heavy_slot(self):
+        with mock.patch('api.async_views.acquire_slot', return_value=None):
+            response = self.client.get(REPORT_URL.format(self.warehouse.id), **self.headers)
+        self.assertEqual(response.status_code, 429)
+
+        slot = object()
+        with mock.patch('api.async_views.acquire_slot', return_value=slot) as acquire, \
+                mock.patch('api.async_views.release_slot') as release:
+            self.assertEqual(self.client.get(REPORT_URL.format(self.warehouse.id), **self.headers).status_code, 200)
+            # Ошибка валидации тоже освобождает слот
+            self.assertEqual(self.client.get('/api/async/reports/facility-detail/', **self.headers).status_code, 400)
+        self.assertEqual(acquire.call_count, 2)
+        release.assert_has_calls([mock.call(slot), mock.call(slot)])
+
+
+class AsyncListTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seed_ledger()
+        self.headers = self.bearer_for(self.admin)
+
+    def get(self, url, user=None):
+        response = self.client.get(url, **(self.bearer_for(user) if user else self.headers))
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_lists_are_paginated(self):
+        page = self.get('/api/async/transactions/?limit=2&offset=1')
+        self.assertEqual(page['count'], 5)
+        self.assertEqual(len(page['results']), 2)
+        self.assertIn('offset=3', page['next'])
+        # Фильтры синхронного вьюсета
+        page = self.get('/api/async/transactions/?transaction_type=add')
+        self.assertEqual(page['count'], 2)
+
+    def test_sparse_fields_and_columnar_layout(self):
+        page = self.get('/api/async/inventory/?fields=id,quantity')
+        self.assertEqual({tuple(sorted(row)) for row in page['results']}, {('id', 'quantity')})
+
+        payload = self.get('/api/async/inventory/?layout=columnar&fields=chemical,quantity&limit=2')
+        self.assertEqual(payload['count'], 4)
+        self.assertEqual(set(payload['columns']), {'chemical', 'quantity'})
+        self.assertEqual(len(payload['columns']['quantity']), 2)
+        self.assertTrue(set(payload['columns']['chemical']) <= {int(pk) for pk in payload['lookups']['chemicals']})
+
+        response = self.client.get('/api/async/inventory/?fields=secret', **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_engineer_list_is_scoped(self):
+        page = self.get('/api/async/inventory/', user=self.engineer)
+        self.assertEqual({row['facility']['id'] for row in page['results']}, {self.well.id})
@@ -0,0 +1,39 @@
+from ..authentication import ClaimsTokenObtainPairSerializer, user_state_cache
+from .base import LedgerTestCase
+
+
+class TokenRevocationTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user_state_cache.clear()
+        self.refresh = ClaimsTokenObtainPairSerializer.get_token(self.engineer)
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {self.refresh.access_token}'}
+
+    def test_role_change_revokes_issued_tokens(self):
+        self.assertEqual(self.client.get('/api/chemicals/', **self.headers).status_code, 200)
+
+        response = self.api.patch(f'/api/users/{self.engineer.id}/', {'role': 'logistician'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        # Токен с прежней ролью отклоняется сразу, без ожидания TTL кэша
+        self.assertEqual(self.client.get('/api/chemicals/', **self.headers).status_code, 401)
+        response = self.client.post('/auth/jwt/refresh/', {'refresh': str(self.refresh)}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+        self.engineer.refresh_from_db()
+        fresh = ClaimsTokenObtainPairSerializer.get_token(self.engineer).access_token
+        self.assertEqual(self.client.get('/api/chemicals/', HTTP_AUTHORIZATION=f'Bearer {fresh}').status_code, 200)
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/chemicals/', **self.headers).status_code, 200)
+        self.engineer.is_active = False
+        self.engineer.save()
+        user_state_cache.invalidate(self.engineer.id)
+        self.assertEqual(self.client.get('/api/chemicals/', **self.headers).status_code, 401)
+
+    def test_refresh_rotates_tokens(self):
+        response = self.client.post('/auth/jwt/refresh/', {'refresh': str(self.refresh)}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        rotated = response.json()
+        self.assertIn('refresh', rotated)
+        self.assertEqual(self.client.get('/api/chemicals/', HTTP_AUTHORIZATION=f"Bearer {rotated['access']}").status_code, 200)
@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+from ..models import Inventory, Transaction
+from .base import LedgerTestCase
+
+
+class BatchOperationTests(LedgerTestCase):
+
+    def batch(self, operations):
+        response = self.api.post('/api/operations/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def test_resubmitted_key_is_not_applied_twice(self):
+        operation = {
+            'idempotency_key': 'device-1:42', 'transaction_type': 'add', 'to_facility': self.well.id,
+            'operation_date': '2026-01-05T09:00', 'items': [{'chemicalId': self.barite.id, 'quantity': 3}],
+        }
+        first = self.batch([operation])
+        second = self.batch([operation])
+        self.assertEqual(first[0]['status'], 'created')
+        self.assertEqual(second[0]['status'], 'duplicate')
+        self.assertEqual(second[0]['operation_uuid'], first[0]['operation_uuid'])
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(Inventory.objects.get(facility=self.well, chemical=self.barite).quantity, Decimal('3'))
+
+    def test_malformed_operations_fail_individually(self):
+        valid = {
+            'idempotency_key': 'ok', 'transaction_type': 'add', 'to_facility': self.well.id,
+            'operation_date': '2026-01-05T09:00', 'items': [{'chemicalId': self.barite.id, 'quantity': 3}],
+        }
+        results = self.batch([
+            dict(valid, idempotency_key='not-dicts', items='[1,2]'),
+            dict(valid, idempotency_key='bad-json', items='{'),
+            dict(valid, idempotency_key='bad-type', transaction_type='steal'),
+            valid,
+        ])
+        self.assertEqual([result['status'] for result in results], ['error', 'error', 'error', 'created'])
+        self.assertEqual(Transaction.objects.count(), 1)
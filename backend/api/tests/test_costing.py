@@ -0,0 +1,73 @@
+import importlib
+from decimal import Decimal
+
+from django.apps import apps
+
+from ..costing import rebuild_all, well_cost_summary
+from ..models import Chemical, CostAllocation, CostLayer
+from .base import LedgerTestCase, at
+
+
+class CostLayerTests(LedgerTestCase):
+
+    def summary(self, facility):
+        items = well_cost_summary(facility.id, at('2026-01-01T00:00'), at('2026-02-01T00:00'))
+        return items[self.barite.id]
+
+    def layer_state(self):
+        layers = sorted(CostLayer.objects.exclude(remaining=0).values_list('facility_id', 'kind', 'unit_cost', 'remaining'))
+        allocations = sorted(CostAllocation.objects.values_list('facility_id', 'transaction_type', 'quantity', 'unit_cost'))
+        return layers, allocations
+
+    def seed_layers(self):
+        first = self.operation('add', self.barite, 10, '2026-01-01T09:00', to_facility=self.well)
+        Chemical.objects.filter(pk=self.barite.pk).update(price=Decimal('7'))
+        self.operation('add', self.barite, 10, '2026-01-02T09:00', to_facility=self.well)
+        # Списание в последний день периода тоже входит в расчет закрытия
+        consume = self.operation('consume', self.barite, 15, '2026-01-31T18:00', from_facility=self.well)
+        return first, consume
+
+    def test_fifo_cost(self):
+        self.seed_layers()
+        summary = self.summary(self.well)
+        self.assertEqual(Decimal(summary['consumed_cost']), Decimal('85'))  # 10 x 5 + 5 x 7
+        self.assertEqual(Decimal(summary['on_hand_value']), Decimal('35'))  # 5 x 7
+
+    def test_rebuild_after_edit_and_delete(self):
+        first, consume = self.seed_layers()
+        # Задним числом: первая партия удалена, списание уменьшено
+        self.delete(first)
+        self.edit(consume, 'consume', self.barite, 4, '2026-01-20T18:00', from_facility=self.well)
+        summary = self.summary(self.well)
+        self.assertEqual(Decimal(summary['consumed_cost']), Decimal('28'))  # 4 x 7
+        self.assertEqual(Decimal(summary['on_hand_value']), Decimal('42'))  # 6 x 7
+
+        incremental = self.layer_state()
+        rebuild_all()
+        self.assertEqual(incremental, self.layer_state())
+
+    def test_backdated_operation_rebuilds_only_linked_facilities(self):
+        self.seed_ledger()
+        well_layers = set(CostLayer.objects.filter(facility=self.well).values_list('id', 'remaining'))
+        # Задним числом на другой скважине: перемещения барита ее с объектом 1 не связывают,
+        # поэтому перемещенные на скважину 1 партии не пересоздаются
+        self.operation('add', self.barite, 3, '2026-01-10T09:00', to_facility=self.other_well)
+        self.operation('consume', self.barite, 1, '2026-01-12T09:00', from_facility=self.other_well)
+        self.assertEqual(set(CostLayer.objects.filter(facility=self.well).values_list('id', 'remaining')), well_layers)
+
+        incremental = self.layer_state()
+        rebuild_all()
+        self.assertEqual(incremental, self.layer_state())
+
+    def test_migration_backfill_matches_rebuild(self):
+        transfer = self.seed_ledger()
+        self.edit(transfer, 'transfer', self.barite, 50, '2026-02-03T09:00', self.warehouse, self.well)
+        self.operation('consume', self.soda, 50, '2026-03-05T09:00', from_facility=self.warehouse)
+        rebuild_all()
+        expected = self.layer_state()
+
+        CostAllocation.objects.all().delete()
+        CostLayer.objects.all().delete()
+        migration = importlib.import_module('api.migrations.0014_fifo_cost_layers')
+        migration.populate_cost_layers(apps, None)
+        self.assertEqual(self.layer_state(), expected)
@@ -0,0 +1,89 @@
+import contextlib
+import datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+
+from ..inventory_index import facility_stock, inventory_index, stock_quantities, stock_totals
+from ..models import ChangeLogEntry, Transaction
+from ..services import current_change_version, record_changes
+from .base import LedgerTestCase
+
+
+@override_settings(INVENTORY_INDEX_ENABLED=True, INVENTORY_INDEX_MAX_LAG=0)
+class InventoryIndexTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        inventory_index.clear()
+        inventory_index.mark_stale()
+        self.addCleanup(inventory_index.clear)
+        self.transfer = self.seed_ledger()
+
+    @contextlib.contextmanager
+    def settled(self):
+        # Записи журнала моложе SYNC_SETTLE_SECONDS индекс еще не применяет
+        later = timezone.now() + datetime.timedelta(seconds=10)
+        with mock.patch('api.services.timezone.now', return_value=later), \
+                mock.patch.object(inventory_index, '_build', wraps=inventory_index._build) as build:
+            yield build
+
+    def assert_matches_db(self):
+        for facility in (self.warehouse, self.well, self.other_well):
+            self.assertEqual(facility_stock(facility.id, in_stock=False),
+                             facility_stock(facility.id, in_stock=False, use_index=False))
+        self.assertEqual(stock_totals(), stock_totals(use_index=False))
+        self.assertEqual(stock_totals([self.well.id]), stock_totals([self.well.id], use_index=False))
+
+    def test_catches_up_after_edit_and_delete(self):
+        with self.settled():
+            self.assert_matches_db()
+
+        # Правка и удаление пишут в журнал и удаления строк операций
+        self.edit(self.transfer, 'transfer', self.barite, 25, '2026-02-03T09:00', self.warehouse, self.well)
+        soda_transfer = Transaction.objects.get(chemical=self.soda, transaction_type='transfer').operation_uuid
+        self.delete(soda_transfer)
+        self.assertTrue(ChangeLogEntry.objects.filter(model=ChangeLogEntry.Model.TRANSACTION, deleted=True).exists())
+
+        with self.settled() as build:
+            quantities = stock_quantities(self.well.id, [self.barite.id, self.soda.id])
+            self.assert_matches_db()
+        build.assert_not_called()
+        self.assertEqual(quantities, {self.barite.id: Decimal('13'), self.soda.id: Decimal('0')})
+        self.assertEqual(inventory_index.matrix().version, current_change_version())
+
+    def test_operation_only_tail_advances_version(self):
+        with self.settled():
+            inventory_index.matrix()
+        ids = list(Transaction.objects.values_list('pk', flat=True))
+        record_changes(ChangeLogEntry.Model.TRANSACTION, ids, deleted=True)
+        inventory_index.mark_stale()
+
+        with self.settled() as build:
+            matrix = inventory_index.matrix()
+        build.assert_not_called()
+        self.assertEqual(matrix.version, current_change_version())
+
+    def test_new_chemical_rebuilds(self):
+        with self.settled():
+            inventory_index.matrix()
+        chemical = self.api.post('/api/chemicals/', {'name': 'Бентонит', 'unit_of_measurement': 'кг'}, format='json')
+        self.assertEqual(chemical.status_code, 201, chemical.content)
+        self.operation('add', self.barite, 1, '2026-03-02T09:00', to_facility=self.warehouse)
+
+        with self.settled() as build:
+            self.assert_matches_db()
+        build.assert_called_once()
+
+    def test_unsettled_entries_are_not_applied_yet(self):
+        with self.settled():
+            settled_version = inventory_index.matrix().version
+        self.operation('add', self.barite, 1, '2026-03-02T09:00', to_facility=self.warehouse)
+
+        matrix = inventory_index.matrix()
+        self.assertEqual(matrix.version, settled_version)
+        self.assertEqual(matrix.quantity(self.warehouse.id, self.barite.id), Decimal('70'))
+        with self.settled():
+            self.assertEqual(inventory_index.matrix().quantity(self.warehouse.id, self.barite.id), Decimal('71'))
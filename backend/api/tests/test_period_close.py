@@ -0,0 +1,49 @@
+import datetime
+from unittest import mock
+
+from django.utils import timezone
+
+from ..models import ArchivedTransaction, ChangeLogEntry, ClosedPeriod, Inventory, Transaction
+from ..services import compute_facility_balances
+from .base import LedgerTestCase, at
+
+
+class PeriodCloseTests(LedgerTestCase):
+
+    def test_close_archives_and_keeps_balances(self):
+        self.seed_ledger()
+        inventory = sorted(Inventory.objects.values_list('facility_id', 'chemical_id', 'quantity'))
+        start, end = at('2026-01-01T00:00'), at('2026-03-31T00:00')
+        report = compute_facility_balances([self.warehouse.id], start, end)
+
+        response = self.api.post('/api/periods/close/', {'closed_before': '2026-02-01T00:00'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(ArchivedTransaction.objects.count(), 2)
+        self.assertFalse(Transaction.objects.filter(operation_date__lt=at('2026-02-01T00:00')).exists())
+        self.assertEqual(sorted(Inventory.objects.values_list('facility_id', 'chemical_id', 'quantity')), inventory)
+        self.assertEqual(compute_facility_balances([self.warehouse.id], start, end), report)
+
+    def test_closed_period_rejects_operations_and_repeat_close(self):
+        self.api.post('/api/periods/close/', {'closed_before': '2026-02-01T00:00'}, format='json')
+        response = self.api.post('/api/operations/create/bulk/', {
+            'transaction_type': 'add', 'to_facility': self.well.id, 'operation_date': '2026-01-31T09:00',
+            'items': [{'chemicalId': self.barite.id, 'quantity': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.api.post('/api/periods/close/', {'closed_before': '2026-01-15T00:00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_future_period_is_rejected(self):
+        tomorrow = timezone.localtime() + datetime.timedelta(days=1)
+        response = self.api.post('/api/periods/close/', {'closed_before': tomorrow.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ClosedPeriod.objects.exists())
+
+    def test_archive_runs_in_batches(self):
+        self.seed_ledger()
+        with mock.patch('api.services.ARCHIVE_BATCH_SIZE', 1):
+            response = self.api.post('/api/periods/close/', {'closed_before': '2026-03-01T00:00'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['archived_count'], 4)
+        self.assertEqual(ArchivedTransaction.objects.count(), 4)
+        self.assertEqual(ChangeLogEntry.objects.filter(model='transaction', deleted=True).count(), 4)
@@ -0,0 +1,35 @@
+from django.test import RequestFactory
+
+from ..models import RequestProfile
+from ..profiling import evict_profiles, is_flagged
+from .base import LedgerTestCase
+
+
+class ProfilingTests(LedgerTestCase):
+
+    def test_flag_is_exact_query_param(self):
+        factory = RequestFactory()
+        self.assertTrue(is_flagged(factory.get('/api/chemicals/?_profile=1')))
+        self.assertTrue(is_flagged(factory.get('/api/chemicals/', HTTP_X_PROFILE='1')))
+        self.assertFalse(is_flagged(factory.get('/api/chemicals/?x_profile=1')))
+        self.assertFalse(is_flagged(factory.get('/api/chemicals/?_profile=10')))
+
+    def test_profiled_request_is_saved(self):
+        response = self.client.get('/api/chemicals/?_profile=1', **self.bearer_for(self.admin))
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertGreater(profile.query_count, 0)
+        # Не администратор профиль не получает
+        response = self.client.get('/api/chemicals/?_profile=1', **self.bearer_for(self.engineer))
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_oldest_profiles_are_evicted_by_size(self):
+        profiles = [
+            RequestProfile.objects.create(
+                user=self.admin, method='GET', path='/', status_code=200, duration_ms=1,
+                query_count=0, query_time_ms=0, size=100, data={},
+            )
+            for _ in range(5)
+        ]
+        self.assertEqual(evict_profiles(limit=250), 3)
+        self.assertEqual(sorted(RequestProfile.objects.values_list('pk', flat=True)), [p.pk for p in profiles[3:]])
+        self.assertEqual(evict_profiles(limit=250), 0)
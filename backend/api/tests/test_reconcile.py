@@ -0,0 +1,14 @@
+from decimal import Decimal
+
+from ..models import Inventory
+from ..services import reconcile_facilities
+from .base import LedgerTestCase
+
+
+class ReconcileTests(LedgerTestCase):
+
+    def test_inventory_matches_ledger(self):
+        transfer = self.seed_ledger()
+        self.edit(transfer, 'transfer', self.barite, 20, '2026-02-04T09:00', self.warehouse, self.well)
+        self.assertEqual(reconcile_facilities([self.warehouse.id, self.well.id, self.other_well.id]), [])
+        self.assertEqual(Inventory.objects.get(facility=self.well, chemical=self.barite).quantity, Decimal('8'))
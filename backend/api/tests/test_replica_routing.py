@@ -0,0 +1,54 @@
+from unittest import mock
+
+from ..db_routers import (REPLICA_ALIAS, ReplicaRouter, _use_replica, enable_replica_reads,
+                          is_pinned, pin_to_primary, primary, replica_reads)
+from ..models import Inventory
+from .base import LedgerTestCase
+
+
+class ReplicaRouterTests(LedgerTestCase):
+
+    def test_reads_stay_on_primary_without_replica(self):
+        router = ReplicaRouter()
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Inventory), 'default')
+
+    def test_replica_reads_only_inside_block(self):
+        router = ReplicaRouter()
+        with mock.patch('api.db_routers.replica_configured', return_value=True):
+            with replica_reads():
+                self.assertEqual(router.db_for_read(Inventory), REPLICA_ALIAS)
+                self.assertEqual(router.db_for_write(Inventory), 'default')
+                with primary():
+                    self.assertEqual(router.db_for_read(Inventory), 'default')
+                self.assertEqual(router.db_for_read(Inventory), REPLICA_ALIAS)
+        self.assertEqual(router.db_for_read(Inventory), 'default')
+
+
+class ReadYourWritesTests(LedgerTestCase):
+
+    def test_write_pins_user_to_primary(self):
+        self.assertFalse(is_pinned(self.admin.id))
+        self.api.get('/api/inventory/')
+        self.assertFalse(is_pinned(self.admin.id))
+
+        self.operation('add', self.barite, 10, '2026-01-05T09:00', to_facility=self.warehouse)
+        self.assertTrue(is_pinned(self.admin.id))
+        # Закрепление касается только писавшего пользователя
+        self.assertFalse(is_pinned(self.engineer.id))
+
+    def test_failed_write_does_not_pin(self):
+        response = self.api.post('/api/operations/create/bulk/', {'transaction_type': 'add', 'items': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(is_pinned(self.admin.id))
+
+    def test_pinned_user_reads_primary(self):
+        with mock.patch('api.mixins.enable_replica_reads', wraps=enable_replica_reads) as enable:
+            self.assertEqual(self.api.get('/api/inventory/').status_code, 200)
+            self.assertEqual(enable.call_count, 1)
+            # Флаг сбрасывается вместе с окончанием запроса
+            self.assertFalse(_use_replica.get())
+
+            pin_to_primary(self.admin.id)
+            self.assertEqual(self.api.get('/api/inventory/').status_code, 200)
+            self.assertEqual(enable.call_count, 1)
@@ -0,0 +1,81 @@
+import tempfile
+from unittest import mock
+
+from django.test import override_settings
+
+from ..models import ReportJob
+from ..report_jobs import _latest_job, claim_next_job, run_job, submit_job
+from .base import LedgerTestCase
+
+
+class ReportJobDedupTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seed_ledger()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.params = {'facility_ids': [self.warehouse.id], 'start': '2026-01-01T00:00:00', 'end': '2026-04-01T00:00:00'}
+
+    def post_job(self, fmt='csv'):
+        return self.api.post('/api/report-jobs/', {
+            'kind': 'facility_detail', 'format': fmt, 'facility_id': self.warehouse.id,
+            'start_date': '2026-01-01', 'end_date': '2026-03-31',
+        }, format='json')
+
+    def test_duplicate_request_reuses_pending_job(self):
+        first = self.post_job()
+        self.assertEqual(first.status_code, 202, first.content)
+        second = self.post_job()
+        self.assertEqual(second.status_code, 200, second.content)
+        self.assertEqual(second.json()['id'], first.json()['id'])
+
+        # Другой формат - другое задание
+        self.assertEqual(self.post_job('xlsx').status_code, 202)
+        self.assertEqual(ReportJob.objects.count(), 2)
+
+    def test_done_job_is_reused_until_ledger_changes(self):
+        job_id = self.post_job().json()['id']
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, ReportJob.Status.DONE, job.error)
+
+        response = self.post_job()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], job_id)
+
+        # Новая операция по объекту делает файл устаревшим
+        self.operation('add', self.barite, 1, '2026-03-10T09:00', to_facility=self.warehouse)
+        response = self.post_job()
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.json()['id'], job_id)
+
+    def test_racing_duplicate_returns_winner(self):
+        winner, _ = submit_job(self.admin, 'facility_detail', 'csv', self.params)
+        # Параллельный запрос не увидел задание и упирается в уникальный индекс
+        with mock.patch('api.report_jobs._latest_job', side_effect=[None, winner]):
+            job, created = submit_job(self.engineer, 'facility_detail', 'csv', self.params)
+        self.assertFalse(created)
+        self.assertEqual(job.pk, winner.pk)
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+    def test_racing_duplicate_that_failed_is_retried(self):
+        loser, _ = submit_job(self.admin, 'facility_detail', 'csv', self.params)
+        calls = []
+
+        def latest(fingerprint):
+            calls.append(fingerprint)
+            if len(calls) == 1:
+                return None
+            if len(calls) == 2:
+                # Задание-победитель успело упасть, пока мы пытались вставить свое
+                ReportJob.objects.filter(pk=loser.pk).update(status=ReportJob.Status.FAILED)
+            return _latest_job(fingerprint)
+
+        with mock.patch('api.report_jobs._latest_job', side_effect=latest):
+            job, created = submit_job(self.engineer, 'facility_detail', 'csv', self.params)
+        self.assertTrue(created)
+        self.assertNotEqual(job.pk, loser.pk)
+        self.assertEqual(job.status, ReportJob.Status.PENDING)
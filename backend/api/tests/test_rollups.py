@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from ..models import MonthlyRollup, Transaction
+from ..services import compute_facility_balances, rebuild_monthly_rollups
+from .base import LedgerTestCase, at
+
+
+class RollupParityTests(LedgerTestCase):
+
+    def rollup_state(self):
+        return sorted(MonthlyRollup.objects.exclude(income=0, outcome=0).values_list(
+            'facility_id', 'chemical_id', 'month', 'transaction_type', 'income', 'outcome',
+        ))
+
+    def ledger_balances(self, facility_id, start, end):
+        """Остатки и обороты прямо по журналу, без сводных таблиц."""
+        result = {}
+        for tx in Transaction.objects.filter(operation_date__lt=end):
+            for side, sign in (('to_facility_id', 1), ('from_facility_id', -1)):
+                if getattr(tx, side) != facility_id:
+                    continue
+                values = result.setdefault((facility_id, tx.chemical_id), {'opening': 0, 'income': 0, 'outcome': 0})
+                if tx.operation_date < start:
+                    values['opening'] += sign * tx.quantity
+                else:
+                    values['income' if sign > 0 else 'outcome'] += tx.quantity
+        return result
+
+    def test_incremental_rollups_match_full_rebuild(self):
+        transfer = self.seed_ledger()
+        self.edit(transfer, 'transfer', self.barite, 45, '2026-01-31T23:00', self.warehouse, self.well)
+        consume = self.operation('consume', self.soda, 3, '2026-03-15T09:00', from_facility=self.other_well)
+        self.delete(consume)
+
+        incremental = self.rollup_state()
+        rebuild_monthly_rollups()
+        self.assertEqual(incremental, self.rollup_state())
+
+    def test_report_matches_ledger(self):
+        self.seed_ledger()
+        # Период задевает неполные месяцы с обеих сторон и целый февраль
+        start, end = at('2026-01-10T00:00'), at('2026-03-01T00:00')
+        for facility in (self.warehouse, self.well, self.other_well):
+            balances = compute_facility_balances([facility.id], start, end)
+            expected = self.ledger_balances(facility.id, start, end)
+            self.assertEqual(
+                {key: {name: Decimal(value) for name, value in values.items()} for key, values in balances.items()},
+                {key: {name: Decimal(value) for name, value in values.items()} for key, values in expected.items()},
+            )
+
+    def test_report_includes_last_day(self):
+        self.seed_ledger()
+        # Списание 28.02 в 18:00 входит в отчет с end_date=2026-02-28
+        url = f'/api/reports/facility-detail/?facility_id={self.well.id}&start_date=2026-02-01&end_date=2026-02-28'
+        details = self.api.get(url).json()['details']
+        self.assertEqual([Decimal(str(item['outcome'])) for item in details], [Decimal('12')])
+        flows = self.api.get('/api/reports/transfer-flows/?start_date=2026-01-01&end_date=2026-02-03').json()
+        self.assertEqual([Decimal(value) for value in flows['columns']['quantity']], [Decimal('30')])
@@ -0,0 +1,35 @@
+import datetime
+from decimal import Decimal
+
+from django.utils import timezone
+
+from ..services import compute_runway
+from .base import LedgerTestCase
+
+
+class RunwayTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        today = timezone.localtime().replace(hour=9, minute=0, second=0, microsecond=0)
+        self.operation('add', self.barite, 100, (today - datetime.timedelta(days=20)).isoformat(), to_facility=self.well)
+        self.operation('consume', self.barite, 30, (today - datetime.timedelta(days=10)).isoformat(), from_facility=self.well)
+        self.operation('add', self.soda, 10, (today - datetime.timedelta(days=5)).isoformat(), to_facility=self.well)
+
+    def rows(self, window):
+        return {row['chemical_id']: row for row in compute_runway([self.well.id], window)}
+
+    def test_days_left_from_average_consumption(self):
+        barite = self.rows(30)[self.barite.id]
+        self.assertEqual(barite['daily_rate'], Decimal('1.000'))
+        self.assertEqual(barite['days_left'], Decimal('70.0'))
+
+    def test_zero_consumption_has_no_forecast(self):
+        soda = self.rows(30)[self.soda.id]
+        self.assertEqual(soda['daily_rate'], Decimal('0'))
+        self.assertIsNone(soda['days_left'])
+
+    def test_empty_window_has_no_forecast(self):
+        rows = self.rows(0)
+        self.assertEqual({row['days_left'] for row in rows.values()}, {None})
+        self.assertEqual({row['daily_rate'] for row in rows.values()}, {Decimal('0')})
@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from .base import LedgerTestCase
+
+
+class FacilityScopeTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seed_ledger()
+        self.engineer_api = self.client_for(self.engineer)
+
+    def test_other_facility_is_forbidden(self):
+        period = 'start_date=2026-01-01&end_date=2026-03-31'
+        urls = (
+            '/api/autocomplete/chemicals/?facility_id={}',
+            f'/api/reports/facility-detail/?facility_id={{}}&{period}',
+            f'/api/inventory/lookup/?facility_id={{}}&chemical_ids={self.barite.id}',
+            '/api/inventory/in-stock/?facility_id={}',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.engineer_api.get(url.format(self.warehouse.id)).status_code, 403)
+                self.assertEqual(self.engineer_api.get(url.format(self.well.id)).status_code, 200)
+                self.assertEqual(self.api.get(url.format(self.warehouse.id)).status_code, 200)
+
+    def test_autocomplete_does_not_leak_stock(self):
+        response = self.engineer_api.get(f'/api/autocomplete/chemicals/?q=Бар&facility_id={self.warehouse.id}')
+        self.assertEqual(response.status_code, 403)
+        rows = self.engineer_api.get(f'/api/autocomplete/chemicals/?q=Бар&facility_id={self.well.id}').json()
+        self.assertEqual(Decimal(str(rows[0]['quantity'])), Decimal('18'))
+
+    def test_lists_are_scoped(self):
+        transactions = self.engineer_api.get('/api/transactions/').json()
+        transactions = transactions.get('results', transactions) if isinstance(transactions, dict) else transactions
+        self.assertEqual(len(transactions), 2)  # перемещение на скважину и списание с нее
+        inventory = self.engineer_api.get('/api/inventory/').json()
+        inventory = inventory.get('results', inventory) if isinstance(inventory, dict) else inventory
+        self.assertEqual({row['facility']['id'] for row in inventory}, {self.well.id})
+        flows = self.engineer_api.get('/api/reports/transfer-flows/?start_date=2026-01-01&end_date=2026-03-31').json()
+        self.assertEqual(flows['count'], 1)
+
+    def test_sync_is_scoped(self):
+        snapshot = self.engineer_api.get('/api/sync/?since=0&tables=inventory,transactions').json()
+        self.assertEqual({row['facility_id'] for row in snapshot['changes']['inventory']}, {self.well.id})
+        for row in snapshot['changes']['transactions']:
+            self.assertIn(self.well.id, (row['from_facility_id'], row['to_facility_id']))
+
+        # Операции чужих объектов не попадают в дельту и не считаются удаленными
+        version = snapshot['version']
+        self.operation('consume', self.soda, 1, '2026-03-02T09:00', from_facility=self.other_well)
+        delta = self.engineer_api.get(f'/api/sync/?since={version}&tables=inventory,transactions').json()
+        self.assertEqual(delta['changes'], {'inventory': [], 'transactions': []})
+        self.assertEqual(delta['deleted'], {'inventory': [], 'transactions': []})
@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .base import LedgerTestCase
+
+
+class SparseFieldsTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seed_ledger()
+
+    def results(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        return data['results'] if isinstance(data, dict) else data
+
+    def test_fields_projection(self):
+        rows = self.results(self.api.get('/api/inventory/', {'fields': 'id,quantity'}))
+        self.assertTrue(rows)
+        self.assertTrue(all(set(row) == {'id', 'quantity'} for row in rows))
+
+        # Без вложенных объектов связанные таблицы не читаются
+        with CaptureQueriesContext(connection) as queries:
+            self.api.get('/api/inventory/', {'fields': 'id,quantity'})
+        self.assertFalse(any('api_chemical' in query['sql'] for query in queries.captured_queries))
+
+        rows = self.results(self.api.get('/api/inventory/', {'fields': 'id,chemical'}))
+        self.assertTrue(all(set(row['chemical']) >= {'id', 'name'} for row in rows))
+
+    def test_unknown_field_is_rejected(self):
+        response = self.api.get('/api/inventory/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.content.decode())
+
+    def test_columnar_layout(self):
+        response = self.api.get('/api/transactions/', {'layout': 'columnar', 'fields': 'id,chemical,quantity'})
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual(set(data['columns']), {'id', 'chemical', 'quantity'})
+        self.assertTrue(all(len(column) == data['count'] for column in data['columns'].values()))
+        # Реагенты один раз в lookups, в колонке только их id
+        self.assertEqual(set(data['columns']['chemical']), {self.barite.id, self.soda.id})
+        self.assertEqual(
+            {int(pk): row['name'] for pk, row in data['lookups']['chemicals'].items()},
+            {self.barite.id: 'Барит', self.soda.id: 'Сода'},
+        )
+        total = sum(Decimal(str(value)) for value in data['columns']['quantity'])
+        self.assertGreater(total, 0)
+
+    def test_columnar_respects_facility_scope(self):
+        engineer = self.client_for(self.engineer)
+        data = engineer.get('/api/inventory/', {'layout': 'columnar'}).json()
+        self.assertEqual(set(data['columns']['facility']), {self.well.id})
+        self.assertEqual(set(data['lookups']['facilities']), {str(self.well.id)})
@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+from ..models import StockAlert
+from .base import LedgerTestCase
+
+
+class StockAlertTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.operation('add', self.barite, 100, '2026-01-05T09:00', to_facility=self.warehouse)
+
+    def set_threshold(self, facility, chemical, min_quantity):
+        response = self.api.post('/api/stock-thresholds/', {
+            'facility': facility.id, 'chemical': chemical.id, 'min_quantity': str(min_quantity),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def alerts(self, client=None, **params):
+        response = (client or self.api).get('/api/alerts/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        return data['results'] if isinstance(data, dict) else data
+
+    def active_alerts(self):
+        return self.alerts(active=1)
+
+    def test_crossing_fires_once_and_clears(self):
+        self.set_threshold(self.warehouse, self.barite, 50)
+        self.assertEqual(self.active_alerts(), [])
+
+        self.operation('transfer', self.barite, 30, '2026-01-10T09:00', self.warehouse, self.well)
+        self.assertEqual(self.active_alerts(), [])
+        self.operation('transfer', self.barite, 30, '2026-01-11T09:00', self.warehouse, self.well)
+        alerts = self.active_alerts()
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(Decimal(alerts[0]['quantity']), Decimal('40'))
+
+        # Остаток и дальше ниже порога - повторного оповещения нет
+        self.operation('transfer', self.barite, 5, '2026-01-12T09:00', self.warehouse, self.well)
+        self.assertEqual(len(self.active_alerts()), 1)
+
+        # Пополнение до порога закрывает оповещение
+        self.operation('add', self.barite, 15, '2026-01-13T09:00', to_facility=self.warehouse)
+        self.assertEqual(self.active_alerts(), [])
+        self.assertEqual(StockAlert.objects.count(), 1)
+        self.assertIsNotNone(StockAlert.objects.get().resolved_at)
+
+        # Новое падение - новое оповещение
+        self.operation('consume', self.barite, 1, '2026-01-14T09:00', from_facility=self.warehouse)
+        self.assertEqual(len(self.active_alerts()), 1)
+        self.assertEqual(StockAlert.objects.count(), 2)
+
+    def test_threshold_above_current_stock(self):
+        threshold_id = self.set_threshold(self.warehouse, self.barite, 150)
+        self.assertEqual(len(self.active_alerts()), 1)
+
+        # Изменение порога при открытом оповещении не дублирует его
+        response = self.api.patch(f'/api/stock-thresholds/{threshold_id}/', {'min_quantity': '120'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(self.active_alerts()), 1)
+
+        response = self.api.patch(f'/api/stock-thresholds/{threshold_id}/', {'min_quantity': '80'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.active_alerts(), [])
+
+    def test_alerts_are_scoped_and_acknowledged(self):
+        self.set_threshold(self.warehouse, self.barite, 150)
+        alert_id = self.active_alerts()[0]['id']
+
+        engineer = self.client_for(self.engineer)
+        self.assertEqual(self.alerts(engineer), [])
+        response = engineer.post('/api/alerts/acknowledge/', {'ids': [alert_id]}, format='json')
+        self.assertEqual(response.json(), {'acknowledged': 0})
+
+        response = self.api.post('/api/alerts/acknowledge/', {'ids': [alert_id]}, format='json')
+        self.assertEqual(response.json(), {'acknowledged': 1})
+        self.assertEqual(self.alerts(unacknowledged=1), [])
@@ -0,0 +1,71 @@
+import datetime
+from unittest import mock
+
+from django.contrib import admin
+from django.utils import timezone
+
+from ..admin import InventoryAdmin, TransactionAdmin
+from ..models import Inventory, Transaction
+from .base import LedgerTestCase
+
+
+class SyncTests(LedgerTestCase):
+
+    def test_deleted_operation_is_reported(self):
+        consume = self.operation('consume', self.barite, 1, '2026-01-05T09:00', from_facility=self.well)
+        snapshot = self.api.get('/api/sync/?since=0&tables=transactions').json()
+        self.assertTrue(snapshot['reset'])
+        ids = [row['id'] for row in snapshot['changes']['transactions']]
+
+        self.delete(consume)
+        delta = self.api.get(f"/api/sync/?since={snapshot['version']}&tables=transactions").json()
+        self.assertFalse(delta['reset'])
+        self.assertEqual(delta['deleted']['transactions'], ids)
+
+    def test_foreign_tombstones_are_not_sent_to_engineer(self):
+        other = self.operation('consume', self.soda, 1, '2026-01-05T09:00', from_facility=self.other_well)
+        engineer_api = self.client_for(self.engineer)
+        version = engineer_api.get('/api/sync/?since=0&tables=transactions').json()['version']
+        admin_version = self.api.get('/api/sync/?since=0&tables=transactions').json()['version']
+
+        self.delete(other)
+        delta = engineer_api.get(f'/api/sync/?since={version}&tables=transactions').json()
+        self.assertEqual(delta['deleted']['transactions'], [])
+        delta = self.api.get(f'/api/sync/?since={admin_version}&tables=transactions').json()
+        self.assertEqual(len(delta['deleted']['transactions']), 1)
+
+    def test_admin_edits_are_recorded(self):
+        consume = self.operation('consume', self.barite, 1, '2026-01-05T09:00', from_facility=self.well)
+        version = self.api.get('/api/sync/?since=0&tables=transactions,inventory').json()['version']
+        transaction_admin = TransactionAdmin(Transaction, admin.site)
+        inventory_admin = InventoryAdmin(Inventory, admin.site)
+
+        tx = Transaction.objects.get(operation_uuid=consume)
+        tx.comment = 'Исправлено'
+        transaction_admin.save_model(None, tx, None, change=True)
+        item = Inventory.objects.get(facility=self.well, chemical=self.barite)
+        item.quantity = 5
+        inventory_admin.save_model(None, item, None, change=True)
+        delta = self.api.get(f'/api/sync/?since={version}&tables=transactions,inventory').json()
+        self.assertEqual([row['comment'] for row in delta['changes']['transactions']], ['Исправлено'])
+        self.assertEqual([row['id'] for row in delta['changes']['inventory']], [item.id])
+
+        transaction_admin.delete_queryset(None, Transaction.objects.filter(pk=tx.pk))
+        delta = self.api.get(f"/api/sync/?since={delta['version']}&tables=transactions").json()
+        self.assertEqual(delta['deleted']['transactions'], [tx.pk])
+
+    def test_open_write_transaction_holds_cursor(self):
+        snapshot = self.api.get('/api/sync/?since=0&tables=transactions').json()
+        self.operation('consume', self.barite, 1, '2026-01-05T09:00', from_facility=self.well)
+        url = f"/api/sync/?since={snapshot['version']}&tables=transactions"
+        later = timezone.now() + datetime.timedelta(seconds=10)
+        started = timezone.now() - datetime.timedelta(minutes=10)
+        with mock.patch('api.services.timezone.now', return_value=later):
+            # Пока открыта давняя пишущая транзакция, курсор не уходит дальше записей, сделанных после ее начала
+            with mock.patch('api.services._oldest_open_write_start', return_value=started):
+                held = self.api.get(url).json()
+            settled = self.api.get(url).json()
+        self.assertEqual(len(held['changes']['transactions']), 1)
+        again = self.api.get(f"/api/sync/?since={held['version']}&tables=transactions").json()
+        self.assertEqual(len(again['changes']['transactions']), 1)
+        self.assertGreater(settled['version'], held['version'])
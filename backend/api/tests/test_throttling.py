@@ -0,0 +1,17 @@
+from django.core.cache import caches
+
+from ..db_routers import is_pinned, pin_to_primary
+from ..throttling import record_rejection, rejection_counts
+from .base import LedgerTestCase
+
+
+class ThrottleStateTests(LedgerTestCase):
+
+    def test_counters_and_pins_survive_throttle_cache_cull(self):
+        record_rejection('throttle', 'reports')
+        record_rejection('throttle', 'reports')
+        pin_to_primary(self.admin.id)
+        # Окна лимитов вытесняются при переполнении; здесь - целиком
+        caches['throttle'].clear()
+        self.assertEqual(rejection_counts()['throttle']['reports'], 2)
+        self.assertTrue(is_pinned(self.admin.id))
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from ..authentication import revoke_user_tokens, user_state_cache
+from ..models import Chemical
+from ..reference import reference_cache
+from ..warmup import warm_up
+from .base import LedgerTestCase
+
+
+class WarmupTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user_state_cache.clear()
+        reference_cache.clear()
+        self.addCleanup(user_state_cache.clear)
+        self.addCleanup(reference_cache.clear)
+        # Закрытие соединений мастера оборвало бы транзакцию теста
+        patcher = mock.patch('api.warmup.connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_warm_up_fills_caches(self):
+        timings = warm_up()
+        self.assertEqual(set(timings), {'urlconf', 'reference_cache', 'user_state_cache', 'inventory_index'})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(user_state_cache.get_state(self.engineer.id)['token_version'], self.engineer.token_version)
+            self.assertEqual(reference_cache.chemicals([self.barite.id])[self.barite.id].name, 'Барит')
+            self.assertIn(self.well.id, reference_cache.facilities())
+
+    def test_failed_step_does_not_stop_warm_up(self):
+        with mock.patch.object(reference_cache, 'warm', side_effect=RuntimeError('БД недоступна')), \
+                self.assertLogs('api.warmup', level='ERROR'):
+            timings = warm_up()
+        self.assertIn('user_state_cache', timings)
+        self.assertIsNotNone(user_state_cache.cached_state(self.admin.id))
+
+    def test_inactive_users_are_not_warmed(self):
+        self.engineer.is_active = False
+        self.engineer.save()
+        user_state_cache.warm()
+        self.assertIsNone(user_state_cache.cached_state(self.engineer.id))
+        self.assertIsNotNone(user_state_cache.cached_state(self.admin.id))
+
+    def test_revoke_invalidates_warm_state(self):
+        user_state_cache.warm()
+        revoke_user_tokens(self.engineer)
+        self.assertIsNone(user_state_cache.cached_state(self.engineer.id))
+        self.engineer.refresh_from_db()
+        self.assertEqual(user_state_cache.get_state(self.engineer.id)['token_version'], self.engineer.token_version)
+
+
+class ReferenceCacheTests(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        reference_cache.clear()
+        self.addCleanup(reference_cache.clear)
+        reference_cache.warm()
+
+    def test_save_invalidates_cache(self):
+        response = self.api.patch(f'/api/chemicals/{self.barite.id}/', {'name': 'Барит утяжелитель'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(reference_cache.chemicals()[self.barite.id].name, 'Барит утяжелитель')
+
+        self.soda.delete()
+        self.assertNotIn(self.soda.id, reference_cache.chemicals())
+
+    def test_missing_ids_reload_table(self):
+        # Реагент из другого воркера: сигнал сюда не дошел
+        with mock.patch.object(reference_cache, 'invalidate'):
+            chemical = Chemical.objects.create(name='Бентонит', unit_of_measurement='кг')
+        with self.assertNumQueries(0):
+            self.assertNotIn(chemical.id, reference_cache.chemicals())
+        with self.assertNumQueries(1):
+            self.assertIn(chemical.id, reference_cache.chemicals([chemical.id]))
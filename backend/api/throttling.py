@@ -0,0 +1,162 @@
+# backend/api/throttling.py
+# Защита воркеров от тяжелых запросов.
+#
+# 1. Лимиты частоты по пользователю и классу эндпоинта (DEFAULT_THROTTLE_RATES):
+#    reports - отчеты, bulk_writes - крупные пакеты операций, reads - обычные
+#    чтения. Обычные операции со скважин (небольшие POST) не ограничиваются.
+# 2. Ограничение одновременных тяжелых запросов (HEAVY_CONCURRENCY): если все
+#    слоты класса заняты, запрос сразу получает 429 с Retry-After, а не ждет
+#    в очереди, занимая воркер. Слоты - файлы с flock, поэтому лимит общий
+#    для всех воркеров gunicorn на хосте; без fcntl (Windows) - в пределах процесса.
+#
+# Окна лимитов хранятся в кэше 'throttle', счетчики отказов - в 'host_state'
+# (файловые кэши, общие для воркеров одного хоста; см. settings.CACHES),
+# отказы видны в /api/monitoring/throttling/.
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import ScopedRateThrottle, SimpleRateThrottle
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_CACHE = 'throttle'
+COUNTERS_CACHE = 'host_state'
+READS_SCOPE = 'reads'
+REJECTION_KINDS = ('throttle', 'concurrency')
+
+
+def _cache():
+    return caches[THROTTLE_CACHE]
+
+
+def _rejection_key(kind, scope):
+    return f'rejections:{kind}:{scope}'
+
+
+def record_rejection(kind, scope):
+    cache = caches[COUNTERS_CACHE]
+    key = _rejection_key(kind, scope)
+    # Между воркерами счетчик приблизительный: файловый кэш не атомарен
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+    logger.warning("Запрос отклонен (%s, %s)", kind, scope)
+
+
+def rejection_counts():
+    scopes = set(settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {})) | set(heavy_limits())
+    keys = {_rejection_key(kind, scope): (kind, scope) for kind in REJECTION_KINDS for scope in scopes}
+    values = caches[COUNTERS_CACHE].get_many(keys)
+    counts = {kind: {} for kind in REJECTION_KINDS}
+    for key, (kind, scope) in keys.items():
+        counts[kind][scope] = values.get(key, 0)
+    return counts
+
+
+class EndpointClassThrottle(ScopedRateThrottle):
+    """
+    Лимит запросов пользователя на класс эндпоинта. Класс берется из
+    view.get_throttle_scope(request) или view.throttle_scope; безопасные
+    запросы без класса считаются обычными чтениями (reads).
+    """
+
+    @property
+    def cache(self):
+        return _cache()
+
+    def allow_request(self, request, view):
+        get_scope = getattr(view, 'get_throttle_scope', None)
+        scope = get_scope(request) if get_scope else getattr(view, self.scope_attr, None)
+        if not scope and request.method in SAFE_METHODS:
+            scope = READS_SCOPE
+        if not scope:
+            return True
+        self.scope = scope
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        allowed = SimpleRateThrottle.allow_request(self, request, view)
+        if not allowed:
+            record_rejection('throttle', scope)
+        return allowed
+
+
+# --- Ограничение одновременных тяжелых запросов ---
+
+def heavy_limits():
+    return getattr(settings, 'HEAVY_CONCURRENCY', {})
+
+
+def retry_after():
+    return getattr(settings, 'HEAVY_RETRY_AFTER', 5)
+
+
+class _FileSlots:
+    """N слотов-файлов на класс; flock снимается сам, если воркер упал."""
+
+    def __init__(self, scope, limit, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.paths = [os.path.join(directory, f'{scope}.{index}.lock') for index in range(limit)]
+
+    def acquire(self):
+        for path in self.paths:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def release(self, fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class _ProcessSlots:
+    def __init__(self, scope, limit, directory):
+        self.semaphore = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        return self.semaphore if self.semaphore.acquire(blocking=False) else None
+
+    def release(self, slot):
+        slot.release()
+
+
+_slots = {}
+_slots_lock = threading.Lock()
+
+
+def _slots_for(scope):
+    with _slots_lock:
+        if scope not in _slots:
+            directory = getattr(settings, 'HEAVY_SLOTS_DIR')
+            slots_class = _FileSlots if fcntl is not None else _ProcessSlots
+            _slots[scope] = slots_class(scope, heavy_limits()[scope], directory)
+        return _slots[scope]
+
+
+def acquire_slot(scope):
+    """Занимает слот класса; None (и учтенный отказ), если все слоты заняты."""
+    slots = _slots_for(scope)
+    slot = slots.acquire()
+    if slot is None:
+        record_rejection('concurrency', scope)
+        return None
+    return slots, slot
+
+
+def release_slot(handle):
+    slots, slot = handle
+    slots.release(slot)
@@ -1,9 +1,16 @@
 # backend/api/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     FacilityViewSet, ChemicalViewSet, InventoryViewSet,
-    TransactionViewSet, UserViewSet, BulkOperationAPIView, EditOperationAPIView, DeleteOperationAPIView, FacilityDetailReportAPIView
+    TransactionViewSet, UserViewSet, BulkOperationAPIView, EditOperationAPIView, DeleteOperationAPIView, FacilityDetailReportAPIView,
+    ChemicalAutocompleteAPIView, FacilityAutocompleteAPIView, FacilityBatchReportAPIView,
+    ArchivedTransactionViewSet, PeriodCloseAPIView, RunwayReportAPIView,
+    StockThresholdViewSet, StockAlertViewSet, StockAlertAcknowledgeAPIView, SyncAPIView,
+    BatchOperationAPIView, WellClosureCalculateAPIView, WellClosureCalculateActualsAPIView,
+    ProjectViewSet, ProjectAnalyticsReportAPIView, RequestProfileViewSet, ThrottlingStatsAPIView,
+    ReportJobViewSet, TransferFlowReportAPIView
 )
 
 # Создаем роутер
@@ -16,17 +23,45 @@ router.register(r'chemicals', ChemicalViewSet, basename='chemical')
 router.register(r'inventory', InventoryViewSet, basename='inventory')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
 router.register(r'users', UserViewSet, basename='user')
+router.register(r'stock-thresholds', StockThresholdViewSet, basename='stock-threshold')
+router.register(r'alerts', StockAlertViewSet, basename='stock-alert')
+router.register(r'projects', ProjectViewSet, basename='project')
+router.register(r'profiles', RequestProfileViewSet, basename='request-profile')
+router.register(r'report-jobs', ReportJobViewSet, basename='report-job')
+router.register(r'archive/transactions', ArchivedTransactionViewSet, basename='archived-transaction')
 
 # Основные URL нашего приложения
 urlpatterns = [
+    # Должен стоять раньше роутера, иначе acknowledge примется за pk оповещения
+    path('alerts/acknowledge/', StockAlertAcknowledgeAPIView.as_view(), name='stock-alert-acknowledge'),
     path('', include(router.urls)),
 
     # path('transactions/create/', TransactionCreateAPIView.as_view(), name='transaction-create'),
 
     # path('transactions/create/bulk/', BulkTransactionCreateAPIView.as_view(), name='bulk-transaction-create'),
     path('operations/create/bulk/', BulkOperationAPIView.as_view(), name='bulk-operation-create'),
+    path('operations/batch/', BatchOperationAPIView.as_view(), name='batch-operation-create'),
     path('operations/delete/', DeleteOperationAPIView.as_view(), name='delete-operation'),
     path('operations/edit/', EditOperationAPIView.as_view(), name='edit-operation'),
     path('reports/facility-detail/', FacilityDetailReportAPIView.as_view(), name='facility-detail-report'),
+    path('reports/facility-batch/', FacilityBatchReportAPIView.as_view(), name='facility-batch-report'),
+    path('sync/', SyncAPIView.as_view(), name='sync'),
+    path('well-closures/calculate/', WellClosureCalculateAPIView.as_view(), name='well-closure-calculate'),
+    path('well-closures/calculate-actuals/', WellClosureCalculateActualsAPIView.as_view(), name='well-closure-calculate-actuals'),
+    path('reports/project-analytics/', ProjectAnalyticsReportAPIView.as_view(), name='project-analytics-report'),
+    path('reports/transfer-flows/', TransferFlowReportAPIView.as_view(), name='transfer-flow-report'),
+    path('reports/runway/', RunwayReportAPIView.as_view(), name='runway-report'),
+    path('monitoring/throttling/', ThrottlingStatsAPIView.as_view(), name='throttling-stats'),
+    path('periods/close/', PeriodCloseAPIView.as_view(), name='period-close'),
+    path('autocomplete/chemicals/', ChemicalAutocompleteAPIView.as_view(), name='chemical-autocomplete'),
+    path('autocomplete/facilities/', FacilityAutocompleteAPIView.as_view(), name='facility-autocomplete'),
+
+    # Асинхронные варианты read-only эндпоинтов (для ASGI-сервера)
+    path('async/reports/facility-detail/', async_views.facility_detail_report, name='async-facility-detail-report'),
+    path('async/transactions/', async_views.transaction_list, name='async-transaction-list'),
+    path('async/inventory/', async_views.inventory_list, name='async-inventory-list'),
+    path('async/facilities/', async_views.facility_list, name='async-facility-list'),
+    path('async/chemicals/', async_views.chemical_list, name='async-chemical-list'),
+    path('events/', async_views.event_stream, name='event-stream'),
     # Новый URL для создания транзакций
 ]
\ No newline at end of file
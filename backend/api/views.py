@@ -1,20 +1,75 @@
 # backend/api/views.py
+import contextlib
+import json
+
 from django.db import transaction as db_transaction
-from rest_framework import generics, permissions, status, viewsets
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework import generics, mixins, permissions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from .filters import TransactionFilter
-from .models import Chemical, Facility, Inventory, Transaction, User
-from .permissions import IsAdminOrLogisticianForWrite, IsAdminUser
-from .serializers import (ChemicalSerializer, FacilitySerializer,
-                          InventorySerializer, TransactionSerializer, UserSerializer)
-from .services import recalculate_inventory_for_items
-from .helpers import validate_and_create_operation
-from django.db.models import Sum, Q, F, Value, CharField
+from .authentication import revoke_user_tokens, user_state_cache
+from .filters import ArchivedTransactionFilter, TransactionFilter
+from .models import (ArchivedTransaction, Chemical, ClosedPeriod, Facility,
+                     Inventory, OperationSubmission, Project, ProjectBudgetLine,
+                     ReportJob, RequestProfile, StockAlert, StockThreshold, Transaction,
+                     User)
+from .permissions import (IsAdminOrLogisticianForWrite, IsAdminUser,
+                          check_facility_access, facility_scope_q,
+                          restrict_facility_ids, visible_facility_ids)
+from .serializers import (ArchivedTransactionSerializer, ChemicalSerializer,
+                          ClosedPeriodSerializer, FacilitySerializer,
+                          InventorySerializer, ProjectSerializer,
+                          ReportJobSerializer, RequestProfileListSerializer,
+                          RequestProfileSerializer,
+                          StockAlertSerializer,
+                          StockThresholdSerializer, TransactionSerializer,
+                          UserSerializer)
+from .services import (RUNWAY_DEFAULT_WINDOW, apply_rollup_changes,
+                       SYNC_TABLES, build_facility_batch_report, build_facility_report,
+                       check_threshold, close_period, collect_changes,
+                       compute_facility_balances, compute_project_analytics, compute_runway,
+                       compute_transfer_flows,
+                       current_closed_before, lock_closed_period, locked_closed_before,
+                       record_transaction_changes, recalculate_inventory_for_items)
+from .costing import consumed_quantities, update_cost_layers, well_cost_summary
+from .db_routers import replica_reads
+from .events import publish_operation_event
+from .inventory_index import facility_stock, stock_quantities, stock_totals
+from .reference import reference_cache
+from .report_jobs import submit_job
+from .throttling import heavy_limits, rejection_counts
+from .mixins import (ConcurrencyLimitMixin, FacilityScopeMixin, ReplicaReadMixin,
+                     SparseFieldsMixin)
+from .helpers import (build_operation_transactions, parse_id_list,
+                      parse_int_param, parse_operation_date, parse_report_period,
+                      validate_and_create_operation)
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.db.models import (BooleanField, Case, CharField, F, OuterRef, Prefetch,
+                              Q, Subquery, Sum, Value, When)
 from django.db.models.functions import Coalesce
 from decimal import Decimal
 
+# Сколько объектов считается за один проход в потоковом пакетном отчете
+BATCH_REPORT_STREAM_CHUNK = 50
+
+# Сколько операций можно прислать в одном пакете
+OPERATION_BATCH_MAX_SIZE = 500
+
+# Операция с большим числом позиций считается крупной записью (bulk_writes)
+OPERATION_HEAVY_ITEMS = 50
+
+# Сколько проектов можно запросить в одном аналитическом отчете
+PROJECT_ANALYTICS_MAX_PROJECTS = 20
+
+# Жесткий предел числа подсказок в автодополнении
+AUTOCOMPLETE_DEFAULT_LIMIT = 20
+AUTOCOMPLETE_MAX_LIMIT = 50
+
 
 # Важно! Пока мы не настроили права доступа,
 # разрешим доступ всем аутентифицированным пользователям.
@@ -23,10 +78,13 @@ class IsAuthenticated(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated
 
-class FacilityViewSet(viewsets.ModelViewSet):
+class FacilityViewSet(ReplicaReadMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Facility.objects.all()
     serializer_class = FacilitySerializer
     permission_classes = [IsAdminOrLogisticianForWrite]
+    sparse_fields = {name: [name] for name in FacilitySerializer.Meta.fields}
+    columnar_columns = {name: (name, None) for name in FacilitySerializer.Meta.fields}
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         # Проверяем, есть ли на объекте остатки с ненулевым количеством
@@ -38,32 +96,231 @@ class FacilityViewSet(viewsets.ModelViewSet):
         # Если остатков нет, вызываем стандартный метод удаления
         return super().destroy(request, *args, **kwargs)
 
-class ChemicalViewSet(viewsets.ModelViewSet):
+class ChemicalViewSet(ReplicaReadMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Chemical.objects.all()
     serializer_class = ChemicalSerializer
     permission_classes = [IsAdminOrLogisticianForWrite]
+    sparse_fields = {name: [name] for name in ChemicalSerializer.Meta.fields}
+    columnar_columns = {name: (name, None) for name in ChemicalSerializer.Meta.fields}
 
-class InventoryViewSet(viewsets.ReadOnlyModelViewSet):
+class InventoryViewSet(ReplicaReadMixin, FacilityScopeMixin, SparseFieldsMixin, viewsets.ReadOnlyModelViewSet):
     """
     Только для чтения. Остатки изменяются через транзакции.
+    Поддерживает ?fields= и ?layout=columnar (см. SparseFieldsMixin).
+    Инженер видит только остатки своего объекта.
     """
-    queryset = Inventory.objects.all().order_by('facility__name')
+    queryset = Inventory.objects.select_related('facility', 'chemical').order_by('facility__name')
     serializer_class = InventorySerializer
     permission_classes = [permissions.IsAuthenticated]
     # Добавим возможность фильтрации по объекту
     filterset_fields = ['facility']
+    facility_scope_fields = ('facility',)
+    sparse_fields = {
+        'id': ['id'],
+        'facility': ['facility__' + name for name in FacilitySerializer.Meta.fields],
+        'chemical': ['chemical__' + name for name in ChemicalSerializer.Meta.fields],
+        'quantity': ['quantity'],
+    }
+    columnar_columns = {
+        'id': ('id', None),
+        'facility': ('facility_id', 'facilities'),
+        'chemical': ('chemical_id', 'chemicals'),
+        'quantity': ('quantity', None),
+    }
+
+    # Быстрые запросы для форм операций и дашбордов: из индекса остатков
+    # в памяти воркера (INVENTORY_INDEX_ENABLED, api/inventory_index.py), иначе из БД.
+    # Пользователь сразу после своей записи (без чтения с реплики) читает БД.
+
+    @action(detail=False, methods=['get'], url_path='lookup')
+    def lookup(self, request, *args, **kwargs):
+        """?facility_id=1&chemical_ids=2,3 -> {"facility_id": 1, "quantities": {"2": 10.5, "3": 0}}."""
+        facility_id = parse_int_param(request.query_params, 'facility_id')
+        chemical_ids = parse_id_list(request.query_params, 'chemical_ids')
+        if not chemical_ids:
+            raise ValidationError("Необходимо указать chemical_ids.")
+        check_facility_access(request.user, facility_id)
+        quantities = stock_quantities(facility_id, chemical_ids, use_index=self.replica_reads)
+        return Response({'facility_id': facility_id, 'quantities': quantities}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'], url_path='in-stock')
+    def in_stock(self, request, *args, **kwargs):
+        """?facility_id=1 - реагенты с положительным остатком на объекте."""
+        facility_id = parse_int_param(request.query_params, 'facility_id')
+        check_facility_access(request.user, facility_id)
+        rows = facility_stock(facility_id, use_index=self.replica_reads)
+        chemicals = reference_cache.chemicals({chemical_id for chemical_id, _ in rows})
+        results = [
+            {
+                'chemical_id': chemical_id, 'chemical_name': chemicals[chemical_id].name,
+                'unit': chemicals[chemical_id].unit_of_measurement, 'quantity': quantity,
+            }
+            for chemical_id, quantity in rows
+        ]
+        results.sort(key=lambda item: item['chemical_name'])
+        return Response({'facility_id': facility_id, 'results': results}, status=status.HTTP_200_OK)
 
-class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=False, methods=['get'], url_path='summary')
+    def summary(self, request, *args, **kwargs):
+        """
+        Итог по реагентам: сумма остатков и на скольких объектах реагент есть.
+        Необязательно ?facility_ids=1,2 или ?facility_type=well.
+        """
+        facility_ids = parse_id_list(request.query_params, 'facility_ids') or None
+        facility_type = request.query_params.get('facility_type')
+        if facility_type:
+            facilities = reference_cache.facilities().values()
+            facility_ids = [
+                facility.id for facility in facilities
+                if facility.type == facility_type and (facility_ids is None or facility.id in facility_ids)
+            ]
+        facility_ids = restrict_facility_ids(request.user, facility_ids)
+        totals = stock_totals(facility_ids, use_index=self.replica_reads)
+        chemicals = reference_cache.chemicals(set(totals))
+        results = [
+            {
+                'chemical_id': chemical_id, 'chemical_name': chemicals[chemical_id].name,
+                'unit': chemicals[chemical_id].unit_of_measurement,
+                'total': total, 'facilities_in_stock': stocked,
+            }
+            for chemical_id, (total, stocked) in totals.items()
+        ]
+        results.sort(key=lambda item: item['chemical_name'])
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class TransactionViewSet(ReplicaReadMixin, FacilityScopeMixin, SparseFieldsMixin, viewsets.ReadOnlyModelViewSet):
     """
     Только для чтения. Новые транзакции будут создаваться через отдельный эндпоинт.
+    Поддерживает ?fields= и ?layout=columnar (см. SparseFieldsMixin).
+    Инженер видит только операции своего объекта (откуда или куда).
     """
     filterset_class = TransactionFilter
-    queryset = Transaction.objects.all().order_by('-timestamp')
+    queryset = Transaction.objects.select_related(
+        'chemical', 'from_facility', 'to_facility', 'performed_by'
+    ).order_by('-timestamp')
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
     # Добавим фильтры для удобства
     filterset_fields = ['transaction_type', 'chemical', 'from_facility', 'to_facility', 'performed_by']
+    facility_scope_fields = ('from_facility', 'to_facility')
+    sparse_fields = {
+        **{name: [name] for name in TransactionSerializer.Meta.fields},
+        'chemical': ['chemical__' + name for name in ChemicalSerializer.Meta.fields],
+        'from_facility': ['from_facility__name'],
+        'to_facility': ['to_facility__name'],
+        'performed_by': ['performed_by__username'],
+    }
+    columnar_columns = {
+        **{name: (name, None) for name in TransactionSerializer.Meta.fields},
+        'chemical': ('chemical_id', 'chemicals'),
+        'from_facility': ('from_facility_id', 'facilities'),
+        'to_facility': ('to_facility_id', 'facilities'),
+        'performed_by': ('performed_by__username', None),
+    }
+
+class ArchivedTransactionViewSet(TransactionViewSet):
+    """Журнал закрытых периодов: те же фильтры и форматы, что у /transactions/."""
+    filterset_class = ArchivedTransactionFilter
+    queryset = ArchivedTransaction.objects.select_related(
+        'chemical', 'from_facility', 'to_facility', 'performed_by'
+    ).order_by('-timestamp')
+    serializer_class = ArchivedTransactionSerializer
+
+class StockThresholdViewSet(FacilityScopeMixin, viewsets.ModelViewSet):
+    """Минимальные остатки по парам (объект, реагент). ?facility= и ?chemical= для фильтра."""
+    queryset = StockThreshold.objects.order_by('facility_id', 'chemical_id')
+    serializer_class = StockThresholdSerializer
+    permission_classes = [IsAdminOrLogisticianForWrite]
+    filterset_fields = ['facility', 'chemical']
+    facility_scope_fields = ('facility',)
+
+    def perform_create(self, serializer):
+        check_threshold(serializer.save())
+
+    def perform_update(self, serializer):
+        check_threshold(serializer.save())
+
+
+class StockAlertViewSet(FacilityScopeMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Оповещения о падении остатка ниже порога.
+    ?facility=, ?chemical=, ?unacknowledged=1 - только непросмотренные,
+    ?active=1 - только те, где остаток еще не восстановился.
+    """
+    queryset = StockAlert.objects.select_related('facility', 'chemical', 'acknowledged_by')
+    serializer_class = StockAlertSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['facility', 'chemical']
+    facility_scope_fields = ('facility',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if params.get('unacknowledged') in ('1', 'true'):
+            queryset = queryset.filter(acknowledged_at__isnull=True)
+        if params.get('active') in ('1', 'true'):
+            queryset = queryset.filter(resolved_at__isnull=True)
+        return queryset
+
+
+class StockAlertAcknowledgeAPIView(generics.GenericAPIView):
+    """POST {"ids": [1, 2]} - отметить оповещения просмотренными."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+            raise ValidationError('Поле "ids" должно быть непустым списком id.')
+        alerts = StockAlert.objects.filter(pk__in=ids, acknowledged_at__isnull=True)
+        condition = facility_scope_q(request.user, ('facility',))
+        if condition is not None:
+            alerts = alerts.filter(condition)
+        updated = alerts.update(
+            acknowledged_at=timezone.now(), acknowledged_by_id=request.user.id,
+        )
+        return Response({'acknowledged': updated}, status=status.HTTP_200_OK)
+
+class ProjectViewSet(viewsets.ModelViewSet):
+    """
+    Проекты - группы объектов с планом расхода. ?facility= и ?status= для фильтра.
+    Инженер видит только проекты, в которые входит его объект.
+    """
+    serializer_class = ProjectSerializer
+    permission_classes = [IsAdminOrLogisticianForWrite]
+
+    def get_queryset(self):
+        queryset = Project.objects.prefetch_related(
+            'facilities', Prefetch('budget_lines', queryset=ProjectBudgetLine.objects.select_related('chemical')),
+        ).order_by('-start_date', 'name')
+        facility_id = parse_int_param(self.request.query_params, 'facility', required=False)
+        if facility_id is not None:
+            queryset = queryset.filter(facilities=facility_id)
+        visible = visible_facility_ids(self.request.user)
+        if visible is not None:
+            queryset = queryset.filter(pk__in=Project.objects.filter(facilities__in=visible).values('pk'))
+        status_value = self.request.query_params.get('status')
+        if status_value:
+            queryset = queryset.filter(status=status_value)
+        return queryset
+
+
+class RequestProfileViewSet(mixins.DestroyModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Профили запросов, снятые по X-Profile: 1 (см. api/profiling.py).
+    Список - без тела профиля, /profiles/<id>/ - дерево вызовов, топ функций и SQL с EXPLAIN.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        queryset = RequestProfile.objects.select_related('user').order_by('-id')
+        if self.action == 'list':
+            queryset = queryset.defer('data')
+        return queryset
+
+    def get_serializer_class(self):
+        return RequestProfileListSerializer if self.action == 'list' else RequestProfileSerializer
+
 
 class UserViewSet(viewsets.ModelViewSet):
     """
@@ -73,78 +330,358 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
 
+    def perform_update(self, serializer):
+        old = serializer.instance
+        old_role, old_facility_id = old.role, old.related_facility_id
+        user = serializer.save()
+        # Роль и объект зашиты в JWT - при их смене отзываем выданные токены
+        if user.role != old_role or user.related_facility_id != old_facility_id:
+            revoke_user_tokens(user)
+
+    def perform_destroy(self, instance):
+        user_id = instance.pk
+        super().perform_destroy(instance)
+        user_state_cache.invalidate(user_id)
+
+
+def _autocomplete_limit(request):
+    try:
+        limit = int(request.query_params.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        raise ValidationError("Параметр limit должен быть целым числом.")
+    return max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+
+
+def _autocomplete_filter(queryset, term):
+    """
+    Регистронезависимый поиск по подстроке в name. Совпадения по префиксу
+    помечаются флагом is_prefix, чтобы показывать их первыми.
+    """
+    if not term:
+        return queryset.annotate(is_prefix=Value(True, output_field=BooleanField()))
+    return queryset.filter(name__icontains=term).annotate(
+        is_prefix=Case(
+            When(name__istartswith=term, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        )
+    )
+
 
-class FacilityDetailReportAPIView(generics.GenericAPIView):
+class ChemicalAutocompleteAPIView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Легкий поиск реагентов для выпадающих списков форм операций.
+    ?q=<текст>&facility_id=<id>&limit=<n>
+    Если передан facility_id, реагенты с положительным остатком
+    на этом объекте идут первыми (поле in_stock). Инженер - только
+    по своему объекту.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        facility_id = request.query_params.get('facility_id')
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-
-        if not all([facility_id, start_date, end_date]):
-            raise ValidationError("Необходимо указать facility_id, start_date и end_date.")
-
-        # Получаем все реагенты, которые когда-либо были на этом объекте
-        chemicals_on_facility = Chemical.objects.filter(
-            Q(inventory__facility_id=facility_id) |
-            Q(transaction__from_facility_id=facility_id) |
-            Q(transaction__to_facility_id=facility_id)
-        ).distinct()
-
-        report_by_chemical = []
-        for chemical in chemicals_on_facility:
-            # Расчет начального остатка для этого реагента
-            opening_income = Transaction.objects.filter(to_facility_id=facility_id, chemical=chemical, operation_date__lt=start_date).aggregate(total=Sum('quantity'))['total'] or Decimal(0)
-            opening_outcome = Transaction.objects.filter(from_facility_id=facility_id, chemical=chemical, operation_date__lt=start_date).aggregate(total=Sum('quantity'))['total'] or Decimal(0)
-            opening_balance = opening_income - opening_outcome
-
-            # Расчет прихода/расхода за период для этого реагента
-            period_income = Transaction.objects.filter(to_facility_id=facility_id, chemical=chemical, operation_date__range=[start_date, end_date]).aggregate(total=Sum('quantity'))['total'] or Decimal(0)
-            period_outcome = Transaction.objects.filter(from_facility_id=facility_id, chemical=chemical, operation_date__range=[start_date, end_date]).aggregate(total=Sum('quantity'))['total'] or Decimal(0)
-            
-            closing_balance = opening_balance + period_income - period_outcome
-
-            # Добавляем в отчет, только если были движения или есть остаток
-            if opening_balance != 0 or period_income != 0 or period_outcome != 0:
-                report_by_chemical.append({
-                    'chemical_id': chemical.id,
-                    'chemical_name': chemical.name,
-                    'unit': chemical.unit_of_measurement,
-                    'opening_balance': opening_balance,
-                    'income': period_income,
-                    'outcome': period_outcome,
-                    'closing_balance': closing_balance,
-                })
-        
-        # Считаем итоговые суммы
-        total_opening = sum(item['opening_balance'] for item in report_by_chemical)
-        total_income = sum(item['income'] for item in report_by_chemical)
-        total_outcome = sum(item['outcome'] for item in report_by_chemical)
-        total_closing = sum(item['closing_balance'] for item in report_by_chemical)
-        
-        full_report = {
-            'summary': {
-                'opening_balance': total_opening,
-                'income': total_income,
-                'outcome': total_outcome,
-                'closing_balance': total_closing,
-            },
-            'details': report_by_chemical
-        }
-        
+        term = request.query_params.get('q', '').strip()
+        facility_id = parse_int_param(request.query_params, 'facility_id', required=False)
+        if facility_id is not None:
+            check_facility_access(request.user, facility_id)
+        limit = _autocomplete_limit(request)
+
+        queryset = _autocomplete_filter(Chemical.objects.all(), term)
+        fields = ['id', 'name', 'unit_of_measurement']
+        ordering = ['-is_prefix', 'name']
+
+        if facility_id is not None:
+            stock = Inventory.objects.filter(facility_id=facility_id, chemical=OuterRef('pk'))
+            queryset = queryset.annotate(
+                quantity=Subquery(stock.values('quantity')[:1]),
+            ).annotate(
+                in_stock=Case(
+                    When(quantity__gt=0, then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField(),
+                )
+            )
+            fields += ['quantity', 'in_stock']
+            ordering = ['-in_stock'] + ordering
+
+        results = list(queryset.order_by(*ordering).values(*fields)[:limit])
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class FacilityAutocompleteAPIView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Легкий поиск объектов. ?q=<текст>&type=<well|warehouse|other>&limit=<n>
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        term = request.query_params.get('q', '').strip()
+        facility_type = request.query_params.get('type')
+        limit = _autocomplete_limit(request)
+
+        queryset = _autocomplete_filter(Facility.objects.all(), term)
+        if facility_type:
+            queryset = queryset.filter(type=facility_type)
+
+        results = list(queryset.order_by('-is_prefix', 'name').values('id', 'name', 'type')[:limit])
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class FacilityDetailReportAPIView(ConcurrencyLimitMixin, ReplicaReadMixin, generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = concurrency_scope = 'reports'
+
+    def get(self, request, *args, **kwargs):
+        facility_id = parse_int_param(request.query_params, 'facility_id')
+        start, end = parse_report_period(request.query_params)
+        check_facility_access(request.user, facility_id)
+
+        # Полные месяцы читаются из MonthlyRollup, края периода - из журнала
+        balances = compute_facility_balances([facility_id], start, end)
+        chemicals = reference_cache.chemicals({chemical_id for _, chemical_id in balances})
+        full_report = build_facility_report(balances, chemicals)
+
         return Response(full_report, status=status.HTTP_200_OK)
 
     
 
 
-class BulkOperationAPIView(generics.GenericAPIView):
+class RunwayReportAPIView(ConcurrencyLimitMixin, ReplicaReadMixin, generics.GenericAPIView):
+    """
+    На сколько дней хватит реагентов: средний суточный расход по списаниям
+    за ?window= дней (по умолчанию 30) и остаток из Inventory по каждой паре.
+    Необязательные фильтры: ?facility_ids=1,2 или ?facility_type=well,
+    ?max_days=14 - только пары, которые закончатся раньше.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = concurrency_scope = 'reports'
+    max_window = 365
+
+    def get(self, request, *args, **kwargs):
+        window = parse_int_param(request.query_params, 'window', required=False)
+        if window is None:
+            window = RUNWAY_DEFAULT_WINDOW
+        if not 1 <= window <= self.max_window:
+            raise ValidationError(f"window должен быть от 1 до {self.max_window} дней.")
+        max_days = parse_int_param(request.query_params, 'max_days', required=False)
+
+        facility_ids = parse_id_list(request.query_params, 'facility_ids') or None
+        facility_type = request.query_params.get('facility_type')
+        if facility_type:
+            facilities = Facility.objects.filter(type=facility_type)
+            if facility_ids:
+                facilities = facilities.filter(pk__in=facility_ids)
+            facility_ids = list(facilities.values_list('id', flat=True))
+        facility_ids = restrict_facility_ids(request.user, facility_ids)
+
+        results = compute_runway(facility_ids, window)
+        if max_days is not None:
+            results = [item for item in results if item['days_left'] is not None and item['days_left'] <= max_days]
+        return Response({'window_days': window, 'count': len(results), 'results': results}, status=status.HTTP_200_OK)
+
+class TransferFlowReportAPIView(ConcurrencyLimitMixin, ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Матрица перемещений между объектами за период по каждому реагенту
+    (разреженная, только ненулевые пары). start_date и end_date обязательны,
+    необязательные фильтры: ?facility_ids=1,2 или ?facility_type=warehouse
+    (перемещения, где объект с любой стороны), ?chemical_ids=3,4.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = concurrency_scope = 'reports'
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        start, end = parse_report_period(params)
+        facility_ids = parse_id_list(params, 'facility_ids') or None
+        facility_type = params.get('facility_type')
+        if facility_type:
+            facilities = Facility.objects.filter(type=facility_type)
+            if facility_ids:
+                facilities = facilities.filter(pk__in=facility_ids)
+            facility_ids = list(facilities.values_list('id', flat=True))
+        facility_ids = restrict_facility_ids(request.user, facility_ids)
+        chemical_ids = parse_id_list(params, 'chemical_ids') or None
+
+        return Response(compute_transfer_flows(start, end, facility_ids, chemical_ids), status=status.HTTP_200_OK)
+
+
+class ProjectAnalyticsReportAPIView(ConcurrencyLimitMixin, ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Аналитика по проектам за период: расход по реагентам (план/факт),
+    по скважинам, итоги и тренд стоимости.
+    ?project_ids=1,2 (или project_ids[]=1&project_ids[]=2), start_date и end_date.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = concurrency_scope = 'reports'
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        project_ids = parse_id_list(params, 'project_ids') + parse_id_list(params, 'project_ids[]')
+        if not project_ids:
+            raise ValidationError("Необходимо указать project_ids.")
+        if len(set(project_ids)) > PROJECT_ANALYTICS_MAX_PROJECTS:
+            raise ValidationError(f"Не более {PROJECT_ANALYTICS_MAX_PROJECTS} проектов за один запрос.")
+        start, end = parse_report_period(params)
+
+        projects = Project.objects.filter(pk__in=project_ids)
+        visible = visible_facility_ids(request.user)
+        if visible is not None:
+            # Инженеру - только проекты его объекта
+            projects = projects.filter(pk__in=Project.objects.filter(facilities__in=visible).values('pk'))
+        projects = list(projects.prefetch_related(
+            'facilities', Prefetch('budget_lines', queryset=ProjectBudgetLine.objects.select_related('chemical')),
+        ).order_by('name'))
+        return Response(compute_project_analytics(projects, start, end), status=status.HTTP_200_OK)
+
+
+class FacilityBatchReportAPIView(ConcurrencyLimitMixin, ReplicaReadMixin, generics.GenericAPIView):
+    """
+    Отчет по многим объектам сразу: начальный остаток, приход, расход
+    и конечный остаток по каждому реагенту, сгруппированные по объектам.
+    ?facility_ids=1,2,3 или ?facility_type=well, плюс start_date и end_date.
+    ?stream=1 - ответ в формате NDJSON (по строке на объект), считается
+    пачками, чтобы не держать весь результат в памяти.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = concurrency_scope = 'reports'
+
+    def get(self, request, *args, **kwargs):
+        facility_ids = parse_id_list(request.query_params, 'facility_ids')
+        facility_type = request.query_params.get('facility_type')
+        if not facility_ids and not facility_type:
+            raise ValidationError("Необходимо указать facility_ids или facility_type.")
+        start, end = parse_report_period(request.query_params)
+
+        facilities = Facility.objects.order_by('name')
+        if facility_ids:
+            facilities = facilities.filter(pk__in=facility_ids)
+        if facility_type:
+            facilities = facilities.filter(type=facility_type)
+        visible = visible_facility_ids(request.user)
+        if visible is not None:
+            facilities = facilities.filter(pk__in=visible)
+        facilities = list(facilities.values('id', 'name', 'type'))
+
+        if request.query_params.get('stream') in ('1', 'true'):
+            return StreamingHttpResponse(self._stream(facilities, start, end), content_type='application/x-ndjson')
+
+        return Response({'facilities': build_facility_batch_report(facilities, start, end)}, status=status.HTTP_200_OK)
+
+    def _stream(self, facilities, start, end):
+        # Генератор выполняется уже после finalize_response,
+        # поэтому чтение с реплики включаем заново на каждую пачку
+        replica = self.replica_reads
+        renderer = JSONRenderer()
+        for i in range(0, len(facilities), BATCH_REPORT_STREAM_CHUNK):
+            with replica_reads() if replica else contextlib.nullcontext():
+                reports = build_facility_batch_report(facilities[i:i + BATCH_REPORT_STREAM_CHUNK], start, end)
+            for report in reports:
+                yield renderer.render(report) + b'\n'
+
+
+class ReportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Фоновые выгрузки отчетов (см. api/report_jobs.py).
+    POST {"kind": "facility_detail"|"facility_batch", "format": "csv"|"xlsx"|"pdf",
+          "facility_id" | "facility_ids" | "facility_type", "start_date", "end_date"}
+    -> 202 и задание (200, если такое же уже считается или готово и актуально).
+    GET /report-jobs/<id>/ - статус, /report-jobs/<id>/download/ - файл.
+    В списке - свои задания (администратору - все). Инженер выгружает
+    и видит только отчеты по своему объекту.
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_throttle_scope(self, request):
+        return 'reports' if request.method == 'POST' else None
+
+    def get_queryset(self):
+        queryset = ReportJob.objects.order_by('-id')
+        if self.action == 'list' and self.request.user.role != 'admin':
+            queryset = queryset.filter(created_by_id=self.request.user.id)
+        visible = visible_facility_ids(self.request.user)
+        if visible is not None:
+            queryset = queryset.filter(params__facility_ids=sorted(visible))
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        data = request.data
+        kind, fmt = data.get('kind'), data.get('format')
+        if kind not in ReportJob.Kind.values:
+            raise ValidationError(f"kind должен быть одним из: {', '.join(ReportJob.Kind.values)}.")
+        if fmt not in ReportJob.Format.values:
+            raise ValidationError(f"format должен быть одним из: {', '.join(ReportJob.Format.values)}.")
+        start, end = parse_report_period(data)
+
+        if kind == ReportJob.Kind.FACILITY_DETAIL:
+            facility_ids = [parse_int_param(data, 'facility_id')]
+            check_facility_access(request.user, facility_ids[0])
+        else:
+            raw_ids = data.get('facility_ids')
+            if isinstance(raw_ids, list):
+                if not all(isinstance(pk, int) for pk in raw_ids):
+                    raise ValidationError('facility_ids должен быть списком целых чисел.')
+                facility_ids = raw_ids
+            else:
+                facility_ids = parse_id_list(data, 'facility_ids')
+            facility_type = data.get('facility_type')
+            if not facility_ids and not facility_type:
+                raise ValidationError("Необходимо указать facility_ids или facility_type.")
+            if facility_type:
+                facilities = Facility.objects.filter(type=facility_type)
+                if facility_ids:
+                    facilities = facilities.filter(pk__in=facility_ids)
+                facility_ids = facilities.values_list('id', flat=True)
+        facility_ids = sorted(set(Facility.objects.filter(pk__in=facility_ids).values_list('id', flat=True)))
+        facility_ids = restrict_facility_ids(request.user, facility_ids)
+        if not facility_ids:
+            raise ValidationError("Объекты не найдены.")
+
+        params = {'facility_ids': facility_ids, 'start': start.isoformat(), 'end': end.isoformat()}
+        job, created = submit_job(request.user, kind, fmt, params)
+        serializer = self.get_serializer(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='download', url_name='download')
+    def download(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != ReportJob.Status.DONE or not job.file:
+            return Response({'error': 'Файл еще не готов.', 'status': job.status}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=f'{job.kind}-{job.pk}.{job.format}')
+
+
+def _missing_operation_response(operation_uuid):
+    # Операции закрытого периода лежат в архиве и не меняются
+    if ArchivedTransaction.objects.filter(operation_uuid=operation_uuid).exists():
+        return Response({'error': 'Операция относится к закрытому периоду и не может быть изменена.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return Response({'error': 'Операция не найдена'}, status=status.HTTP_404_NOT_FOUND)
+
+
+class BulkOperationAPIView(ConcurrencyLimitMixin, generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
+
+    def get_throttle_scope(self, request):
+        # Обычные операции со скважин не ограничиваются, крупные - как bulk_writes
+        items = request.data.get('items') if hasattr(request.data, 'get') else None
+        if isinstance(items, str):
+            try:
+                items = json.loads(items)
+            except ValueError:
+                items = None
+        return 'bulk_writes' if isinstance(items, list) and len(items) > OPERATION_HEAVY_ITEMS else None
+
+    def get_concurrency_scope(self):
+        return self.get_throttle_scope(self.request)
+
     def post(self, request, *args, **kwargs):
         try:
             with db_transaction.atomic():
                 created_transactions = validate_and_create_operation(request, request.data)
-                recalculate_inventory_for_items(created_transactions)
+                changes = recalculate_inventory_for_items(created_transactions)
+                apply_rollup_changes(created=created_transactions)
+                update_cost_layers(created=created_transactions)
+                record_transaction_changes(created=created_transactions)
+                publish_operation_event('created', created_transactions[0].operation_uuid, created_transactions, changes)
         except (ValidationError, Facility.DoesNotExist, Chemical.DoesNotExist) as e:
             error_detail = getattr(e, 'detail', str(e))
             return Response({'error': error_detail}, status=status.HTTP_400_BAD_REQUEST)
@@ -152,6 +689,139 @@ class BulkOperationAPIView(generics.GenericAPIView):
         serializer = TransactionSerializer(created_transactions, many=True)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _operation_items(operation):
+    """items операции списком (JSON-строка разбирается); некорректные - пустой список, ошибку даст проверка операции."""
+    items = operation.get('items')
+    if isinstance(items, str):
+        try:
+            items = json.loads(items)
+        except ValueError:
+            return []
+    return items if isinstance(items, list) else []
+
+
+class BatchOperationAPIView(ConcurrencyLimitMixin, generics.GenericAPIView):
+    """
+    Пакет независимых операций от офлайн-клиента:
+    POST {"operations": [{"idempotency_key": "...", "transaction_type": ..., "items": [...]}, ...]}
+    Объекты, реагенты и граница закрытого периода загружаются один раз на пакет,
+    транзакции вставляются одной пачкой, каждая пара (объект, реагент)
+    пересчитывается один раз. Ошибка в одной операции не мешает остальным.
+    Операция с уже принятым ключом не создается повторно (status="duplicate").
+    Ответ: {"results": [{"idempotency_key", "status": created|duplicate|error, ...}]}.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = concurrency_scope = 'bulk_writes'
+
+    def post(self, request, *args, **kwargs):
+        operations = request.data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            raise ValidationError('Поле "operations" должно быть непустым массивом.')
+        if len(operations) > OPERATION_BATCH_MAX_SIZE:
+            raise ValidationError(f"Не больше {OPERATION_BATCH_MAX_SIZE} операций за один запрос.")
+
+        results = [self._check_key(operation) for operation in operations]
+        seen = set()
+        for result in results:
+            key = result['idempotency_key']
+            if 'status' not in result and key in seen:
+                result.update(status='error', error="Ключ повторяется в пакете.")
+            seen.add(key)
+        keys = [r['idempotency_key'] for r in results if 'status' not in r]
+        # Уже принятые операции не проверяем заново - клиент просто повторил отправку
+        self._mark_duplicates(results, self._accepted(request.user.id, keys))
+
+        # Общие справочники на весь пакет
+        facility_ids = {_int_or_none(op.get(name)) for op in operations if isinstance(op, dict)
+                        for name in ('from_facility', 'to_facility')}
+        facilities = Facility.objects.in_bulk(facility_ids - {None})
+        chemical_ids = {_int_or_none(item.get('chemicalId')) for op in operations if isinstance(op, dict)
+                        for item in _operation_items(op) if isinstance(item, dict)}
+        known_chemicals = set(Chemical.objects.filter(pk__in=chemical_ids - {None}).values_list('id', flat=True))
+        closed_before = current_closed_before()
+
+        def get_facility(pk):
+            facility = facilities.get(_int_or_none(pk))
+            if facility is None:
+                raise ValidationError(f"Объект {pk} не найден.")
+            return facility
+
+        pending = []
+        for operation, result in zip(operations, results):
+            if 'status' in result:
+                continue
+            try:
+                transactions = build_operation_transactions(request.user, operation, get_facility, closed_before)
+                for tx in transactions:
+                    tx.chemical_id = _int_or_none(tx.chemical_id)
+                    if tx.chemical_id not in known_chemicals:
+                        raise ValidationError(f"Реагент {tx.chemical_id} не найден.")
+            except ValidationError as e:
+                result.update(status='error', error=e.detail)
+                continue
+            pending.append((result, transactions))
+
+        with db_transaction.atomic():
+            # Параллельные повторы одного клиента выстраиваются в очередь,
+            # ключи сверяются еще раз уже под блокировкой
+            User.objects.select_for_update().filter(pk=request.user.id).exists()
+            self._mark_duplicates(results, self._accepted(request.user.id, [r['idempotency_key'] for r, _ in pending]))
+            # Период могли закрыть, пока пакет проверялся: дату сверяем еще раз под блокировкой
+            locked_before = locked_closed_before()
+            if locked_before is not None and locked_before != closed_before:
+                for result, group in pending:
+                    if 'status' not in result and group[0].operation_date < locked_before:
+                        result.update(status='error', error=[
+                            f"Период до {locked_before:%Y-%m-%d %H:%M} закрыт, операции в нем менять нельзя."
+                        ])
+            created = [(result, transactions) for result, transactions in pending if 'status' not in result]
+
+            all_transactions = Transaction.objects.bulk_create([tx for _, group in created for tx in group])
+            OperationSubmission.objects.bulk_create([
+                OperationSubmission(user_id=request.user.id, idempotency_key=result['idempotency_key'],
+                                    operation_uuid=group[0].operation_uuid)
+                for result, group in created
+            ])
+            changes = recalculate_inventory_for_items(all_transactions)
+            apply_rollup_changes(created=all_transactions)
+            update_cost_layers(created=all_transactions)
+            record_transaction_changes(created=all_transactions)
+
+            for result, group in created:
+                result.update(status='created', operation_uuid=str(group[0].operation_uuid),
+                              transaction_ids=[tx.id for tx in group])
+                pairs = {(f, tx.chemical_id) for tx in group for f in (tx.from_facility_id, tx.to_facility_id) if f}
+                publish_operation_event('created', group[0].operation_uuid, group,
+                                        {pair: change for pair, change in changes.items() if pair in pairs})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def _accepted(self, user_id, keys):
+        return dict(OperationSubmission.objects.filter(
+            user_id=user_id, idempotency_key__in=keys,
+        ).values_list('idempotency_key', 'operation_uuid'))
+
+    def _mark_duplicates(self, results, accepted):
+        for result in results:
+            operation_uuid = accepted.get(result['idempotency_key'])
+            if 'status' not in result and operation_uuid is not None:
+                result.update(status='duplicate', operation_uuid=str(operation_uuid))
+
+    def _check_key(self, operation):
+        key = operation.get('idempotency_key') if isinstance(operation, dict) else None
+        result = {'idempotency_key': key}
+        if not isinstance(operation, dict):
+            result.update(status='error', error="Операция должна быть объектом.")
+        elif not isinstance(key, str) or not 0 < len(key) <= 64:
+            result.update(status='error', error='Нужен "idempotency_key" - строка до 64 символов.')
+        return result
+
 class EditOperationAPIView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request, *args, **kwargs):
@@ -162,9 +832,11 @@ class EditOperationAPIView(generics.GenericAPIView):
             return Response({'error': 'original_uuid и new_operation_data обязательны.'}, status=status.HTTP_400_BAD_REQUEST)
 
         with db_transaction.atomic():
+            # Закрытие периода не должно архивировать операцию, пока она меняется
+            lock_closed_period()
             original_transactions = list(Transaction.objects.filter(operation_uuid=original_uuid))
             if not original_transactions:
-                return Response({'error': 'Операция не найдена'}, status=status.HTTP_404_NOT_FOUND)
+                return _missing_operation_response(original_uuid)
             
             Transaction.objects.filter(operation_uuid=original_uuid).delete()
             
@@ -176,7 +848,11 @@ class EditOperationAPIView(generics.GenericAPIView):
                     raise # Перебрасываем ошибку, чтобы откатить транзакцию БД
             
             all_affected = original_transactions + created_transactions
-            recalculate_inventory_for_items(all_affected)
+            changes = recalculate_inventory_for_items(all_affected)
+            apply_rollup_changes(created=created_transactions, deleted=original_transactions)
+            update_cost_layers(created=created_transactions, deleted=original_transactions)
+            record_transaction_changes(created=created_transactions, deleted=original_transactions)
+            publish_operation_event('edited', original_uuid, all_affected, changes)
 
         return Response({'status': 'Операция успешно изменена'}, status=status.HTTP_200_OK)
 
@@ -188,12 +864,141 @@ class DeleteOperationAPIView(generics.GenericAPIView):
             return Response({'error': 'operation_uuid is required'}, status=status.HTTP_400_BAD_REQUEST)
 
         with db_transaction.atomic():
+            lock_closed_period()
             transactions_to_delete = list(Transaction.objects.filter(operation_uuid=operation_uuid))
             if not transactions_to_delete:
-                return Response({'error': 'Операция не найдена'}, status=status.HTTP_404_NOT_FOUND)
+                return _missing_operation_response(operation_uuid)
             
             Transaction.objects.filter(operation_uuid=operation_uuid).delete()
-            recalculate_inventory_for_items(transactions_to_delete)
+            changes = recalculate_inventory_for_items(transactions_to_delete)
+            apply_rollup_changes(deleted=transactions_to_delete)
+            update_cost_layers(deleted=transactions_to_delete)
+            record_transaction_changes(deleted=transactions_to_delete)
+            publish_operation_event('deleted', operation_uuid, transactions_to_delete, changes)
             
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+
+class PeriodCloseAPIView(ConcurrencyLimitMixin, generics.GenericAPIView):
+    """
+    GET - список закрытых периодов.
+    POST {"closed_before": "2025-01-01T00:00:00"} - закрыть все операции до этой даты:
+    они переносятся в архив (/api/archive/transactions/), а их итог - во входящие остатки.
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = ClosedPeriodSerializer
+
+    def get_throttle_scope(self, request):
+        return None if request.method in permissions.SAFE_METHODS else 'bulk_writes'
+
+    def get_concurrency_scope(self):
+        return self.get_throttle_scope(self.request)
+
+    def get(self, request, *args, **kwargs):
+        periods = ClosedPeriod.objects.select_related('closed_by')
+        return Response(self.get_serializer(periods, many=True).data)
+
+    def post(self, request, *args, **kwargs):
+        closed_before = request.data.get('closed_before')
+        if not closed_before:
+            raise ValidationError("Необходимо указать closed_before.")
+        period = close_period(parse_operation_date(closed_before), request.user)
+        return Response(self.get_serializer(period).data, status=status.HTTP_201_CREATED)
+
+
+class SyncAPIView(generics.GenericAPIView):
+    """
+    Дельта-синхронизация для клиентов с локальной копией справочников и журнала.
+    GET ?since=<version>&tables=facilities,inventory
+    Ответ: {"version": N, "has_more": bool, "reset": bool,
+            "changes": {таблица: [строки]}, "deleted": {таблица: [id]}}.
+    since=0 - полный снимок (reset=true). Следующий запрос - с since=version;
+    при has_more=true повторять сразу. Читает основную БД, чтобы версии не отставали.
+    Инженер получает остатки и операции только своего объекта.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    # {таблица: поля объекта} - как facility_scope_fields у вьюсетов
+    scope_fields = {
+        'inventory': ('facility',),
+        'transactions': ('from_facility', 'to_facility'),
+    }
+
+    def get(self, request, *args, **kwargs):
+        since = parse_int_param(request.query_params, 'since', required=False) or 0
+        if since < 0:
+            raise ValidationError("since не может быть отрицательным.")
+        raw_tables = request.query_params.get('tables')
+        tables = [t.strip() for t in raw_tables.split(',') if t.strip()] if raw_tables else list(SYNC_TABLES)
+        unknown = [t for t in tables if t not in SYNC_TABLES]
+        if unknown:
+            raise ValidationError(f"Неизвестные таблицы: {', '.join(unknown)}.")
+
+        scopes = {}
+        for table, fields in self.scope_fields.items():
+            condition = facility_scope_q(request.user, fields)
+            if condition is not None:
+                scopes[table] = condition
+        entry_scope = facility_scope_q(request.user, ('facility', 'other_facility'))
+        payload = collect_changes(since, tables, scopes=scopes, entry_scope=entry_scope)
+        for row in payload['changes'].get('transactions', []):
+            if row['document_file']:
+                row['document_file'] = request.build_absolute_uri(default_storage.url(row['document_file']))
+        return Response(payload, status=status.HTTP_200_OK)
+
+
+class WellClosureCalculateActualsAPIView(ConcurrencyLimitMixin, generics.GenericAPIView):
+    """
+    Фактический расход объекта за период для формы закрытия скважины.
+    POST {"facility_id", "start_date", "end_date"} -> {chemical_id: количество}.
+    """
+    permission_classes = [IsAdminUser]
+    throttle_scope = concurrency_scope = 'reports'
+
+    def post(self, request, *args, **kwargs):
+        facility_id = parse_int_param(request.data, 'facility_id')
+        start, end = parse_report_period(request.data)
+        return Response(consumed_quantities(facility_id, start, end), status=status.HTTP_200_OK)
+
+
+class WellClosureCalculateAPIView(ConcurrencyLimitMixin, generics.GenericAPIView):
+    """
+    Стоимость для закрытия скважины по FIFO-партиям.
+    POST {"facility_id", "start_date", "end_date"} -> по каждому реагенту
+    списано за период (количество и себестоимость) и остаток на объекте с оценкой.
+    """
+    permission_classes = [IsAdminUser]
+    throttle_scope = concurrency_scope = 'reports'
+
+    def post(self, request, *args, **kwargs):
+        facility_id = parse_int_param(request.data, 'facility_id')
+        start, end = parse_report_period(request.data)
+        items = well_cost_summary(facility_id, start, end)
+        chemicals = Chemical.objects.in_bulk(items)
+        details = [
+            {
+                'chemical_id': chemical_id,
+                'chemical_name': chemicals[chemical_id].name,
+                'unit': chemicals[chemical_id].unit_of_measurement,
+                **values,
+            }
+            for chemical_id, values in sorted(items.items(), key=lambda item: chemicals[item[0]].name)
+        ]
+        return Response({
+            'facility_id': facility_id,
+            'items': details,
+            'consumed_cost': sum(item['consumed_cost'] for item in details),
+            'on_hand_value': sum(item['on_hand_value'] for item in details),
+        }, status=status.HTTP_200_OK)
+
+
+class ThrottlingStatsAPIView(generics.GenericAPIView):
+    """Лимиты запросов и число отказов (429) по классам эндпоинтов - для мониторинга."""
+    permission_classes = [IsAdminUser]
+    throttle_classes = []
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'rates': settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {}),
+            'concurrency': heavy_limits(),
+            'rejections': rejection_counts(),
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,41 @@
+# backend/api/warmup.py
+# Прогрев процесса при старте gunicorn (см. gunicorn.conf.py): загрузка
+# URLconf со всеми вьюхами (DRF, djoser, simplejwt импортируются здесь,
+# а не на первом запросе), кэшей справочников и пользователей и индекса
+# остатков (если он включен).
+# С preload_app это делается один раз в мастере до fork, и воркеры
+# получают уже прогретую память.
+import logging
+import time
+
+from django.db import connections
+from django.urls import get_resolver
+
+from .authentication import user_state_cache
+from .inventory_index import inventory_index
+from .reference import reference_cache
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """Возвращает длительность шагов прогрева в секундах: {шаг: секунды}."""
+    timings = {}
+    steps = (
+        ('urlconf', lambda: get_resolver().url_patterns),
+        ('reference_cache', reference_cache.warm),
+        ('user_state_cache', user_state_cache.warm),
+        ('inventory_index', inventory_index.warm),
+    )
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            # Например, БД еще не поднялась: воркеры стартуют и с холодными кэшами
+            logger.exception("Прогрев (%s) не удался", name)
+        timings[name] = time.perf_counter() - started
+    # Соединения мастера не должны достаться воркерам после fork
+    connections.close_all()
+    logger.info("Прогрев: %s", ', '.join(f'{name} {seconds * 1000:.0f} мс' for name, seconds in timings.items()))
+    return timings
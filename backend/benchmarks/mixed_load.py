@@ -0,0 +1,119 @@
+# backend/benchmarks/mixed_load.py
+"""
+Нагрузочный тест со смешанными запросами: медленный отчет по объекту
+за длинный период + быстрые списки. Показывает, как быстрые запросы
+ждут за медленными на синхронных WSGI-воркерах и как это меняется на ASGI.
+
+Запуск (сервер должен быть уже поднят, только стандартная библиотека):
+
+    # 1. WSGI (текущий режим)
+    gunicorn -c gunicorn.conf.py
+    python benchmarks/mixed_load.py --username admin --password ... --facility-id 1
+
+    # 2. ASGI + асинхронные эндпоинты /api/async/...
+    GUNICORN_ASGI=1 gunicorn -c gunicorn.conf.py
+    python benchmarks/mixed_load.py --username admin --password ... --facility-id 1 --async-paths
+
+Сравнивайте общую пропускную способность и p95 быстрых запросов.
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+def obtain_token(base_url, username, password):
+    request = urllib.request.Request(
+        f'{base_url}/auth/jwt/create/',
+        data=json.dumps({'username': username, 'password': password}).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)['access']
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(args):
+    token = args.token or obtain_token(args.base_url, args.username, args.password)
+    prefix = '/api/async' if args.async_paths else '/api'
+    slow_query = urllib.parse.urlencode({
+        'facility_id': args.facility_id, 'start_date': args.start_date, 'end_date': args.end_date,
+    })
+    urls = {
+        'slow': f'{args.base_url}{prefix}/reports/facility-detail/?{slow_query}',
+        'fast': f'{args.base_url}{prefix}/chemicals/',
+    }
+    headers = {'Authorization': f'Bearer {token}'}
+
+    latencies = {'slow': [], 'fast': []}
+    errors = {'slow': 0, 'fast': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        while time.monotonic() < deadline:
+            kind = 'slow' if rnd.random() < args.slow_ratio else 'fast'
+            started = time.monotonic()
+            try:
+                with urllib.request.urlopen(urllib.request.Request(urls[kind], headers=headers), timeout=120) as response:
+                    response.read()
+                ok = True
+            except (urllib.error.URLError, TimeoutError):
+                ok = False
+            elapsed = time.monotonic() - started
+            with lock:
+                if ok:
+                    latencies[kind].append(elapsed)
+                else:
+                    errors[kind] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"mode={'async' if args.async_paths else 'sync'} concurrency={args.concurrency} duration={wall:.1f}s")
+    print(f"throughput: {total / wall:.1f} req/s ({total} ok, {sum(errors.values())} errors)")
+    for kind, values in latencies.items():
+        if not values:
+            continue
+        print(
+            f"  {kind:4}: n={len(values):5}  p50={statistics.median(values) * 1000:7.1f}ms  "
+            f"p95={percentile(values, 0.95) * 1000:7.1f}ms  p99={percentile(values, 0.99) * 1000:7.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--token', help="Готовый access-токен (иначе --username/--password)")
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--facility-id', type=int, required=True)
+    parser.add_argument('--start-date', default='2000-01-01T00:00:00')
+    parser.add_argument('--end-date', default='2100-01-01T00:00:00')
+    parser.add_argument('--async-paths', action='store_true', help="Бить в /api/async/... вместо /api/...")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--slow-ratio', type=float, default=0.2, help="Доля медленных запросов (0..1)")
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
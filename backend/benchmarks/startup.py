@@ -0,0 +1,108 @@
+# backend/benchmarks/startup.py
+"""
+Время запуска воркера: сколько занимает импорт каждого модуля
+(python -X importtime) и шаги старта - настройки и django.setup(),
+WSGI-приложение и прогрев из api/warmup.py (URLconf, справочники).
+
+Запуск из каталога backend (нужна настроенная БД, только стандартная библиотека):
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --top 20 --by-package
+    python benchmarks/startup.py --asgi --no-warm
+
+Сравнивайте до и после изменений импортов: модули, которые не нужны
+для старта, не должны появляться в списке.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Выполняется в отдельном процессе с -X importtime, шаги пишет в stdout JSON
+CHILD = '''
+import json, os, sys, time
+sys.path.insert(0, {backend!r})
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+steps = {{}}
+started = time.perf_counter()
+import django
+django.setup()
+steps['django.setup'] = time.perf_counter() - started
+mark = time.perf_counter()
+import {app_module}
+steps['{app_module}'] = time.perf_counter() - mark
+if {warm}:
+    mark = time.perf_counter()
+    from api.warmup import warm_up
+    steps['import api.warmup'] = time.perf_counter() - mark
+    steps.update(('warm_up: ' + name, seconds) for name, seconds in warm_up().items())
+steps['total'] = time.perf_counter() - started
+print(json.dumps(steps))
+'''
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(stderr):
+    """[(модуль, собственное время, накопленное время, глубина)] в микросекундах."""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            rows.append((name, int(own), int(cumulative), len(indent) // 2))
+    return rows
+
+
+def run(args):
+    child = CHILD.format(
+        backend=BACKEND_DIR, app_module='config.asgi' if args.asgi else 'config.wsgi', warm=not args.no_warm,
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', child],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr[-3000:])
+        sys.exit(result.returncode)
+    steps = json.loads(result.stdout.strip().splitlines()[-1])
+    rows = parse_importtime(result.stderr)
+
+    print("Шаги старта:")
+    for name, seconds in steps.items():
+        print(f"  {name:32} {seconds * 1000:8.1f} ms")
+
+    total_own = sum(own for _, own, _, _ in rows)
+    print(f"\nИмпортировано модулей: {len(rows)}, суммарно {total_own / 1000:.1f} ms")
+    if args.by_package:
+        packages = defaultdict(lambda: [0, 0])
+        for name, own, _, _ in rows:
+            package = packages[name.split('.')[0]]
+            package[0] += own
+            package[1] += 1
+        print(f"\nПакеты по собственному времени импорта (топ {args.top}):")
+        for name, (own, count) in sorted(packages.items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+            print(f"  {name:40} {own / 1000:8.1f} ms  ({count} модулей)")
+    else:
+        print(f"\nМодули по накопленному времени импорта (топ {args.top}):")
+        print(f"  {'модуль':60} {'свое':>9} {'всего':>9}")
+        for name, own, cumulative, depth in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+            print(f"  {name:60} {own / 1000:7.1f}ms {cumulative / 1000:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=30, help="Сколько модулей показать")
+    parser.add_argument('--by-package', action='store_true', help="Суммировать по пакетам верхнего уровня")
+    parser.add_argument('--asgi', action='store_true', help="Загружать config.asgi вместо config.wsgi")
+    parser.add_argument('--no-warm', action='store_true', help="Без прогрева (не нужна БД)")
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
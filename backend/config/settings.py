@@ -1,9 +1,7 @@
 # backend/config/settings.py
 import os
+import tempfile
 import dj_database_url
-from dotenv import load_dotenv
-
-load_dotenv() # Эта функция ищет файл .env и загружает его переменные
 
 """
 Django settings for config project.
@@ -24,6 +22,14 @@ from pathlib import Path
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Локальный .env в backend/ или в корне проекта. В docker переменные приходят
+# через env_file, файла там нет - тогда python-dotenv даже не импортируется.
+for _env_file in (BASE_DIR / '.env', BASE_DIR.parent / '.env'):
+    if _env_file.exists():
+        from dotenv import load_dotenv
+        load_dotenv(_env_file)
+        break
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -65,6 +71,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ReplicaPinningMiddleware',
+    # Профилирование по X-Profile: 1 от администратора (см. api/profiling.py)
+    'api.middleware.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -94,21 +103,25 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 
-# --- ДОБАВЬТЕ ЭТОТ БЛОК ДЛЯ ОТЛАДКИ ---
-print("--- Отладка переменных окружения в settings.py ---")
-print(f"DEBUG from env: {os.getenv('DEBUG')}")
-print(f"POSTGRES_DB from env: {os.getenv('POSTGRES_DB')}")
-print(f"POSTGRES_USER from env: {os.getenv('POSTGRES_USER')}")
-print(f"POSTGRES_PASSWORD from env: {os.getenv('POSTGRES_PASSWORD')}")
-print("-------------------------------------------------")
-# --- КОНЕЦ ОТЛАДОЧНОГО БЛОКА ---
-
-
-
 DATABASES = {
     'default': dj_database_url.config(conn_max_age=600, ssl_require=False)
 }
 
+# Реплика для чтения отчетов и списков (необязательно).
+# Локально можно проверить на двух SQLite: скопировать базу в replica.sqlite3
+# и задать REPLICA_DATABASE_URL=sqlite:///replica.sqlite3
+REPLICA_DATABASE_URL = os.getenv('REPLICA_DATABASE_URL')
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(REPLICA_DATABASE_URL, conn_max_age=600)
+    # В тестах реплика - это та же база, что и default
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['api.db_routers.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает только с основной БД.
+# Метка хранится в кэше Django: при нескольких воркерах нужен общий кэш.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -165,15 +178,67 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        # Основной способ аутентификации - через JWT
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Основной способ аутентификации - через JWT. Роль и объект берутся
+        # из claim'ов токена, без запроса User в БД (см. api/authentication.py)
+        'api.authentication.ClaimsJWTAuthentication',
     ],
     # --- ДОБАВЬТЕ ЭТОТ БЛОК ---
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
+    # Лимиты по пользователю и классу эндпоинта (см. api/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.EndpointClassThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'reports': os.getenv('THROTTLE_REPORTS', '30/min'),
+        'bulk_writes': os.getenv('THROTTLE_BULK_WRITES', '20/min'),
+        'reads': os.getenv('THROTTLE_READS', '600/min'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Окна лимитов частоты (api/throttling.py): файловый кэш, общий для всех
+    # воркеров хоста. На каждый запрос - чтение и запись одного маленького
+    # файла в tmp (обычно tmpfs или page cache), это дешевле сетевого кэша.
+    # FileBasedCache при каждой записи пересчитывает файлы каталога и при
+    # переполнении удаляет 1/CULL_FREQUENCY случайных: потеря окна лишь
+    # обнуляет лимит пользователя, но каталог должен оставаться небольшим.
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('THROTTLE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'chem-throttle')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('THROTTLE_CACHE_MAX_ENTRIES', 10000))},
+    },
+    # Счетчики отказов (/api/monitoring/throttling/) и закрепление за основной
+    # БД после записи (db_routers): отдельный каталог, чтобы окна лимитов их
+    # не вытесняли. Записей мало (счетчик на класс, метка на недавно
+    # писавшего пользователя), лимит с запасом - вытеснения не бывает.
+    'host_state': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('HOST_STATE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'chem-host-state')),
+        'OPTIONS': {'MAX_ENTRIES': 1_000_000},
+    },
 }
 
+# Сколько тяжелых запросов класса выполняется одновременно на хосте;
+# сверх этого - сразу 429 с Retry-After (секунд)
+HEAVY_CONCURRENCY = {
+    'reports': int(os.getenv('HEAVY_CONCURRENCY_REPORTS', 4)),
+    'bulk_writes': int(os.getenv('HEAVY_CONCURRENCY_BULK_WRITES', 2)),
+}
+HEAVY_RETRY_AFTER = int(os.getenv('HEAVY_RETRY_AFTER', 5))
+HEAVY_SLOTS_DIR = os.getenv('HEAVY_SLOTS_DIR', os.path.join(tempfile.gettempdir(), 'chem-heavy-slots'))
+
+# Фоновые выгрузки отчетов (manage.py run_report_worker)
+REPORT_JOB_TIMEOUT = int(os.getenv('REPORT_JOB_TIMEOUT', 30 * 60))  # секунд, потом задание перезапускается
+REPORT_JOB_MAX_ATTEMPTS = int(os.getenv('REPORT_JOB_MAX_ATTEMPTS', 3))
+REPORT_JOB_RETENTION_DAYS = int(os.getenv('REPORT_JOB_RETENTION_DAYS', 7))
+# TTF-шрифт с кириллицей для PDF
+REPORT_PDF_FONT = os.getenv('REPORT_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
 
 from datetime import timedelta
 
@@ -205,12 +270,39 @@ SIMPLE_JWT = {
 
     "JTI_CLAIM": "jti",
 
+    # Токены несут role, related_facility_id и token_version пользователя
+    "TOKEN_OBTAIN_SERIALIZER": "api.authentication.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "api.authentication.ClaimsTokenRefreshSerializer",
+
     "SLIDING_TOKEN_REFRESH_EXP_CLAIM": "refresh_exp",
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 }
 
 
+# Сколько секунд воркер кэширует версию токенов и полную модель пользователя
+JWT_USER_CACHE_TTL = int(os.getenv('JWT_USER_CACHE_TTL', 30))
+
+# Сколько секунд воркер кэширует справочники для подписей в отчетах (api/reference.py)
+REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', 300))
+
+# Остатки всех пар в памяти воркера для /api/inventory/lookup|in-stock|summary/
+# (api/inventory_index.py). Без индекса те же эндпоинты читают БД.
+INVENTORY_INDEX_ENABLED = os.getenv('INVENTORY_INDEX_ENABLED', '0') == '1'
+INVENTORY_INDEX_MAX_CELLS = int(os.getenv('INVENTORY_INDEX_MAX_CELLS', 5_000_000))  # объекты x реагенты
+INVENTORY_INDEX_MAX_LAG = float(os.getenv('INVENTORY_INDEX_MAX_LAG', 1.0))  # секунд отставания от других воркеров
+
+# Брокер живых обновлений (/api/events/). InProcessBroker работает в пределах
+# одного воркера; при нескольких воркерах - api.events.PostgresNotifyBroker
+EVENT_BROKER = os.getenv('EVENT_BROKER', 'api.events.InProcessBroker')
+# Интервал пинга в SSE-потоке, секунд
+EVENT_STREAM_HEARTBEAT = int(os.getenv('EVENT_STREAM_HEARTBEAT', 15))
+
+# Профилирование запросов по требованию (X-Profile: 1 от администратора).
+# Сохраненные профили вытесняются, когда их общий размер превышает лимит
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'True') == 'True'
+PROFILER_STORAGE_BYTES = int(os.getenv('PROFILER_STORAGE_BYTES', 50 * 1024 * 1024))
+
 
 DJOSER = {
     'LOGIN_FIELD': 'username', # Вход по username
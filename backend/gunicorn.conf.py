@@ -0,0 +1,44 @@
+# backend/gunicorn.conf.py
+# Конфигурация gunicorn для продакшена: `gunicorn -c gunicorn.conf.py`
+#
+# GUNICORN_ASGI=1 - запуск ASGI-приложения на воркерах uvicorn. Тогда
+# асинхронные эндпоинты /api/async/... не блокируют воркер на время
+# медленного отчета, а обычные DRF-вьюхи выполняются в пуле потоков.
+# Без переменной - прежний режим: синхронные WSGI-воркеры.
+#
+# GUNICORN_PRELOAD=1 (по умолчанию) - приложение импортируется и прогревается
+# (api/warmup.py) один раз в мастере до fork: воркеры стартуют сразу, а первые
+# запросы после деплоя или перезапуска воркера не ждут импорта DRF и справочников.
+# Код при этом подхватывается только перезапуском мастера (не HUP).
+import os
+
+ASGI = os.getenv('GUNICORN_ASGI', '0') == '1'
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+if ASGI:
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'sync'
+
+
+def _warm_up():
+    from api.warmup import warm_up
+    warm_up()
+
+
+def when_ready(server):
+    # Мастер, приложение уже загружено, воркеров еще нет
+    if preload_app:
+        _warm_up()
+
+
+def post_worker_init(worker):
+    # Без preload каждый воркер прогревается сам
+    if not preload_app:
+        _warm_up()